@@ -169,6 +169,17 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+# Point the OpenAI clients elsewhere, e.g. at my_app.fakellm for load tests; None uses the default
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default=None)
+# Shared client pool, per-call timeouts (seconds) and jittered retries on transient errors
+OPENAI_TIMEOUT = config('OPENAI_TIMEOUT', default=60.0, cast=float)
+OPENAI_CONNECT_TIMEOUT = config('OPENAI_CONNECT_TIMEOUT', default=5.0, cast=float)
+OPENAI_MAX_CONNECTIONS = config('OPENAI_MAX_CONNECTIONS', default=100, cast=int)
+OPENAI_MAX_RETRIES = config('OPENAI_MAX_RETRIES', default=2, cast=int)
+OPENAI_RETRY_BACKOFF = config('OPENAI_RETRY_BACKOFF', default=0.5, cast=float)
+# Consecutive failed calls that open the circuit breaker, and seconds before it lets a probe through
+OPENAI_BREAKER_THRESHOLD = config('OPENAI_BREAKER_THRESHOLD', default=5, cast=int)
+OPENAI_BREAKER_RESET = config('OPENAI_BREAKER_RESET', default=30.0, cast=float)
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -181,9 +192,19 @@ INSTALLED_APPS = [
 
 ]
 
+# Optional GIN/B-tree indexes on the unmanaged jobs table (PostgreSQL). Their migrations live in
+# my_app.job_indexes, installed only when this is on; with them, job matching pre-filters the
+# candidates in SQL (skill overlap or experience window) instead of with the in-memory SkillIndex
+JOB_INDEXES = config('JOB_INDEXES', default=False, cast=bool)
+if JOB_INDEXES:
+    INSTALLED_APPS.append('my_app.job_indexes')
+
 MIDDLEWARE = [
+    # First, so its request timings include the rest of the middleware
+    'my_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',  
+    # SessionMiddleware, plus session.load / session.save spans for any SESSION_ENGINE
+    'my_app.metrics.MetricsSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -211,17 +232,144 @@ TEMPLATES = [
 WSGI_APPLICATION = 'cvgen.wsgi.application'
 
 
+DATABASE_URL = config('DATABASE_URL')
+
 DATABASES = {
     'default': dj_database_url.parse(
-        config('DATABASE_URL'),
+        DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True
+        ssl_require=config('DB_SSL_REQUIRE', default=not DATABASE_URL.startswith('sqlite'), cast=bool)
     )
 }
 
 
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# my_app.sessions keeps sessions in SESSION_CACHE_ALIAS and writes the database copy in bulk
+# SESSION_WRITE_BEHIND seconds later (0 writes it before the response). Only delay the writes
+# when the sessions cache is shared by every web process, or there is a single one: another
+# process reads the database copy, which may still be the previous step.
+# It is the default only with a shared SESSION_CACHE_BACKEND: with the per-process
+# LocMemCache, a worker would keep answering from its own copy of a session that another
+# worker has since changed. Set SESSION_ENGINE=my_app.sessions to use it with a single process
+SESSION_CACHE_BACKEND = config('SESSION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+SESSION_ENGINE = config('SESSION_ENGINE', default=(
+    'django.contrib.sessions.backends.db' if SESSION_CACHE_BACKEND.endswith('LocMemCache') else 'my_app.sessions'
+))
+SESSION_CACHE_ALIAS = config('SESSION_CACHE_ALIAS', default='sessions')
+SESSION_WRITE_BEHIND = config('SESSION_WRITE_BEHIND', default=0.0, cast=float)
+# Session strings this long or longer (the generated CV) are stored once by content hash
+SESSION_BLOB_MIN_BYTES = config('SESSION_BLOB_MIN_BYTES', default=1024, cast=int)
+
+# LocMemCache evicts least-recently-used keys beyond MAX_ENTRIES; point an
+# alias at Redis/Memcached/the DB cache to share entries between workers
+PDF_CACHE_BACKEND = config('PDF_CACHE_BACKEND', default='my_app.cache_backends.BoundedLocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cvgen-default',
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int)},
+    },
+    # Generated CV text; use FileBasedCache or DatabaseCache to share it
+    'generations': {
+        'BACKEND': config('CV_GENERATION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CV_GENERATION_CACHE_LOCATION', default='cvgen-generations'),
+        'OPTIONS': {'MAX_ENTRIES': config('CV_GENERATION_CACHE_MAX_ENTRIES', default=1000, cast=int)},
+    },
+    # Stepper sessions and their blobs (my_app.sessions); Redis/Memcached share them between workers
+    'sessions': {
+        'BACKEND': SESSION_CACHE_BACKEND,
+        'LOCATION': config('SESSION_CACHE_LOCATION', default='cvgen-sessions'),
+        'OPTIONS': {'MAX_ENTRIES': config('SESSION_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+    # Rendered CV PDFs keyed by content hash; FileBasedCache keeps them on disk. The default in-memory
+    # backend also caps the total size per process (PDF_CACHE_MAX_TOTAL_BYTES), evicting least recently used
+    'pdfs': {
+        'BACKEND': PDF_CACHE_BACKEND,
+        'LOCATION': config('PDF_CACHE_LOCATION', default='cvgen-pdfs'),
+        'OPTIONS': {'MAX_ENTRIES': config('PDF_CACHE_MAX_ENTRIES', default=500, cast=int)},
+    },
+}
+if PDF_CACHE_BACKEND == 'my_app.cache_backends.BoundedLocMemCache':
+    CACHES['pdfs']['OPTIONS']['MAX_BYTES'] = config('PDF_CACHE_MAX_TOTAL_BYTES', default=67108864, cast=int)
+
+# Job matching: score only jobs sharing a skill with the CV, plus jobs whose
+# education/experience part alone reaches the fallback threshold (0-45)
+JOB_MATCH_INDEX = config('JOB_MATCH_INDEX', default=True, cast=bool)
+JOB_MATCH_FALLBACK_THRESHOLD = config('JOB_MATCH_FALLBACK_THRESHOLD', default=25.0, cast=float)
+# 'python' scores in-process; 'database' pushes scoring into PostgreSQL
+JOB_MATCH_BACKEND = config('JOB_MATCH_BACKEND', default='python')
+# Directory of precomputed job features (manage.py refresh_job_features); empty disables it
+JOB_FEATURE_STORE = config('JOB_FEATURE_STORE', default='')
+# Cache alias for top-K recommendations (empty disables) and entry lifetime in seconds
+RECOMMENDATION_CACHE_ALIAS = config('RECOMMENDATION_CACHE_ALIAS', default='default')
+RECOMMENDATION_CACHE_TIMEOUT = config('RECOMMENDATION_CACHE_TIMEOUT', default=600, cast=int)
+
+# OpenAI generation cache: alias (empty disables), lifetime in seconds, largest entry stored
+CV_GENERATION_CACHE_ALIAS = config('CV_GENERATION_CACHE_ALIAS', default='generations')
+CV_GENERATION_CACHE_TIMEOUT = config('CV_GENERATION_CACHE_TIMEOUT', default=86400, cast=int)
+CV_GENERATION_CACHE_MAX_BYTES = config('CV_GENERATION_CACHE_MAX_BYTES', default=65536, cast=int)
+
+# Cache alias for rendered PDFs (empty disables) and entry lifetime in seconds
+PDF_CACHE_ALIAS = config('PDF_CACHE_ALIAS', default='pdfs')
+PDF_CACHE_TIMEOUT = config('PDF_CACHE_TIMEOUT', default=86400, cast=int)
+# PDFs larger than this many bytes are rendered on every download instead of cached
+PDF_CACHE_MAX_BYTES = config('PDF_CACHE_MAX_BYTES', default=1048576, cast=int)
+# Render the PDF in the background as soon as a CV is generated; downloads wait up to
+# PDF_PRERENDER_WAIT seconds for a queued render before rendering it themselves
+PDF_PRERENDER = config('PDF_PRERENDER', default=True, cast=bool)
+PDF_PRERENDER_WORKERS = config('PDF_PRERENDER_WORKERS', default=2, cast=int)
+PDF_PRERENDER_MAX_PENDING = config('PDF_PRERENDER_MAX_PENDING', default=100, cast=int)
+PDF_PRERENDER_WAIT = config('PDF_PRERENDER_WAIT', default=2.0, cast=float)
+# 'inline' renders PDFs in the calling thread; 'process' sends them to a warm pool of worker
+# processes with a bounded queue (downloads get a 503 when it stays full) and a render timeout
+PDF_RENDER_BACKEND = config('PDF_RENDER_BACKEND', default='inline')
+PDF_RENDER_PROCESSES = config('PDF_RENDER_PROCESSES', default=2, cast=int)
+PDF_RENDER_MAX_QUEUE = config('PDF_RENDER_MAX_QUEUE', default=32, cast=int)
+PDF_RENDER_QUEUE_WAIT = config('PDF_RENDER_QUEUE_WAIT', default=1.0, cast=float)
+PDF_RENDER_TIMEOUT = config('PDF_RENDER_TIMEOUT', default=10.0, cast=float)
+# Layout used by the download button, pre-rendering and batch jobs: one of my_app.pdf_layouts.PDF_TEMPLATES
+# ('classic', 'modern', 'serif', 'compact'); downloads pick another with ?template=<name>
+PDF_DEFAULT_TEMPLATE = config('PDF_DEFAULT_TEMPLATE', default='classic')
+
+# Identical generations in flight are coalesced within a process; naming a cache alias shared by all
+# processes (Redis, database or file cache) here coalesces them across processes too. Waiting processes
+# read the result from CV_GENERATION_CACHE_ALIAS, so that cache must be shared as well; with the default
+# per-process LocMemCache this setting is ignored
+CV_GENERATION_LOCK_ALIAS = config('CV_GENERATION_LOCK_ALIAS', default='')
+CV_GENERATION_LOCK_TIMEOUT = config('CV_GENERATION_LOCK_TIMEOUT', default=120, cast=int)
+
+# 'task' runs generation on a background worker pool and polls for the result, 'stream' sends the
+# text to the result page over Server-Sent Events as it is written; 'sync' blocks the request
+CV_GENERATION_MODE = config('CV_GENERATION_MODE', default='task')
+CV_GENERATION_WORKERS = config('CV_GENERATION_WORKERS', default=8, cast=int)
+# Transient API errors are retried by the client (OPENAI_MAX_RETRIES); a task only makes another
+# attempt after the circuit breaker's reset window, waiting at least CV_GENERATION_RETRY_DELAY seconds
+CV_GENERATION_MAX_ATTEMPTS = config('CV_GENERATION_MAX_ATTEMPTS', default=3, cast=int)
+CV_GENERATION_RETRY_DELAY = config('CV_GENERATION_RETRY_DELAY', default=1.0, cast=float)
+CV_GENERATION_TASK_TIMEOUT = config('CV_GENERATION_TASK_TIMEOUT', default=120, cast=int)
+# Tasks are deleted once their result is collected; manage.py purge_generation_tasks deletes the
+# rest (abandoned or failed, still holding the submitted CV data) this many seconds after they end
+CV_GENERATION_TASK_RETENTION = config('CV_GENERATION_TASK_RETENTION', default=86400, cast=int)
+
+# Bulk generation API (POST /api/batch/); disabled while BATCH_API_TOKEN is empty. It runs inside the
+# request, so it takes a handful of records and stops calling the model after BATCH_TIMEOUT seconds
+# (later records get template CVs); larger batches go through manage.py generate_cvs
+BATCH_API_TOKEN = config('BATCH_API_TOKEN', default='')
+BATCH_MAX_RECORDS = config('BATCH_MAX_RECORDS', default=10, cast=int)
+BATCH_CONCURRENCY = config('BATCH_CONCURRENCY', default=8, cast=int)
+BATCH_TIMEOUT = config('BATCH_TIMEOUT', default=30, cast=float)
+
+# Request metrics (my_app.metrics). Every request's latency is recorded;
+# spans (LLM, matching, PDF, sessions) and database query counts only for
+# the METRICS_SAMPLE_RATE share of requests. GET /metrics/ serves them in
+# Prometheus text format (?format=json for JSON) with
+# ``Authorization: Bearer <METRICS_TOKEN>``; disabled while it is empty
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_SAMPLE_RATE = config('METRICS_SAMPLE_RATE', default=0.1, cast=float)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Serve the stepper, result and PDF views as native async views (use with cvgen.asgi)
+CV_ASYNC_VIEWS = config('CV_ASYNC_VIEWS', default=False, cast=bool)
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -0,0 +1,387 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .llm import CircuitOpen, openai_clients
+from .metrics import metrics
+from .singleflight import SingleFlight, StreamFlight
+
+
+OPENAI_MODEL = "gpt-4o-mini"
+
+
+def build_cv_prompt(cv_data):
+    """Prompt sent to the model for ``cv_data``"""
+    return f"""
+    Create a professional, well-formatted CV/resume using the following information:
+
+            
+    [FULL NAME]
+    [City, State]
+
+    Email: [email]
+    Phone: [phone]
+
+    Summary
+    [3-4 line professional summary focusing on key skills and career objectives. Use complete sentences.]
+
+    Education
+    [Degree Name]
+    [University Name]
+    Passing Year: [year]
+    Grade: [grade]
+
+    Skills
+    Technical Skills: [comma-separated list of technical skills]
+    Soft Skills: [comma-separated list of soft skills]
+
+    Projects
+    [Project 1 description in 1-2 sentences]
+    [Project 2 description in 1-2 sentences]
+
+    Work Experience
+    [If experience < 1 year: "No professional work experience. Seeking entry-level opportunities to apply academic knowledge and technical skills."]
+
+    IMPORTANT FORMATTING RULES:
+    - NO markdown symbols (#, *, **, -)
+    - NO bullet points
+    - NO section headers with symbols
+    - Use plain text only
+    - Leave one blank line between sections
+    - Section names should be on their own line in Title Case
+    - Contact info should be simple and clean
+
+    Now create the CV for this data:
+    Name: {cv_data['basic_info']['name']}
+    Email: {cv_data['basic_info']['email']}
+    Phone: {cv_data['basic_info']['phone']}
+    Address: {cv_data['basic_info']['address']}
+    Education: {cv_data['education']['qualification']} in {cv_data['education']['field']} from {cv_data['education']['institution']}, Year: {cv_data['education']['year']}, Grade: {cv_data['education']['grade']}
+    Technical Skills: {', '.join(cv_data['skills']['technical'])}
+    Soft Skills: {', '.join(cv_data['skills']['soft'])}
+    Projects: {', '.join(cv_data['projects']['selected'] + cv_data['projects']['custom'])}
+    Experience: {cv_data['experience']['years']} years
+
+    Make sure the output follows the exact format above with NO markdown.
+    """
+
+
+class GenerationCache:
+    """
+    Generated CV text keyed by a hash of the rendered prompt and model name.
+
+    Storage is whichever Django cache CV_GENERATION_CACHE_ALIAS points at
+    (local memory, file-based or database), which also enforces the size
+    bound through its MAX_ENTRIES option.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _backend(self):
+        alias = settings.CV_GENERATION_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def key(prompt, model):
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+        return f"cvgen:{digest}"
+
+    def _count(self, content):
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return content
+
+    def _storable(self, content):
+        return len(content.encode()) <= settings.CV_GENERATION_CACHE_MAX_BYTES
+
+    def peek(self, prompt, model):
+        """Cached text without touching the hit/miss counters"""
+        backend = self._backend()
+        return backend.get(self.key(prompt, model)) if backend is not None else None
+
+    async def apeek(self, prompt, model):
+        backend = self._backend()
+        return await backend.aget(self.key(prompt, model)) if backend is not None else None
+
+    def get(self, prompt, model):
+        backend = self._backend()
+        return self._count(backend.get(self.key(prompt, model)) if backend is not None else None)
+
+    async def aget(self, prompt, model):
+        backend = self._backend()
+        return self._count(await backend.aget(self.key(prompt, model)) if backend is not None else None)
+
+    def set(self, prompt, model, content):
+        backend = self._backend()
+        if backend is not None and self._storable(content):
+            backend.set(self.key(prompt, model), content, settings.CV_GENERATION_CACHE_TIMEOUT)
+
+    async def aset(self, prompt, model, content):
+        backend = self._backend()
+        if backend is not None and self._storable(content):
+            await backend.aset(self.key(prompt, model), content, settings.CV_GENERATION_CACHE_TIMEOUT)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+generation_cache = GenerationCache()
+
+# Identical prompts in flight at the same time (double submits, retries)
+# share a single API call
+generation_flight = SingleFlight(
+    'CV_GENERATION_LOCK_ALIAS', 'CV_GENERATION_LOCK_TIMEOUT', results_alias_setting='CV_GENERATION_CACHE_ALIAS',
+)
+# Streaming readers of the same prompt, reconnects included, share one call
+generation_streams = StreamFlight()
+metrics.gauge('cvgen_generation_cache', generation_cache.stats)
+metrics.gauge('cvgen_generation_flight', generation_flight.stats)
+metrics.gauge('cvgen_generation_streams', generation_streams.stats)
+
+
+def _request_cv_text(prompt, timeout=None):
+    response = openai_clients.call(
+        lambda client: client.responses.create(model=OPENAI_MODEL, input=prompt),
+        timeout=timeout,
+    )
+    cv_text = response.output_text
+    if cv_text:
+        generation_cache.set(prompt, OPENAI_MODEL, cv_text)
+    return cv_text or None
+
+async def _arequest_cv_text(prompt):
+    response = await openai_clients.acall(
+        lambda client: client.responses.create(model=OPENAI_MODEL, input=prompt)
+    )
+    cv_text = response.output_text
+    if cv_text:
+        await generation_cache.aset(prompt, OPENAI_MODEL, cv_text)
+    return cv_text or None
+
+
+def generate_cv_with_ai(cv_data, regenerate=False, timeout=None):
+    """
+    Generate CV content using OpenAI API with advanced prompt.
+
+    Identical prompts are answered from the generation cache unless
+    ``regenerate`` is set, in which case the fresh result replaces the entry.
+    Concurrent calls for the same prompt share one API request.
+    Returns None on failure, immediately while the circuit breaker is open,
+    so callers fall back to generate_template_cv. ``timeout`` caps the API
+    call, retries included, in seconds.
+    """
+    try:
+        prompt = build_cv_prompt(cv_data)
+
+        if not regenerate:
+            cached = generation_cache.get(prompt, OPENAI_MODEL)
+            if cached:
+                return {"content": cached}
+
+        cv_text = generation_flight.do(
+            GenerationCache.key(prompt, OPENAI_MODEL),
+            lambda: _request_cv_text(prompt, timeout),
+            lookup=lambda: generation_cache.peek(prompt, OPENAI_MODEL),
+        )
+
+        if not cv_text:
+            return None
+
+        return {"content": cv_text}
+
+    except CircuitOpen:
+        print("OpenAI circuit breaker open, skipping the API call")
+        return None
+    except Exception as e:
+        import traceback
+        print("OpenAI API Error:", e)
+        traceback.print_exc()
+        return None
+
+async def agenerate_cv_with_ai(cv_data, regenerate=False):
+    """Async counterpart of generate_cv_with_ai, built on AsyncOpenAI"""
+    try:
+        prompt = build_cv_prompt(cv_data)
+
+        if not regenerate:
+            cached = await generation_cache.aget(prompt, OPENAI_MODEL)
+            if cached:
+                return {"content": cached}
+
+        cv_text = await generation_flight.ado(
+            GenerationCache.key(prompt, OPENAI_MODEL),
+            lambda: _arequest_cv_text(prompt),
+            lookup=lambda: generation_cache.apeek(prompt, OPENAI_MODEL),
+        )
+
+        if not cv_text:
+            return None
+
+        return {"content": cv_text}
+
+    except CircuitOpen:
+        print("OpenAI circuit breaker open, skipping the API call")
+        return None
+    except Exception as e:
+        import traceback
+        print("OpenAI API Error:", e)
+        traceback.print_exc()
+        return None
+
+def _text_deltas(event):
+    if event.type == "response.output_text.delta":
+        return event.delta
+    if event.type in ("error", "response.failed"):
+        raise RuntimeError(f"Streaming generation failed: {event.type}")
+    return None
+
+def _stream_cv_text(prompt):
+    events = openai_clients.call(
+        lambda client: client.responses.create(model=OPENAI_MODEL, input=prompt, stream=True)
+    )
+    parts = []
+    try:
+        with events:
+            for event in events:
+                delta = _text_deltas(event)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except Exception:
+        openai_clients.breaker.record_failure()
+        raise
+
+    if parts:
+        generation_cache.set(prompt, OPENAI_MODEL, "".join(parts))
+
+async def _astream_cv_text(prompt):
+    events = await openai_clients.acall(
+        lambda client: client.responses.create(model=OPENAI_MODEL, input=prompt, stream=True)
+    )
+    parts = []
+    try:
+        async with events:
+            async for event in events:
+                delta = _text_deltas(event)
+                if delta:
+                    parts.append(delta)
+                    yield delta
+    except Exception:
+        openai_clients.breaker.record_failure()
+        raise
+
+    if parts:
+        await generation_cache.aset(prompt, OPENAI_MODEL, "".join(parts))
+
+def stream_cv_with_ai(cv_data, regenerate=False):
+    """
+    Yield the CV text in pieces as the model writes it.
+
+    A cached CV is yielded in one piece. Readers of a prompt that is already
+    streaming (an EventSource reconnecting) join that generation: they get
+    the text so far as the first piece and follow along from there. Unlike
+    generate_cv_with_ai errors (CircuitOpen included) are raised, since the
+    caller may already have sent part of the text.
+    """
+    prompt = build_cv_prompt(cv_data)
+
+    if not regenerate:
+        cached = generation_cache.get(prompt, OPENAI_MODEL)
+        if cached:
+            yield cached
+            return
+
+    yield from generation_streams.stream(
+        GenerationCache.key(prompt, OPENAI_MODEL), lambda: _stream_cv_text(prompt),
+    )
+
+async def astream_cv_with_ai(cv_data, regenerate=False):
+    """Async counterpart of stream_cv_with_ai, built on AsyncOpenAI"""
+    prompt = build_cv_prompt(cv_data)
+
+    if not regenerate:
+        cached = await generation_cache.aget(prompt, OPENAI_MODEL)
+        if cached:
+            yield cached
+            return
+
+    async for delta in generation_streams.astream(
+        GenerationCache.key(prompt, OPENAI_MODEL), lambda: _astream_cv_text(prompt),
+    ):
+        yield delta
+
+def generate_template_cv(cv_data):
+    """Fallback template-based CV generation"""
+    experience_years = cv_data['experience']['years']
+    is_fresher = experience_years < 1
+    if is_fresher:
+        experience_section = "EXPERIENCE\n───────────\n• Fresher - Seeking entry-level opportunities to apply academic knowledge and technical skills"
+    else:
+        experience_section = f"EXPERIENCE\n───────────\n• {cv_data['experience']['role']}\n  {cv_data['experience']['organization']} | {cv_data['experience']['years']} years | {cv_data['experience']['work_type']}"
+    if is_fresher:
+        summary = f"""
+        SUMMARY
+        ───────
+        Recent {cv_data['education']['field']} graduate with strong academic background ({cv_data['education']['grade']}) from {cv_data['education']['institution']}. 
+        Proficient in {', '.join(cv_data['skills']['technical'][:3])} with hands-on experience through academic projects. 
+        Demonstrated {', '.join(cv_data['skills']['soft'][:3])} skills with a passion for learning and contributing to innovative projects. 
+        Seeking to leverage technical expertise and problem-solving abilities in an entry-level position.
+        """
+    else:
+        summary = f"""
+        SUMMARY
+        ───────
+        Experienced {cv_data['experience']['role']} with {cv_data['experience']['years']} years in the field. 
+        Strong educational background in {cv_data['education']['field']} from {cv_data['education']['institution']}. 
+        Expertise in {', '.join(cv_data['skills']['technical'][:4])} with proven track record in {cv_data['experience']['work_type'].lower()} environments. 
+        Excellent {', '.join(cv_data['skills']['soft'][:3])} skills with ability to deliver results in challenging environments.
+        """
+    
+    content = f"""
+    PROFESSIONAL CURRICULUM VITAE
+    
+    PERSONAL INFORMATION
+    ───────────────────
+    Name: {cv_data['basic_info']['name']}
+    Email: {cv_data['basic_info']['email']}
+    Phone: {cv_data['basic_info']['phone']}
+    Address: {cv_data['basic_info']['address']}
+    
+    EDUCATION
+    ─────────
+    • {cv_data['education']['qualification']} in {cv_data['education']['field']}
+      {cv_data['education']['institution']} | {cv_data['education']['year']} | Grade: {cv_data['education']['grade']}
+    
+    TECHNICAL SKILLS
+    ────────────────
+    {chr(10).join(['• ' + skill for skill in cv_data['skills']['technical']])}
+    
+    SOFT SKILLS
+    ───────────
+    {chr(10).join(['• ' + skill for skill in cv_data['skills']['soft']])}
+    
+    WORK EXPERIENCE
+    ───────────────
+    • {cv_data['experience']['role']}
+      {cv_data['experience']['organization']} | {cv_data['experience']['years']} years | {cv_data['experience']['work_type']}
+    
+    PROJECTS
+    ────────
+    {chr(10).join(['• ' + project for project in cv_data['projects']]) if cv_data['projects'] else '• No projects specified'}
+    
+    SUMMARY
+    ───────
+    Professional with {cv_data['experience']['years']} years of experience in {cv_data['experience']['role']}. 
+    Strong background in {cv_data['education']['field']} with expertise in {', '.join(cv_data['skills']['technical'][:3])}.
+    """
+    
+    return {'content': content}
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'my_app'
+
+    def ready(self):
+        from django.core.signals import setting_changed
+        from django.db.backends.signals import connection_created
+
+        from .llm import close_on_setting_change
+        from .metrics import install_query_counter
+        connection_created.connect(install_query_counter, dispatch_uid='cvgen_query_counter')
+        setting_changed.connect(close_on_setting_change, dispatch_uid='cvgen_openai_settings')
@@ -0,0 +1,177 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.urls import reverse
+
+from .ai import agenerate_cv_with_ai, astream_cv_with_ai, generate_template_cv
+from .forms import CVForm
+from .matching import atop_k_jobs
+from .pdf import RenderUnavailable, cv_pdf_key, get_cv_pdf, prerender_cv_pdf
+from .views import (
+    STEP_TITLES, TOTAL_STEPS, collect_generation, format_cv_data, get_form_for_step, pdf_not_modified, pdf_response,
+    pdf_template_choices, pdf_unavailable, requested_pdf_template, sse_event,
+)
+
+
+# Async versions of the stepper flow for ASGI deployments (CV_ASYNC_VIEWS).
+# Generation awaits AsyncOpenAI inline, so a worker holds many in-flight
+# generations at once instead of queueing them on the task pool.
+
+
+async def cv_stepper(request, step=1):
+
+    total_steps = TOTAL_STEPS
+
+    form_data = await request.session.aget('form_data')
+    if form_data is None:
+        form_data = {}
+        await request.session.aset('form_data', form_data)
+
+    if request.method == 'POST':
+        form = get_form_for_step(step, request.POST, initial_data=form_data)
+
+        if form.is_valid():
+
+            form_data.update(form.cleaned_data)
+            await request.session.aset('form_data', form_data)
+
+            if 'prev_step' in request.POST:
+                return redirect('cv_stepper', step=step-1)
+            elif step < total_steps:
+                return redirect('cv_stepper', step=step+1)
+            else:
+                return await generate_final_cv(request)
+        else:
+            print(f"Form errors at step {step}:", form.errors)
+    else:
+        form = get_form_for_step(step, initial_data=form_data)
+
+    progress = int((step / total_steps) * 100)
+
+    return render(request, 'cv_stepper.html', {
+        'form': form,
+        'current_step': step,
+        'total_steps': total_steps,
+        'progress': progress,
+        'step_key': form.step_key,
+        'step_titles': STEP_TITLES
+    })
+
+async def generate_final_cv(request):
+    """Generate CV after all steps are completed"""
+    form_data = await request.session.aget('form_data', {})
+
+    if not form_data:
+        messages.error(request, "No form data found. Please start over.")
+        return redirect('cv_stepper', step=1)
+
+    final_form = CVForm(form_data)
+
+    if not final_form.is_valid():
+        messages.error(request, "Please complete all required fields.")
+        return redirect('cv_stepper', step=1)
+
+    cv_data = format_cv_data(final_form.cleaned_data)
+    await request.session.aset('cv_data', cv_data)
+
+    if settings.CV_GENERATION_MODE == 'stream':
+        return await start_streaming(request)
+
+    ai_response = await agenerate_cv_with_ai(cv_data)
+    if ai_response and ai_response.get("content"):
+        cv_content = ai_response['content']
+    else:
+        cv_content = generate_template_cv(cv_data)['content']
+
+    await request.session.aset('generated_cv', cv_content)
+    await request.session.apop('form_data', None)
+    await sync_to_async(prerender_cv_pdf, thread_sensitive=False)(cv_content)
+    return redirect('cv_result')
+
+async def start_streaming(request, regenerate=False):
+    await request.session.apop('generated_cv', None)
+    await request.session.apop('form_data', None)
+    await request.session.aset('stream_regenerate', regenerate)
+    return redirect('cv_result')
+
+async def stream_cv(request):
+    """Server-Sent Events feed of the CV text as the model writes it"""
+    cv_data = await request.session.aget('cv_data', None)
+    if cv_data is None:
+        return HttpResponse(status=204)
+
+    cv_content = await request.session.aget('generated_cv', None)
+    regenerate = await request.session.aget('stream_regenerate', False)
+
+    async def events():
+        if cv_content is not None:
+            content = cv_content
+            yield sse_event('replace', {'text': content})
+        else:
+            parts = []
+            try:
+                async for delta in astream_cv_with_ai(cv_data, regenerate=regenerate):
+                    yield sse_event('delta' if parts else 'replace', {'text': delta})
+                    parts.append(delta)
+            except Exception as e:
+                print("OpenAI streaming error:", e)
+                parts = []
+            content = "".join(parts)
+            if not content:
+                content = generate_template_cv(cv_data)['content']
+                yield sse_event('replace', {'text': content})
+
+        await request.session.aset('generated_cv', content)
+        await request.session.apop('stream_regenerate', None)
+        await request.session.asave()
+        await sync_to_async(prerender_cv_pdf, thread_sensitive=False)(content)
+        yield sse_event('done', {'pdf_url': reverse('download_pdf')})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def cv_result(request):
+    if await request.session.ahas_key('generation_task'):
+        # Only tasks queued by the synchronous views end up here
+        task = await sync_to_async(collect_generation)(request)
+        if task is not None and not task.finished:
+            return redirect('cv_generating', task_id=task.id)
+
+    cv_content = await request.session.aget('generated_cv', None)
+    cv_data = await request.session.aget('cv_data', None)
+
+    stream_url = None
+    if cv_content is None and settings.CV_GENERATION_MODE == 'stream':
+        cv_content, stream_url = '', reverse('stream_cv')
+
+    if cv_content is None or cv_data is None:
+        return redirect('cv_form')
+    recommended = await atop_k_jobs(cv_data, k=10)
+    return render(request, 'cv_result.html', {
+        'cv_content': cv_content,
+        'stream_url': stream_url,
+        'recommended_jobs': recommended,
+        'pdf_templates': pdf_template_choices(),
+    })
+
+async def download_pdf(request):
+    cv_content = await request.session.aget('generated_cv', None)
+    if not cv_content:
+        return redirect('cv_form')
+
+    template = requested_pdf_template(request)
+    etag = f'"{cv_pdf_key(cv_content, template)}"'
+    not_modified = pdf_not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    # A cache miss renders with ReportLab, which is CPU-bound and touches no database
+    try:
+        pdf = await sync_to_async(get_cv_pdf, thread_sensitive=False)(cv_content, template)
+    except RenderUnavailable as e:
+        return pdf_unavailable(e)
+    return pdf_response(pdf, etag)
@@ -0,0 +1,211 @@
+import csv
+import io
+import json
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from django.db import close_old_connections
+from django.utils.text import slugify
+
+from .ai import generate_cv_with_ai, generate_template_cv
+from .forms import CHOICES, CVForm
+from .matching import top_k_jobs
+from .pdf import render_pdf
+from .views import format_cv_data
+
+
+MULTI_FIELDS = ('technical_skills', 'soft_skills', 'selected_projects')
+MULTI_VALUE_SEPARATOR = ';'
+# Choice fields accept either the stored code or the label shown in the form
+CHOICE_FIELDS = ('highest_qualification', 'field_of_study', 'technical_skills', 'soft_skills',
+                 'selected_projects', 'work_type')
+
+
+def coerce_record(record):
+    """
+    Map one bulk record onto CVForm data: multi-valued fields may be lists
+    or ';'-separated strings (as in a CSV column), and choices may be given
+    by label.
+    """
+    data = {}
+    for field, value in record.items():
+        if value is None:
+            continue
+        if field in MULTI_FIELDS:
+            if isinstance(value, str):
+                value = value.split(MULTI_VALUE_SEPARATOR)
+            value = [str(item).strip() for item in value if str(item).strip()]
+        elif isinstance(value, str):
+            value = value.strip()
+
+        if field in CHOICE_FIELDS:
+            if isinstance(value, list):
+                value = [CHOICES.code(field, item) for item in value]
+            elif isinstance(value, str):
+                value = CHOICES.code(field, value)
+        data[field] = value
+    return data
+
+
+def read_records(path):
+    """Records from a .csv, .jsonl or .json file (a list or {"records": [...]})"""
+    path = Path(path)
+    with path.open(newline='', encoding='utf-8') as f:
+        if path.suffix.lower() == '.csv':
+            return list(csv.DictReader(f))
+        if path.suffix.lower() == '.jsonl':
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data['records'] if isinstance(data, dict) else data
+
+
+class DirectoryWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def write(self, name, data):
+        target = self.path / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+    def close(self):
+        pass
+
+
+class ArchiveWriter:
+    """Writes into a zip archive; ``target`` is a path or a binary file object"""
+
+    def __init__(self, target):
+        self.archive = zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, name, data):
+        # PDFs are compressed already
+        compression = zipfile.ZIP_STORED if name.endswith('.pdf') else zipfile.ZIP_DEFLATED
+        self.archive.writestr(name, data, compress_type=compression)
+
+    def close(self):
+        self.archive.close()
+
+
+def writer_for(output):
+    output = str(output)
+    return ArchiveWriter(output) if output.endswith('.zip') else DirectoryWriter(output)
+
+
+def process_record(index, record, k=10, pdf=True, template=None, deadline=None):
+    """
+    Validate, generate, render and match one record; never raises. Past
+    ``deadline`` (a time.monotonic() value) the template CV is used instead
+    of the model, and the API call never runs beyond it.
+    """
+    try:
+        form = CVForm(coerce_record(record))
+        if not form.is_valid():
+            return {'index': index, 'status': 'invalid',
+                    'errors': {field: list(errors) for field, errors in form.errors.items()}}
+
+        cv_data = format_cv_data(form.cleaned_data)
+        timeout = None if deadline is None else deadline - time.monotonic()
+        ai_response = generate_cv_with_ai(cv_data, timeout=timeout) if timeout is None or timeout > 0 else None
+        if ai_response and ai_response.get("content"):
+            content, source = ai_response['content'], 'ai'
+        else:
+            content, source = generate_template_cv(cv_data)['content'], 'template'
+
+        recommendations = [
+            {'job_id': item['job'].id, 'title': item['job'].title, 'company': item['job'].company,
+             'location': item['job'].location, 'score': item['score']}
+            for item in top_k_jobs(cv_data, k=k)
+        ]
+        return {
+            'index': index,
+            'status': 'ok',
+            'name': cv_data['basic_info']['name'],
+            'email': cv_data['basic_info']['email'],
+            'source': source,
+            'content': content,
+            'pdf': render_pdf(content, template, block=True) if pdf else None,
+            'recommendations': recommendations,
+        }
+    except Exception as e:
+        print(f"Batch record {index} failed:", e)
+        return {'index': index, 'status': 'failed', 'errors': {'__all__': [str(e)]}}
+    finally:
+        close_old_connections()
+
+
+def run_batch(records, writer=None, concurrency=8, k=10, template=None, timeout=None):
+    """
+    Generate CVs for ``records`` on ``concurrency`` worker threads.
+
+    Each valid record yields ``cvs/<n>-<name>.pdf`` and ``cvs/<n>-<name>.txt``
+    in ``writer``; ``recommendations.json`` and ``report.json`` are written
+    once every record is done, PDFs in ``template`` (PDF_DEFAULT_TEMPLATE
+    when None). Without a writer nothing is rendered or written. Invalid or
+    failing records are listed in the report and do not stop the rest of
+    the batch. With ``timeout`` (seconds) model calls stop at that point and
+    the remaining records get template CVs. Returns the report, with
+    per-record results.
+    """
+    started = time.perf_counter()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='cvgen-batch') as pool:
+        futures = [
+            pool.submit(process_record, index, record, k, writer is not None, template, deadline)
+            for index, record in enumerate(records, start=1)
+        ]
+        # Only this thread touches the writer, so archives need no locking
+        for future in as_completed(futures):
+            result = future.result()
+            if result['status'] == 'ok' and writer is not None:
+                stem = f"cvs/{result['index']:04d}-{slugify(result['name']) or 'cv'}"
+                writer.write(f"{stem}.pdf", result.pop('pdf'))
+                writer.write(f"{stem}.txt", result['content'].encode())
+                result['pdf_file'] = f"{stem}.pdf"
+            results.append(result)
+    elapsed = time.perf_counter() - started
+
+    results.sort(key=lambda result: result['index'])
+    succeeded = [result for result in results if result['status'] == 'ok']
+    report = {
+        'total': len(results),
+        'succeeded': len(succeeded),
+        'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+        'failed': sum(1 for result in results if result['status'] == 'failed'),
+        'sources': {
+            source: sum(1 for result in succeeded if result['source'] == source)
+            for source in ('ai', 'template')
+        },
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'cvs_per_sec': round(len(succeeded) / elapsed, 2) if elapsed else None,
+        'errors': [
+            {'index': result['index'], 'status': result['status'], 'errors': result['errors']}
+            for result in results if result['status'] != 'ok'
+        ],
+    }
+
+    if writer is not None:
+        writer.write('recommendations.json', json.dumps([
+            {key: result[key] for key in ('index', 'name', 'email', 'pdf_file', 'recommendations')}
+            for result in succeeded
+        ], indent=2).encode())
+        writer.write('report.json', json.dumps(report, indent=2).encode())
+    for result in succeeded:
+        result.pop('pdf', None)
+    report['results'] = results
+    return report
+
+
+def run_batch_to_archive(records, concurrency=8, k=10, timeout=None):
+    """run_batch into an in-memory zip; returns (report, archive bytes)"""
+    buffer = io.BytesIO()
+    writer = ArchiveWriter(buffer)
+    try:
+        report = run_batch(records, writer, concurrency=concurrency, k=k, timeout=timeout)
+    finally:
+        writer.close()
+    return report, buffer.getvalue()
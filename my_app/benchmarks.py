@@ -0,0 +1,386 @@
+import asyncio
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django import forms
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .ai import generate_template_cv
+from .fakellm import FakeResponsesServer
+from .forms import CHOICES, CVForm, CV_STEPS
+from .matching import DEFAULT_TOP_K, JobCorpus, TopK, calculate_similarity, recommendation_order
+from .models import jobs
+from .pdf import render_cv_pdf
+from .pdf_layouts import PDF_TEMPLATES
+from .views import format_cv_data, get_form_for_step
+
+
+# Suites run by ``manage.py benchmark``. Each returns a JSON-serializable dict.
+
+STEPPER_STEPS = 5
+
+
+def stepper_posts(index):
+    """Valid POST data for the five stepper steps of benchmark user ``index``"""
+    return [
+        {'name': f'Bench User {index}', 'email': f'user{index}@example.com',
+         'phone': '9876543210', 'address': 'Pune, Maharashtra'},
+        {'highest_qualification': 'bachelor', 'field_of_study': 'cs',
+         'institution': 'Pune University', 'passing_year': 2022, 'grade': 'A'},
+        {'technical_skills': ['python', 'django', 'sql'], 'soft_skills': ['communication', 'teamwork']},
+        {'selected_projects': ['web'], 'projects': ''},
+        {'years_experience': 2, 'work_type': 'full_time', 'role': 'Developer', 'organization': 'Acme'},
+    ]
+
+
+def _timed(label, run, users):
+    started = time.perf_counter()
+    errors = run()
+    elapsed = time.perf_counter() - started
+    requests = users * (STEPPER_STEPS + 1)
+    return {
+        'server': label,
+        'users': users,
+        'requests': requests,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_sec': round(requests / elapsed, 1),
+        'cvs_per_sec': round(users / elapsed, 2),
+    }
+
+
+def _walk(client, index):
+    for step, data in enumerate(stepper_posts(index), start=1):
+        response = client.post(reverse('cv_stepper', kwargs={'step': step}), data)
+    response = client.get(reverse('cv_result'))
+    return response.status_code != 200
+
+
+async def _awalk(client, index):
+    for step, data in enumerate(stepper_posts(index), start=1):
+        response = await client.post(reverse('cv_stepper', kwargs={'step': step}), data)
+    response = await client.get(reverse('cv_result'))
+    return response.status_code != 200
+
+
+def bench_views(users=50, concurrency=10, latency=0.2, offset=0):
+    """
+    Full stepper walk per user against the sync views served by
+    ``concurrency`` worker threads (WSGI) and the async views served from
+    one event loop (ASGI), with the model behind a fake Responses server
+    answering after ``latency`` seconds. Every user submits a different
+    name so the generation cache never answers.
+    """
+    def wsgi():
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return sum(pool.map(lambda index: _walk(Client(), index), range(offset, offset + users)))
+
+    def asgi():
+        async def run_all():
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(index):
+                async with gate:
+                    return await _awalk(AsyncClient(), index)
+
+            return sum(await asyncio.gather(*(one(index) for index in range(offset + users, offset + 2 * users))))
+
+        return asyncio.run(run_all())
+
+    with FakeResponsesServer(latency=latency) as server:
+        common = {'OPENAI_BASE_URL': server.base_url, 'CV_GENERATION_MODE': 'sync'}
+        with override_settings(ROOT_URLCONF='my_app.urls', **common):
+            wsgi_result = _timed('wsgi', wsgi, users)
+        with override_settings(ROOT_URLCONF='my_app.urls_async', **common):
+            asgi_result = _timed('asgi', asgi, users)
+
+    return {
+        'suite': 'views',
+        'concurrency': concurrency,
+        'llm_latency': latency,
+        'llm_requests': server.requests,
+        'results': [wsgi_result, asgi_result],
+    }
+
+
+def _ms(samples):
+    return {
+        'p50_ms': round(statistics.median(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1),
+    }
+
+
+def bench_stream(users=20, latency=0.5, token_interval=0.02, offset=0):
+    """
+    Time to first byte of a regenerated CV: the blocking 'sync' mode answers
+    only once the whole text is written, the 'stream' mode as soon as the
+    first token arrives. Users run one after another so the numbers are
+    latencies, not throughput.
+    """
+    first_byte, complete = {'sync': [], 'stream': []}, {'sync': [], 'stream': []}
+
+    with FakeResponsesServer(latency=latency, token_interval=token_interval) as server:
+        for mode in ('sync', 'stream'):
+            with override_settings(ROOT_URLCONF='my_app.urls', OPENAI_BASE_URL=server.base_url,
+                                   CV_GENERATION_MODE=mode):
+                for index in range(offset, offset + users):
+                    client = Client()
+                    _walk(client, index)
+
+                    started = time.perf_counter()
+                    response = client.post(reverse('regenerate_cv'))
+                    if mode == 'stream':
+                        response = client.get(reverse('stream_cv'))
+                        chunks = iter(response.streaming_content)
+                        next(chunks)
+                        first_byte[mode].append(time.perf_counter() - started)
+                        for _ in chunks:
+                            pass
+                    else:
+                        first_byte[mode].append(time.perf_counter() - started)
+                    complete[mode].append(time.perf_counter() - started)
+
+    return {
+        'suite': 'stream',
+        'users': users,
+        'llm_latency': latency,
+        'token_interval': token_interval,
+        'results': [
+            {'mode': mode, 'first_byte': _ms(first_byte[mode]), 'complete': _ms(complete[mode])}
+            for mode in ('sync', 'stream')
+        ],
+    }
+
+
+def sample_cv_text(index, projects=3):
+    """A CV in the format the generation prompt asks for; more ``projects`` make it longer"""
+    project_lines = '\n'.join(
+        f"Project {n}: built a Django service that ingests job listings, ranks them against candidate "
+        f"skills and renders reports, cutting manual screening time by {10 + n % 40} percent."
+        for n in range(1, projects + 1)
+    )
+    return (
+        f"Bench User {index}\nPune, Maharashtra\n\n"
+        f"Email: user{index}@example.com\nPhone: 9876543210\n\n"
+        "Summary\n"
+        "Software developer with two years of experience building web applications in Python and Django. "
+        "Comfortable across the stack, from SQL schema design to deployment on AWS, and keen to grow into "
+        "a backend engineering role.\n\n"
+        "Education\nBachelor of Technology in Computer Science\nPune University\nPassing Year: 2022\nGrade: A\n\n"
+        "Skills\nTechnical Skills: Python, Django, SQL, AWS, Docker, Git\n"
+        "Soft Skills: Communication, Teamwork, Problem Solving\n\n"
+        f"Projects\n{project_lines}\n\n"
+        "Work Experience\nDeveloper, Acme (2 years, full time)\n"
+    )
+
+
+def bench_pdf(renders=50, templates=None):
+    """
+    Pages per second of each PDF template, rendered in this thread: parse,
+    layout and ReportLab output, over an even mix of one-page CVs and long
+    ones spanning several pages. Nothing is cached between renders.
+    """
+    texts = [sample_cv_text(index, projects=3 if index % 2 else 60) for index in range(renders)]
+    results = []
+    for name in templates or sorted(PDF_TEMPLATES):
+        pages = sum(len(PDF_TEMPLATES[name].layout(text)) for text in texts)
+        started = time.perf_counter()
+        for text in texts:
+            render_cv_pdf(text, name)
+        elapsed = time.perf_counter() - started
+        results.append({
+            'template': name,
+            'renders': renders,
+            'pages': pages,
+            'seconds': round(elapsed, 3),
+            'pages_per_sec': round(pages / elapsed, 1),
+            'ms_per_cv': round(elapsed / renders * 1000, 2),
+        })
+    return {'suite': 'pdf', 'results': results}
+
+
+def _legacy_step_form(step, data=None, initial_data=None):
+    # How steps were built before STEP_FORMS: a whole CVForm per request to copy a few fields from
+    form = forms.Form(data, initial=initial_data)
+    full_form = CVForm()
+    for field in CV_STEPS[step - 1][2]:
+        form.fields[field] = full_form.fields[field]
+    return form
+
+
+def bench_forms(iterations=2000):
+    """
+    Cost of building and validating one stepper step form, averaged over
+    every step: the precompiled STEP_FORMS classes against copying fields
+    out of a full CVForm on every request.
+    """
+    posts = stepper_posts(0)
+    results = []
+    for label, build in (('legacy', _legacy_step_form), ('precompiled', get_form_for_step)):
+        started = time.perf_counter()
+        for n in range(iterations):
+            step = n % len(posts) + 1
+            build(step, posts[step - 1], initial_data=posts[0]).is_valid()
+        elapsed = time.perf_counter() - started
+        results.append({
+            'forms': label,
+            'iterations': iterations,
+            'seconds': round(elapsed, 3),
+            'us_per_form': round(elapsed / iterations * 1e6, 1),
+        })
+    return {'suite': 'forms', 'results': results}
+
+
+# Job counts of the synthetic corpora measured by bench_core
+CORPUS_SIZES = (1000, 100000, 1000000)
+# Skills found in postings but not offered by the form, as in a real jobs table
+EXTRA_SKILLS = tuple(f"Skill {n}" for n in range(2000))
+EDUCATION_REQUIREMENTS = (None, '', "Bachelor's Degree", "Master's Degree in Computer Science", 'PhD',
+                          'Diploma or Bachelor')
+
+
+def synthetic_job_rows(count, seed=0):
+    """
+    (id, skills, soft_skills, education_required, experience_required) rows
+    for ``count`` jobs: mostly form skills, some from a long tail of others.
+    """
+    rng = random.Random(seed)
+    technical = [label for _, label in CHOICES.choices('technical_skills')]
+    soft = [label for _, label in CHOICES.choices('soft_skills')]
+    rows = []
+    for job_id in range(1, count + 1):
+        skills = rng.sample(technical, rng.randint(1, 6)) + rng.sample(EXTRA_SKILLS, rng.randint(0, 3))
+        rows.append((
+            job_id, skills, rng.sample(soft, rng.randint(0, 4)),
+            rng.choice(EDUCATION_REQUIREMENTS), rng.choice((None, 0, 1, 2, 3, 5, 8, 10)),
+        ))
+    return rows
+
+
+def synthetic_form_data(index, rng):
+    """CVForm cleaned_data of a random but valid applicant"""
+    def codes(field, low, high):
+        return [code for code, _ in rng.sample(CHOICES.choices(field), rng.randint(low, high))]
+
+    return {
+        'name': f'Bench User {index}', 'email': f'user{index}@example.com',
+        'phone': '9876543210', 'address': 'Pune, Maharashtra',
+        'highest_qualification': rng.choice(CHOICES.choices('highest_qualification'))[0],
+        'field_of_study': rng.choice(CHOICES.choices('field_of_study'))[0],
+        'institution': 'Pune University', 'passing_year': rng.randint(2005, 2025), 'grade': 'A',
+        'technical_skills': codes('technical_skills', 0, 8),
+        'soft_skills': codes('soft_skills', 1, 4),
+        'selected_projects': codes('selected_projects', 0, 3),
+        'projects': '\n'.join(f'Side project {n}' for n in range(rng.randint(0, 2))),
+        'years_experience': rng.choice((0, 0, 1, 2, 3, 5, 8, 12)),
+        'work_type': rng.choice(CHOICES.choices('work_type'))[0],
+        'role': 'Developer', 'organization': 'Acme',
+    }
+
+
+def _measure(run, calls):
+    """Throughput of ``calls`` calls of ``run(n)``, and the peak memory traced during one more"""
+    started = time.perf_counter()
+    for n in range(calls):
+        run(n)
+    elapsed = time.perf_counter() - started
+    # Traced separately: tracemalloc slows the calls it watches
+    tracemalloc.start()
+    try:
+        run(0)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'calls': calls,
+        'seconds': round(elapsed, 4),
+        'calls_per_sec': round(calls / elapsed, 1) if elapsed else None,
+        'ms_per_call': round(elapsed / calls * 1000, 4),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _download_pdfs(texts):
+    """One logged-in client per CV text; returns a run(n) downloading the PDF of text n"""
+    clients = []
+    for text in texts:
+        client = Client()
+        session = client.session
+        session['generated_cv'] = text
+        session.save()
+        clients.append(client)
+    url = reverse('download_pdf')
+
+    def run(n):
+        response = clients[n % len(clients)].get(url)
+        assert response.status_code == 200, response.status_code
+        b''.join(response.streaming_content)
+    return run
+
+
+def bench_core(sizes=CORPUS_SIZES, cvs=20, calls=200, seed=0, offset=0):
+    """
+    Throughput and peak memory of the core code paths on synthetic data:
+    encoding a corpus of each size in ``sizes``, ranking it for ``cvs``
+    random applicants like recommended_jobs and top_k_jobs, and, independent
+    of the corpus, calculate_similarity, format_cv_data,
+    generate_template_cv and download_pdf. The corpora live in memory: the
+    database parts of the recommendation views (loading the rows, fetching
+    the recommended jobs) are not included.
+    """
+    rng = random.Random(seed)
+    form_data = [synthetic_form_data(index, rng) for index in range(cvs)]
+    cv_data = [format_cv_data(data) for data in form_data]
+    results = []
+
+    def record(benchmark, measured, **extra):
+        results.append({'benchmark': benchmark, **extra, **measured})
+
+    for size in sizes:
+        rows = synthetic_job_rows(size, seed)
+        corpus = JobCorpus.from_rows(rows)
+        corpus_kb = round(sum(array.nbytes for array in corpus.arrays().values()) / 1024, 1)
+        record('encode_corpus', _measure(lambda n: JobCorpus.from_rows(rows), 1), jobs=size, corpus_kb=corpus_kb)
+        del rows
+
+        record('recommended_jobs', _measure(lambda n: recommendation_order(corpus, cv_data[n % cvs]), cvs), jobs=size)
+
+        def top_k(n):
+            selector = TopK(DEFAULT_TOP_K)
+            selector.push_scores(corpus.ids, corpus.score(cv_data[n % cvs]))
+            return selector.results()
+        record('top_k_jobs', _measure(top_k, cvs), jobs=size)
+
+    sample = [jobs(id=row[0], skills=row[1], soft_skills=row[2], education_required=row[3],
+                   experience_required=row[4]) for row in synthetic_job_rows(calls, seed)]
+    record('calculate_similarity',
+           _measure(lambda n: calculate_similarity(cv_data[n % cvs], sample[n % calls]), calls * 10))
+    record('format_cv_data', _measure(lambda n: format_cv_data(form_data[n % cvs]), calls * 10))
+    record('generate_template_cv', _measure(lambda n: generate_template_cv(cv_data[n % cvs]), calls * 10))
+
+    # ``offset`` keeps the CVs out of a PDF cache left over from earlier runs
+    texts = [sample_cv_text(offset + index, projects=3 + index % 10) for index in range(calls)]
+    with override_settings(ROOT_URLCONF='my_app.urls', PDF_PRERENDER=False, PDF_RENDER_BACKEND='inline'):
+        download = _download_pdfs(texts)
+        # First pass renders every CV, the second is answered from the PDF cache
+        record('download_pdf', _measure(download, calls), cache='cold')
+        record('download_pdf', _measure(download, calls), cache='warm')
+
+    return {
+        'suite': 'core',
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'seed': seed,
+        'cvs': cvs,
+        'results': results,
+    }
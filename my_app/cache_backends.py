@@ -0,0 +1,28 @@
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class BoundedLocMemCache(LocMemCache):
+    """
+    LocMemCache that also bounds the total size of its pickled values:
+    OPTIONS['MAX_BYTES'] (0 for no bound). Least recently used entries are
+    evicted first, so large values such as PDFs cannot hold
+    MAX_ENTRIES times the largest entry in every process.
+    """
+
+    def __init__(self, name, params):
+        options = dict(params.get('OPTIONS', {}))
+        self._max_bytes = int(options.pop('MAX_BYTES', 0) or 0)
+        super().__init__(name, {**params, 'OPTIONS': options})
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        super()._set(key, value, timeout)
+        if not self._max_bytes:
+            return
+        # A few hundred entries at most, so summing on each write is cheap
+        total = sum(len(pickled) for pickled in self._cache.values())
+        # The newest key is first; popitem() takes the least recently used from the end
+        while total > self._max_bytes and len(self._cache) > 1:
+            evicted, pickled = self._cache.popitem()
+            del self._expire_info[evicted]
+            total -= len(pickled)
@@ -0,0 +1,138 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# A stand-in for the OpenAI Responses API used by the benchmark and tests:
+# point OPENAI_BASE_URL at ``server.base_url`` and every request is answered
+# with ``text`` after ``latency`` seconds, without leaving the machine.
+# Streaming requests get the first token after ``latency`` and one more
+# word every ``token_interval`` seconds; plain requests wait for the whole
+# text at that same pace. The next ``fail_requests`` requests, and a random
+# ``error_rate`` share of all others, are answered with a 500 error.
+
+FAKE_CV_TEXT = "Jane Doe\nPune, Maharashtra\n\nSummary\nGenerated by the fake Responses server."
+
+
+def response_body(text, model, status="completed"):
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": status,
+        "model": model,
+        "output": [] if status != "completed" else [{
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+class FakeResponsesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.rstrip("/") not in ("/v1/responses", "/responses"):
+            return self._send(404, {"error": {"message": "Not found"}})
+
+        with server.lock:
+            server.requests += 1
+            failing = server.fail_requests > 0
+            server.fail_requests -= failing
+            failing = failing or random.random() < server.error_rate
+            server.failures += failing
+        if failing:
+            return self._send(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+        time.sleep(server.latency)
+        if payload.get("stream"):
+            return self._stream(server.text, payload.get("model", ""))
+        time.sleep(server.token_interval * (len(server.text.split(" ")) - 1))
+        self._send(200, response_body(server.text, payload.get("model", "")))
+
+    def _stream(self, text, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        item_id = f"msg_{uuid.uuid4().hex}"
+        words = text.split(" ")
+        events = [{"type": "response.created", "response": response_body("", model, status="in_progress")}]
+        events += [
+            {"type": "response.output_text.delta", "item_id": item_id, "output_index": 0,
+             "content_index": 0, "delta": word if index == 0 else " " + word, "logprobs": []}
+            for index, word in enumerate(words)
+        ]
+        events.append({"type": "response.completed", "response": response_body(text, model)})
+
+        for sequence, event in enumerate(events):
+            if sequence > 1:
+                time.sleep(self.server.token_interval)
+            event["sequence_number"] = sequence
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeResponsesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, text=FAKE_CV_TEXT, token_interval=0.0, error_rate=0.0, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeResponsesHandler)
+        self.latency = latency
+        self.token_interval = token_interval
+        self.text = text
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.fail_requests = 0
+        self.error_rate = error_rate
+        self.failures = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
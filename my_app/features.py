@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .matching import CORPUS_CHUNK_SIZE, JOB_MATCH_FIELDS, JobCorpus
+from .models import jobs
+
+
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+CHECKSUM_FILE = 'checksums.npy'
+
+
+def row_checksum(row):
+    """Checksum of the matching-relevant columns of a JOB_MATCH_FIELDS row (id excluded)"""
+    digest = hashlib.blake2b(repr(tuple(row[1:])).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class JobFeatureStore:
+    """
+    Normalized job features persisted as memory-mapped ``.npy`` files.
+
+    Each refresh writes a new generation directory and then atomically
+    swaps the ``CURRENT`` pointer, so readers never see a partial write.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._loaded = None
+
+    def current(self):
+        try:
+            return (self.path / CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        """Memory-mapped JobCorpus of the current generation, or None if empty"""
+        generation = self.current()
+        if generation is None:
+            return None
+        with self._lock:
+            if self._loaded is None or self._loaded.version != generation:
+                self._loaded = self._read(generation, mmap_mode='r')[0]
+            return self._loaded
+
+    def read_state(self):
+        """(corpus, checksums, meta) of the current generation, loaded in memory"""
+        generation = self.current()
+        if generation is None:
+            return None
+        return self._read(generation, mmap_mode=None)
+
+    def _read(self, generation, mmap_mode):
+        directory = self.path / generation
+        meta = json.loads((directory / META_FILE).read_text())
+        arrays = {
+            name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode)
+            for name in JobCorpus.ARRAY_FIELDS
+        }
+        corpus = JobCorpus.from_arrays(arrays, meta['vocabulary'], meta['education_values'], version=generation)
+        checksums = np.load(directory / CHECKSUM_FILE, mmap_mode=mmap_mode)
+        return corpus, checksums, meta
+
+    def save(self, corpus, checksums, watermark):
+        """Write a new generation and make it current"""
+        previous = self.current()
+        generation = uuid.uuid4().hex
+        directory = self.path / generation
+        directory.mkdir(parents=True)
+        for name, array in corpus.arrays().items():
+            np.save(directory / f'{name}.npy', np.ascontiguousarray(array))
+        np.save(directory / CHECKSUM_FILE, np.ascontiguousarray(checksums, dtype=np.int64))
+        (directory / META_FILE).write_text(json.dumps({
+            'vocabulary': corpus.vocabulary_list(),
+            'education_values': corpus.education_values,
+            'watermark': watermark.isoformat() if watermark else None,
+            'count': len(corpus),
+        }))
+
+        pointer = self.path / f'{CURRENT_FILE}.{generation}'
+        pointer.write_text(generation)
+        os.replace(pointer, self.path / CURRENT_FILE)
+        self._cleanup(keep={generation, previous})
+        return generation
+
+    def _cleanup(self, keep):
+        # The previous generation survives one more refresh for readers that
+        # resolved CURRENT just before the swap
+        for entry in self.path.iterdir():
+            if entry.is_dir() and entry.name not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+_store_lock = threading.Lock()
+_stores = {}
+
+
+def get_feature_store():
+    """The JobFeatureStore configured by JOB_FEATURE_STORE, or None when disabled"""
+    path = settings.JOB_FEATURE_STORE
+    if not path:
+        return None
+    with _store_lock:
+        if path not in _stores:
+            _stores[path] = JobFeatureStore(path)
+        return _stores[path]
+
+
+def _stream_rows(queryset):
+    return (
+        queryset.order_by('id')
+        .values_list(*JOB_MATCH_FIELDS, 'created_at')
+        .iterator(chunk_size=CORPUS_CHUNK_SIZE)
+    )
+
+
+def _latest(current, value):
+    if value is None:
+        return current
+    return value if current is None or value > current else current
+
+
+def refresh_feature_store(store, full_scan=False, rebuild=False):
+    """
+    Bring ``store`` up to date with the jobs table and return a stats dict.
+
+    By default only rows at or after the stored ``created_at`` watermark are
+    read; ``full_scan`` compares every row's checksum so in-place edits and
+    deletions are detected too. A row count mismatch after an incremental
+    pass triggers a full scan automatically.
+    """
+    state = None if rebuild else store.read_state()
+
+    if state is None:
+        rows, checksums, watermark = [], [], None
+        for row in _stream_rows(jobs.objects.all()):
+            rows.append(row[:-1])
+            checksums.append(row_checksum(row[:-1]))
+            watermark = _latest(watermark, row[-1])
+        corpus = JobCorpus.from_rows(rows)
+        store.save(corpus, np.array(checksums, dtype=np.int64), watermark)
+        return {'mode': 'rebuild', 'jobs': len(corpus), 'changed': len(corpus), 'removed': 0}
+
+    corpus, checksums, meta = state
+    known = dict(zip(corpus.ids.tolist(), checksums.tolist()))
+    watermark = meta['watermark']
+    if watermark is not None:
+        watermark = jobs._meta.get_field('created_at').to_python(watermark)
+
+    if full_scan or watermark is None:
+        queryset, mode = jobs.objects.all(), 'full_scan'
+    else:
+        queryset, mode = jobs.objects.filter(created_at__gte=watermark), 'incremental'
+
+    changed, changed_checksums, seen = [], [], set()
+    for row in _stream_rows(queryset):
+        job_row, checksum = row[:-1], row_checksum(row[:-1])
+        seen.add(job_row[0])
+        watermark = _latest(watermark, row[-1])
+        if known.get(job_row[0]) != checksum:
+            changed.append(job_row)
+            changed_checksums.append(checksum)
+
+    removed = set(known) - seen if mode == 'full_scan' else set()
+    expected = len(known) - len(removed) + sum(1 for row in changed if row[0] not in known)
+    if mode == 'incremental' and expected != jobs.objects.count():
+        return refresh_feature_store(store, full_scan=True)
+
+    if not changed and not removed:
+        return {'mode': mode, 'jobs': len(corpus), 'changed': 0, 'removed': 0}
+
+    dropped = removed | {row[0] for row in changed}
+    keep = np.flatnonzero(~np.isin(corpus.ids, np.fromiter(dropped, dtype=np.int64, count=len(dropped))))
+    kept = corpus.take(keep)
+    updated = kept.extended(changed)
+
+    merged_checksums = dict(zip(kept.ids.tolist(), checksums[keep].tolist()))
+    merged_checksums.update((row[0], checksum) for row, checksum in zip(changed, changed_checksums))
+    store.save(updated, np.array([merged_checksums[job_id] for job_id in updated.ids.tolist()], dtype=np.int64), watermark)
+    return {'mode': mode, 'jobs': len(updated), 'changed': len(changed), 'removed': len(removed)}
@@ -1,3 +1,6 @@
+import copy
+from types import MappingProxyType
+
 from django import forms
 
 QUALIFICATION_CHOICES = [
@@ -71,6 +74,94 @@ WORK_TYPE_CHOICES = [
     ('remote', 'Remote'),
 ]
 
+def normalize_token(value):
+    """Matching token of a skill or other choice label: lower case, outer spaces removed"""
+    return str(value).lower().strip()
+
+
+class ChoiceRegistry:
+    """
+    Read-only lookups over the CVForm choice lists, built once at import:
+    code -> label, code or label in any case -> code, label -> matching
+    token, and fixed integer ids for the skill tokens.
+    """
+
+    def __init__(self, fields, skill_fields):
+        self._choices = MappingProxyType({field: tuple(choices) for field, choices in fields.items()})
+        self._labels = MappingProxyType({
+            field: MappingProxyType(dict(choices)) for field, choices in self._choices.items()
+        })
+        self._codes = MappingProxyType({
+            field: MappingProxyType({key.lower(): code for code, label in choices for key in (code, label)})
+            for field, choices in self._choices.items()
+        })
+        self._tokens = MappingProxyType({
+            label: normalize_token(label) for choices in self._choices.values() for _, label in choices
+        })
+
+        skill_tokens = []
+        for field in skill_fields:
+            for _, label in self._choices[field]:
+                if self._tokens[label] not in skill_tokens:
+                    skill_tokens.append(self._tokens[label])
+        self.skill_tokens = tuple(skill_tokens)
+        self._skill_ids = MappingProxyType({token: skill_id for skill_id, token in enumerate(skill_tokens)})
+        self._label_skill_ids = MappingProxyType({
+            label: self._skill_ids[self._tokens[label]]
+            for field in skill_fields for _, label in self._choices[field]
+        })
+
+    def choices(self, field):
+        return self._choices[field]
+
+    def label(self, field, code):
+        """Label of ``code``, None if ``field`` has no such choice"""
+        return self._labels[field].get(code)
+
+    def labels(self, field, codes):
+        labels = self._labels[field]
+        return [labels.get(code) for code in codes]
+
+    def code(self, field, value):
+        """Code for a code or label of ``field`` in any case; other values are returned as they are"""
+        return self._codes[field].get(value.lower(), value)
+
+    def token(self, label):
+        token = self._tokens.get(label)
+        return token if token is not None else normalize_token(label)
+
+    def skill_id(self, token):
+        return self._skill_ids.get(token)
+
+    def skill_ids(self, labels):
+        """
+        (ids of the known skills among ``labels``, set of tokens of the
+        others); together they are the distinct tokens of ``labels``
+        """
+        known, other = set(), set()
+        for label in labels:
+            if not label:
+                continue
+            skill_id = self._label_skill_ids.get(label)
+            if skill_id is None:
+                token = normalize_token(label)
+                skill_id = self._skill_ids.get(token)
+                if skill_id is None:
+                    other.add(token)
+                    continue
+            known.add(skill_id)
+        return known, other
+
+
+CHOICES = ChoiceRegistry({
+    'highest_qualification': QUALIFICATION_CHOICES,
+    'field_of_study': FIELD_CHOICES,
+    'technical_skills': TECH_SKILLS,
+    'soft_skills': SOFT_SKILLS,
+    'selected_projects': PROJECT_CHOICES,
+    'work_type': WORK_TYPE_CHOICES,
+}, skill_fields=('technical_skills', 'soft_skills'))
+
 class CVForm(forms.Form):
     name = forms.CharField(max_length=100, required=True)
     email = forms.EmailField(required=True)
@@ -78,12 +169,12 @@ class CVForm(forms.Form):
     address = forms.CharField(widget=forms.Textarea, required=True)
     
     highest_qualification = forms.ChoiceField(
-        choices=QUALIFICATION_CHOICES, 
+        choices=CHOICES.choices('highest_qualification'), 
         required=True
     )
 
     field_of_study = forms.ChoiceField(
-        choices=FIELD_CHOICES, 
+        choices=CHOICES.choices('field_of_study'), 
         required=True
     )
     institution = forms.CharField(max_length=200, required=True)
@@ -95,18 +186,18 @@ class CVForm(forms.Form):
     grade = forms.CharField(max_length=10, required=True)
     
     technical_skills = forms.MultipleChoiceField(
-        choices=TECH_SKILLS,
+        choices=CHOICES.choices('technical_skills'),
         widget=forms.CheckboxSelectMultiple,
         required=False
     )
     soft_skills = forms.MultipleChoiceField(
-        choices=SOFT_SKILLS,
+        choices=CHOICES.choices('soft_skills'),
         widget=forms.CheckboxSelectMultiple,
         required=True
     )
 
     selected_projects = forms.MultipleChoiceField(
-        choices=PROJECT_CHOICES,
+        choices=CHOICES.choices('selected_projects'),
         widget=forms.CheckboxSelectMultiple,
         required=False,
         help_text="Select the types of projects you have worked on"
@@ -130,7 +221,7 @@ class CVForm(forms.Form):
         required=True
     )
     work_type = forms.ChoiceField(
-        choices=WORK_TYPE_CHOICES,
+        choices=CHOICES.choices('work_type'),
         required=False
     )
     role = forms.CharField(max_length=100, required=False)
@@ -140,17 +231,41 @@ class CVForm(forms.Form):
 
 
 class CVStepForm(forms.Form):
+    """Some of CVForm's fields; the stepper uses the per-step subclasses in STEP_FORMS"""
+
+    # Filled in by step_form_class
+    step_key = None
+    step_title = None
 
     def __init__(self, *args, **kwargs):
-        fields_to_include = kwargs.pop('fields', [])
+        fields_to_include = kwargs.pop('fields', None)
         super().__init__(*args, **kwargs)
+        if fields_to_include is not None:
+            self.fields = {field: copy.deepcopy(CVForm.base_fields[field]) for field in fields_to_include}
+
+
+# The stepper, in order: (key, title, CVForm fields). Steps can be added or
+# reordered here; cv_stepper.html shows each step's fields by its key.
+CV_STEPS = (
+    ('personal', "Personal Info", ('name', 'email', 'phone', 'address')),
+    ('education', "Education", ('highest_qualification', 'field_of_study', 'institution', 'passing_year', 'grade')),
+    ('skills', "Skills", ('technical_skills', 'soft_skills')),
+    ('projects', "Projects", ('selected_projects', 'projects')),
+    ('experience', "Experience", ('years_experience', 'work_type', 'role', 'organization')),
+)
+
+
+def step_form_class(key, title, fields):
+    """A CVStepForm subclass declaring ``fields`` of CVForm, so instances copy nothing else"""
+    attrs = {field: copy.deepcopy(CVForm.base_fields[field]) for field in fields}
+    attrs.update(step_key=key, step_title=title, __module__=__name__)
+    return type(f"{key.title()}StepForm", (CVStepForm,), attrs)
 
-        full_form = CVForm()
 
-        for field in fields_to_include:
-            self.fields[field] = full_form.fields[field]
-        
-        if 'initial' in kwargs and kwargs['initial']:
-            for key, value in kwargs['initial'].items():
-                if key in self.fields:
-                    self.fields[key].initial = value
+# Step number (from 1) -> form class, built once at import
+STEP_FORMS = {
+    step: step_form_class(key, title, fields)
+    for step, (key, title, fields) in enumerate(CV_STEPS, start=1)
+}
+TOTAL_STEPS = len(CV_STEPS)
+STEP_TITLES = {step: form_class.step_title for step, form_class in STEP_FORMS.items()}
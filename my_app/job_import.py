@@ -0,0 +1,226 @@
+import csv
+import json
+import re
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .forms import CHOICES, normalize_token
+from .models import JobImport, jobs
+
+
+# Columns of a job feed record, in row order; ``id`` is the upsert key
+FEED_FIELDS = ('id', 'title', 'company', 'location', 'experience_required', 'job_type',
+               'skills', 'soft_skills', 'education_required', 'description', 'created_at')
+# Columns an upsert overwrites; created_at is the posting date, set only when a job is first inserted
+UPDATE_FIELDS = FEED_FIELDS[1:-1]
+REQUIRED_FIELDS = ('title', 'company', 'location', 'job_type')
+SKILL_SEPARATORS = re.compile(r'[;,]')
+
+IMPORT_BATCH_SIZE = 5000
+# Keep this many invalid-record messages in the stats
+MAX_ERRORS = 20
+
+
+class InvalidJob(ValueError):
+    """A feed record that cannot be stored in the jobs table"""
+
+
+def read_feed(path):
+    """
+    Records of a .csv or .jsonl job feed, read lazily so memory stays flat
+    however large the file. List fields in CSV are ';' or ',' separated.
+    A JSONL line that does not parse comes through as an InvalidJob, which
+    import_jobs skips like any other invalid record.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in ('.csv', '.jsonl'):
+        raise ValueError(f"Unsupported job feed format: {path.name} (use .csv or .jsonl)")
+    with path.open(newline='', encoding='utf-8') as f:
+        if suffix == '.csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        # clean_job turns this into a skipped record
+                        yield InvalidJob(f"not valid JSON ({e.msg})")
+
+
+def skill_spellings():
+    """Matching token -> form label of every skill choice, so feeds store the spelling the form uses"""
+    return {
+        CHOICES.token(label): label
+        for field in ('technical_skills', 'soft_skills') for _, label in CHOICES.choices(field)
+    }
+
+
+def normalize_skills(value, spellings):
+    """
+    Skill list from a feed value: a list or a ';'/',' separated string.
+    Items are trimmed with inner whitespace collapsed, empty ones and
+    case-insensitive duplicates dropped, and form skills spelled as the form
+    spells them.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = SKILL_SEPARATORS.split(value)
+    skills, seen = [], set()
+    for item in value:
+        item = ' '.join(str(item).split())
+        token = normalize_token(item)
+        if token and token not in seen:
+            seen.add(token)
+            skills.append(spellings.get(token, item))
+    return skills
+
+
+def _text(record, field, required=False):
+    value = record.get(field)
+    value = ' '.join(str(value).split()) if value is not None else ''
+    if required and not value:
+        raise InvalidJob(f"{field} is required")
+    max_length = jobs._meta.get_field(field).max_length
+    if max_length and len(value) > max_length:
+        raise InvalidJob(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _created_at(value):
+    if value in (None, ''):
+        return timezone.now()
+    try:
+        # Both raise ValueError for well-formed but impossible dates (2024-02-30)
+        parsed = parse_datetime(str(value))
+        date = parse_date(str(value)) if parsed is None else None
+    except ValueError:
+        raise InvalidJob(f"created_at {value!r} is not a date")
+    if parsed is None:
+        if date is None:
+            raise InvalidJob(f"created_at {value!r} is not a date")
+        parsed = datetime(date.year, date.month, date.day)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def clean_job(record, spellings):
+    """Row in FEED_FIELDS order for one feed record; raises InvalidJob"""
+    if isinstance(record, InvalidJob):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidJob("not an object")
+    try:
+        job_id = int(record['id'])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidJob("id must be an integer")
+    try:
+        experience = int(record.get('experience_required') or 0)
+    except (TypeError, ValueError):
+        raise InvalidJob("experience_required must be an integer")
+
+    fields = {field: _text(record, field, required=True) for field in REQUIRED_FIELDS}
+    return (
+        job_id, fields['title'], fields['company'], fields['location'], experience, fields['job_type'],
+        normalize_skills(record.get('skills'), spellings),
+        normalize_skills(record.get('soft_skills'), spellings),
+        _text(record, 'education_required') or None,
+        record.get('description') or None,
+        _created_at(record.get('created_at')),
+    )
+
+
+def bulk_upsert(rows):
+    """Write ``rows`` with one INSERT ... ON CONFLICT (id) DO UPDATE from bulk_create, keeping created_at"""
+    jobs.objects.bulk_create(
+        [jobs(**dict(zip(FEED_FIELDS, row))) for row in rows],
+        update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_FIELDS,
+    )
+
+
+def copy_upsert(rows):
+    """
+    COPY ``rows`` into a temporary table, then upsert them from there in a
+    single statement that keeps the created_at of existing jobs. PostgreSQL
+    with psycopg 3 only; call in a transaction.
+    """
+    quote = connection.ops.quote_name
+    table = quote(jobs._meta.db_table)
+    staging = quote('jobs_import')
+    columns = ', '.join(quote(field) for field in FEED_FIELDS)
+    updates = ', '.join(f"{quote(field)} = EXCLUDED.{quote(field)}" for field in UPDATE_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        with cursor.cursor.copy(f"COPY {staging} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+        # Not left to ON COMMIT when an outer transaction spans several batches
+        cursor.execute(f"DROP TABLE {staging}")
+
+
+def copy_supported():
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    return connection.vendor == 'postgresql' and is_psycopg3
+
+
+def import_jobs(records, batch_size=IMPORT_BATCH_SIZE, method='auto', source=''):
+    """
+    Upsert feed ``records`` into the jobs table by id, ``batch_size`` at a
+    time, each batch in its own short transaction so readers are never
+    blocked for the whole import. ``method`` is 'copy', 'bulk' or 'auto'
+    (COPY when supported). Invalid records are skipped; within a batch the
+    last record for an id wins.
+
+    Records a JobImport when anything was written, which changes
+    corpus_version for every cache and index built on the jobs table.
+    Returns a stats dict.
+    """
+    if method == 'auto':
+        method = 'copy' if copy_supported() else 'bulk'
+    if method == 'copy' and not copy_supported():
+        raise ValueError("COPY needs PostgreSQL with psycopg 3")
+    write = copy_upsert if method == 'copy' else bulk_upsert
+
+    spellings = skill_spellings()
+    stats = {'method': method, 'rows': 0, 'skipped': 0, 'batches': 0, 'errors': []}
+    started = timezone.now()
+    numbered = enumerate(records, start=1)
+    try:
+        while True:
+            batch = list(islice(numbered, batch_size))
+            if not batch:
+                break
+            rows = {}
+            for number, record in batch:
+                try:
+                    row = clean_job(record, spellings)
+                except InvalidJob as e:
+                    stats['skipped'] += 1
+                    if len(stats['errors']) < MAX_ERRORS:
+                        stats['errors'].append(f"record {number}: {e}")
+                    continue
+                rows[row[0]] = row
+            if rows:
+                # In id order, so concurrent imports lock rows in the same order
+                with transaction.atomic():
+                    write([rows[job_id] for job_id in sorted(rows)])
+                stats['rows'] += len(rows)
+                stats['batches'] += 1
+    finally:
+        # Also after a failure: the batches already committed changed the table
+        if stats['rows']:
+            stats['import_id'] = JobImport.objects.create(
+                source=str(source)[:255], started_at=started, rows=stats['rows'], skipped=stats['skipped'],
+            ).id
+    return stats
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobIndexesConfig(AppConfig):
+    """
+    Optional indexes on the unmanaged ``jobs`` table (JOB_INDEXES). Kept in
+    their own app so installing it is what runs their migrations.
+    """
+
+    name = 'my_app.job_indexes'
+    label = 'job_indexes'
+    verbose_name = "Job indexes"
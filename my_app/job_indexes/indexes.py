@@ -0,0 +1,48 @@
+# Indexes for filtering and pre-filtering the ``jobs`` table on PostgreSQL.
+# The skill indexes cover cvgen_skill_tokens(), the tokens normalize_list
+# produces in Python, so array overlap with a CV's tokens can use them. The
+# location and job type indexes cover upper(), which is what the __iexact
+# filters compare.
+
+SKILL_TOKENS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION cvgen_skill_tokens(text[]) RETURNS text[]
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT coalesce(array_agg(DISTINCT lower(btrim(value, E' \\t\\n\\r\\f\\v'))), '{}')
+        FROM unnest($1) AS value
+        WHERE value IS NOT NULL AND value <> ''
+    $$
+"""
+
+JOB_INDEXES = (
+    ('jobs_skill_tokens_gin', 'USING gin (cvgen_skill_tokens(skills))'),
+    ('jobs_soft_skill_tokens_gin', 'USING gin (cvgen_skill_tokens(soft_skills))'),
+    ('jobs_experience_required_idx', '(experience_required)'),
+    ('jobs_upper_job_type_idx', '(upper(job_type))'),
+    ('jobs_upper_location_idx', '(upper(location))'),
+    ('jobs_created_at_idx', '(created_at)'),
+)
+
+
+def jobs_table_exists(connection):
+    return 'jobs' in connection.introspection.table_names()
+
+
+def create_job_indexes(connection, concurrently=True):
+    """
+    Create the function and indexes if missing. ``concurrently`` builds
+    them without blocking writes to the table, outside a transaction only.
+    """
+    mode = 'CONCURRENTLY ' if concurrently else ''
+    with connection.cursor() as cursor:
+        cursor.execute(SKILL_TOKENS_FUNCTION)
+        for name, definition in JOB_INDEXES:
+            cursor.execute(f"CREATE INDEX {mode}IF NOT EXISTS {name} ON jobs {definition}")
+        cursor.execute("ANALYZE jobs")
+
+
+def drop_job_indexes(connection, concurrently=True):
+    mode = 'CONCURRENTLY ' if concurrently else ''
+    with connection.cursor() as cursor:
+        for name, _ in JOB_INDEXES:
+            cursor.execute(f"DROP INDEX {mode}IF EXISTS {name}")
+        cursor.execute("DROP FUNCTION IF EXISTS cvgen_skill_tokens(text[])")
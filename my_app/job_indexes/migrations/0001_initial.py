@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from my_app.job_indexes.indexes import create_job_indexes, drop_job_indexes, jobs_table_exists
+
+
+def create(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if not jobs_table_exists(connection):
+        # The table is created outside Django; migrate job_indexes zero, then
+        # migrate again once it exists
+        print("\n  jobs table not found, no job indexes created")
+        return
+    create_job_indexes(connection)
+
+
+def drop(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql' and jobs_table_exists(connection):
+        drop_job_indexes(connection)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.RunPython(create, drop),
+    ]
@@ -0,0 +1,271 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import openai
+from decouple import config
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+
+from .metrics import metrics, span
+
+
+# Upstream failures worth another attempt; anything else (bad key, bad
+# request) fails the same way every time
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing upstream.
+
+    After OPENAI_BREAKER_THRESHOLD consecutive calls failing upstream
+    (RETRYABLE_ERRORS once retries run out; a rejected request such as a
+    bad prompt or key is the caller's problem and does not count) the breaker
+    opens and every call is refused for OPENAI_BREAKER_RESET seconds. Then a
+    single probe call is let through: success closes the breaker, failure
+    opens it again, and a probe that ends any other way (cancelled) lets the
+    next call probe instead.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.rejected = 0
+
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.probing or time.monotonic() - self.opened_at < settings.OPENAI_BREAKER_RESET:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def is_open(self):
+        return self.state() == self.OPEN
+
+    def retry_after(self):
+        """Seconds until a call may be let through again, None while closed"""
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            if self.probing:
+                # Another call is probing; it settles within one request timeout
+                return settings.OPENAI_TIMEOUT
+            return max(0.0, settings.OPENAI_BREAKER_RESET - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        """False while open, else the state the call is let through in (HALF_OPEN for the probe)"""
+        with self._lock:
+            state = self._state()
+            if state == self.HALF_OPEN:
+                self.probing = True
+            elif state == self.OPEN:
+                self.rejected += 1
+                return False
+            return state
+
+    def end_probe(self):
+        # After record_success/record_failure this is a no-op
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= settings.OPENAI_BREAKER_THRESHOLD:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def stats(self):
+        with self._lock:
+            return {'state': self._state(), 'failures': self.failures, 'rejected': self.rejected}
+
+
+class OpenAIClientManager:
+    """
+    Process-wide OpenAI clients sharing one keep-alive connection pool.
+
+    The sync client is shared by every thread. Async clients are tied to
+    their event loop, so there is one per loop. Calls made through
+    ``call``/``acall`` get a bounded timeout, jittered exponential backoff
+    on transient errors and the circuit breaker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.breaker = CircuitBreaker()
+
+    def _current_options(self):
+        return (
+            settings.OPENAI_BASE_URL,
+            settings.OPENAI_TIMEOUT,
+            settings.OPENAI_CONNECT_TIMEOUT,
+            settings.OPENAI_MAX_CONNECTIONS,
+        )
+
+    def _client_kwargs(self, options):
+        base_url, timeout, connect_timeout, _ = options
+        return {
+            'api_key': config("OPENAI_API_KEY"),
+            'base_url': base_url,
+            'timeout': httpx.Timeout(timeout, connect=connect_timeout),
+            # Retries are ours, so they can back off with jitter and feed the breaker
+            'max_retries': 0,
+        }
+
+    def _limits(self, options):
+        return httpx.Limits(max_connections=options[3], max_keepalive_connections=options[3])
+
+    def client(self):
+        with self._lock:
+            options = self._current_options()
+            if self._client is None:
+                self._client = OpenAI(
+                    http_client=openai.DefaultHttpxClient(limits=self._limits(options)),
+                    **self._client_kwargs(options),
+                )
+            return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            options = self._current_options()
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(
+                    http_client=openai.DefaultAsyncHttpxClient(limits=self._limits(options)),
+                    **self._client_kwargs(options),
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def backoff(self, attempt):
+        # Full jitter keeps retries from many workers from arriving in step
+        return random.uniform(0, settings.OPENAI_RETRY_BACKOFF * 2 ** attempt)
+
+    def _within(self, client, deadline):
+        # The request timeout shrunk to what is left of the caller's budget
+        if deadline is None:
+            return client
+        remaining = max(0.001, min(settings.OPENAI_TIMEOUT, deadline - time.monotonic()))
+        return client.with_options(
+            timeout=httpx.Timeout(remaining, connect=min(settings.OPENAI_CONNECT_TIMEOUT, remaining)),
+        )
+
+    def _gives_up(self, attempt, delay, deadline):
+        if attempt == settings.OPENAI_MAX_RETRIES:
+            return True
+        return deadline is not None and time.monotonic() + delay >= deadline
+
+    def call(self, request, timeout=None):
+        """
+        Run ``request(client)`` with retries; raises CircuitOpen while the
+        breaker is open. ``timeout`` bounds the whole call, retries and
+        backoff included, in seconds.
+        """
+        admitted = self.breaker.allow()
+        if not admitted:
+            raise CircuitOpen()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            for attempt in range(settings.OPENAI_MAX_RETRIES + 1):
+                try:
+                    with span('llm'):
+                        result = request(self._within(self.client(), deadline))
+                except RETRYABLE_ERRORS:
+                    delay = self.backoff(attempt)
+                    if self._gives_up(attempt, delay, deadline):
+                        self.breaker.record_failure()
+                        raise
+                    time.sleep(delay)
+                else:
+                    self.breaker.record_success()
+                    return result
+        finally:
+            if admitted == CircuitBreaker.HALF_OPEN:
+                self.breaker.end_probe()
+
+    async def acall(self, request, timeout=None):
+        """Async counterpart of call; ``request`` returns an awaitable"""
+        admitted = self.breaker.allow()
+        if not admitted:
+            raise CircuitOpen()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            for attempt in range(settings.OPENAI_MAX_RETRIES + 1):
+                try:
+                    with span('llm'):
+                        result = await request(self._within(self.async_client(), deadline))
+                except RETRYABLE_ERRORS:
+                    delay = self.backoff(attempt)
+                    if self._gives_up(attempt, delay, deadline):
+                        self.breaker.record_failure()
+                        raise
+                    await asyncio.sleep(delay)
+                else:
+                    self.breaker.record_success()
+                    return result
+        finally:
+            # A cancelled probe (client gone) settles nothing, so the next call probes
+            if admitted == CircuitBreaker.HALF_OPEN:
+                self.breaker.end_probe()
+
+    def close(self):
+        """Close every client and its connection pool; the next call builds new ones from the settings"""
+        with self._lock:
+            client, self._client = self._client, None
+            async_clients, self._async_clients = list(self._async_clients.items()), weakref.WeakKeyDictionary()
+        if client is not None:
+            client.close()
+        for loop, async_client in async_clients:
+            if loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(async_client.close(), loop)
+            else:
+                loop.run_until_complete(async_client.close())
+
+    def reset(self):
+        """close() and start over with a closed circuit breaker"""
+        self.close()
+        self.breaker = CircuitBreaker()
+
+
+def close_on_setting_change(setting, **kwargs):
+    # Clients are built from these settings once; override_settings in
+    # tests and benchmarks gets clients for the new values
+    if setting.startswith('OPENAI_'):
+        openai_clients.close()
+
+
+openai_clients = OpenAIClientManager()
+metrics.gauge('cvgen_openai_breaker', lambda: openai_clients.breaker.stats())
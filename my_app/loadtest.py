@@ -0,0 +1,279 @@
+import math
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+from django.conf import settings
+from django.core.servers.basehttp import ThreadedWSGIServer, get_internal_wsgi_application
+from django.test.testcases import QuietWSGIRequestHandler
+from django.test.utils import override_settings
+from django.urls import Resolver404, resolve, reverse
+
+from .benchmarks import stepper_posts
+
+
+# Replays the browser flow over real HTTP for ``manage.py loadtest``: the
+# five stepper steps with CSRF tokens and cookies, the result page (waiting
+# for the CV like cv_generating.html and cv_result.html do) and the PDF.
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+STREAM_URL = re.compile(r'data-stream-url="([^"]+)"')
+
+
+def percentile(samples, q):
+    """Nearest-rank ``q`` percentile (0-100) of ``samples``"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def endpoint_name(url):
+    """URL name of ``url``, so the step and task URLs each count as one endpoint"""
+    try:
+        return resolve(urlsplit(url).path).url_name
+    except Resolver404:
+        return urlsplit(url).path
+
+
+class LoadError(Exception):
+    """A simulated user got an error or an unexpected page"""
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint, shared by every session"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok=True):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': len(samples),
+                    'errors': self.errors.get(endpoint, 0),
+                    'requests_per_sec': round(len(samples) / elapsed, 2),
+                    'p50_ms': round(percentile(samples, 50) * 1000, 1),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 1),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 1),
+                    'max_ms': round(max(samples) * 1000, 1),
+                }
+                for endpoint, samples in sorted(self.samples.items())
+            }
+
+
+class LoadSession:
+    """
+    One simulated user with its own cookie jar. Raises LoadError at the
+    first failed request; every request, failed or not, is recorded.
+    """
+
+    def __init__(self, base_url, index, recorder, poll_interval=0.5, timeout=120):
+        self.client = httpx.Client(base_url=base_url, timeout=timeout)
+        self.index = index
+        self.recorder = recorder
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint_name(url), time.perf_counter() - started, ok=False)
+            raise LoadError(f"{method} {endpoint_name(url)}: {e!r}")
+        ok = response.status_code < 400
+        self.recorder.record(endpoint_name(url), time.perf_counter() - started, ok)
+        if not ok:
+            raise LoadError(f"{method} {endpoint_name(url)}: HTTP {response.status_code}")
+        return response
+
+    def follow(self, response):
+        """Follow redirects with GETs, as the browser does after a POST"""
+        while response.is_redirect:
+            response = self.request('GET', response.headers['Location'])
+        return response
+
+    def run(self):
+        response = self.request('GET', reverse('cv_stepper', kwargs={'step': 1}))
+        for step, data in enumerate(stepper_posts(self.index), start=1):
+            token = CSRF_INPUT.search(response.text)
+            if token is None:
+                raise LoadError(f"No CSRF token on the page before step {step}")
+            response = self.follow(self.request(
+                'POST', reverse('cv_stepper', kwargs={'step': step}),
+                data={**data, 'csrfmiddlewaretoken': token.group(1)},
+            ))
+        response = self.wait_for_result(response)
+        stream_url = STREAM_URL.search(response.text)
+        if stream_url is not None:
+            self.read_stream(stream_url.group(1))
+        pdf = self.request('GET', reverse('download_pdf'))
+        if pdf.headers.get('Content-Type') != 'application/pdf':
+            raise LoadError("download_pdf did not return a PDF")
+
+    def wait_for_result(self, response):
+        """Poll a background generation task, as cv_generating.html does, until the result page"""
+        match = resolve(response.url.path)
+        if match.url_name == 'cv_generating':
+            status_url = reverse('generation_status', kwargs=match.kwargs)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                time.sleep(self.poll_interval)
+                status = self.request('GET', status_url).json()
+                if status['status'] == 'failed':
+                    raise LoadError(f"Generation failed: {status['error']}")
+                if status['result_url']:
+                    response = self.follow(self.request('GET', status['result_url']))
+                    break
+                if time.monotonic() > deadline:
+                    raise LoadError("Generation did not finish in time")
+        if resolve(response.url.path).url_name != 'cv_result':
+            raise LoadError(f"Expected the result page, got {response.url.path}")
+        return response
+
+    def read_stream(self, url):
+        """Read the Server-Sent Events of a streamed CV, timing the first event separately"""
+        started = time.perf_counter()
+        first_event = None
+        try:
+            with self.client.stream('GET', url) as response:
+                body = []
+                for chunk in response.iter_text():
+                    if first_event is None:
+                        first_event = time.perf_counter() - started
+                        self.recorder.record('stream_cv (first event)', first_event)
+                    body.append(chunk)
+        except httpx.HTTPError as e:
+            self.recorder.record('stream_cv', time.perf_counter() - started, ok=False)
+            raise LoadError(f"GET stream_cv: {e!r}")
+        ok = response.status_code == 200 and 'event: done' in ''.join(body)
+        self.recorder.record('stream_cv', time.perf_counter() - started, ok)
+        if not ok:
+            raise LoadError(f"GET stream_cv: HTTP {response.status_code} without a done event")
+
+    def close(self):
+        self.client.close()
+
+
+def run_load(base_url, sessions=50, concurrency=10, offset=0, poll_interval=0.5, timeout=120):
+    """
+    Run ``sessions`` simulated users against ``base_url``, ``concurrency``
+    at a time. Returns per-endpoint request counts, errors, requests per
+    second and p50/p95/p99 latency, plus the failed sessions.
+    """
+    recorder = Recorder()
+
+    def one(index):
+        session = LoadSession(base_url, index, recorder, poll_interval, timeout)
+        try:
+            session.run()
+        except LoadError as e:
+            return str(e)
+        finally:
+            session.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='cvgen-load') as pool:
+        failures = [error for error in pool.map(one, range(offset, offset + sessions)) if error]
+    elapsed = time.perf_counter() - started
+
+    endpoints = recorder.summary(elapsed)
+    requests = sum(endpoint['requests'] for name, endpoint in endpoints.items() if '(' not in name)
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'failed_sessions': len(failures),
+        'seconds': round(elapsed, 3),
+        'sessions_per_sec': round(sessions / elapsed, 2),
+        'requests_per_sec': round(requests / elapsed, 1),
+        'endpoints': endpoints,
+        'errors': sorted(set(failures))[:10],
+    }
+
+
+def setting_value(name, value):
+    """``value`` from the command line, cast like the current value of setting ``name``"""
+    current = getattr(settings, name, None)
+    if isinstance(current, bool):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(current, (int, float)):
+        return type(current)(value)
+    return value
+
+
+class LocalServer:
+    """
+    This project on a threaded WSGI server inside this process, like
+    LiveServerTestCase, with ``overrides`` (environment-style strings)
+    applied as settings. Use as ``with LocalServer(...) as base_url``.
+    """
+
+    def __init__(self, overrides, host='127.0.0.1', port=0):
+        overrides = {name: setting_value(name, value) for name, value in overrides.items()}
+        if overrides.get('CV_ASYNC_VIEWS'):
+            overrides['ROOT_URLCONF'] = 'my_app.urls_async'
+        self.settings = override_settings(**overrides)
+        self.address = (host, port)
+
+    def __enter__(self):
+        self.settings.enable()
+        self.server = ThreadedWSGIServer(self.address, QuietWSGIRequestHandler, allow_reuse_address=False)
+        self.server.set_app(get_internal_wsgi_application())
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.settings.disable()
+
+
+class CommandServer:
+    """
+    A server started from ``command`` (e.g. gunicorn) in a subprocess with
+    ``env`` added to its environment, waited for until ``base_url``
+    answers, and stopped afterwards.
+    """
+
+    def __init__(self, command, base_url, env, startup_timeout=30):
+        self.command = shlex.split(command)
+        self.base_url = base_url
+        self.env = env
+        self.startup_timeout = startup_timeout
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, env={**os.environ, **self.env})
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            if self.process.poll() is not None:
+                raise LoadError(f"Server exited with status {self.process.returncode}")
+            try:
+                httpx.get(self.base_url, timeout=1)
+                return self.base_url
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    self.__exit__()
+                    raise LoadError(f"Server did not answer on {self.base_url}")
+                time.sleep(0.2)
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
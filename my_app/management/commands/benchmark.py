@@ -0,0 +1,102 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from my_app.benchmarks import CORPUS_SIZES, bench_core, bench_forms, bench_pdf, bench_stream, bench_views
+from my_app.pdf_layouts import PDF_TEMPLATES
+
+
+class Command(BaseCommand):
+    help = "Measure the CV generator against a local fake model server"
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=['views', 'stream', 'pdf', 'forms', 'core'], help="Benchmark suite to run")
+        parser.add_argument('--users', type=int, default=50, help="Simulated users (one full stepper walk each)")
+        parser.add_argument('--concurrency', type=int, default=10, help="Worker threads / in-flight users")
+        parser.add_argument('--latency', type=float, default=0.2, help="Fake model latency in seconds")
+        parser.add_argument('--token-interval', type=float, default=0.02,
+                            help="Delay between streamed words of the fake model in seconds")
+        parser.add_argument('--renders', type=int, default=50, help="CVs rendered per PDF template")
+        parser.add_argument('--template', action='append', choices=sorted(PDF_TEMPLATES),
+                            help="PDF template to measure (repeatable; default: all)")
+        parser.add_argument('--iterations', type=int, default=2000, help="Step forms built per variant")
+        parser.add_argument('--sizes', default=','.join(map(str, CORPUS_SIZES)),
+                            help="Comma-separated synthetic job corpus sizes for the core suite")
+        parser.add_argument('--cvs', type=int, default=20, help="Synthetic applicants ranked per corpus (core)")
+        parser.add_argument('--calls', type=int, default=200,
+                            help="PDF downloads per pass; 10x as many calls of the cheaper functions (core)")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data (core)")
+        parser.add_argument('--json', action='store_true', help="Print the raw JSON report")
+        parser.add_argument('--output', help="Also write the JSON report to this file, to compare runs")
+
+    def handle(self, *args, **options):
+        # The benchmark never talks to the real API, but the client still wants a key
+        os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+        offset = int.from_bytes(os.urandom(3), 'little')
+
+        if options['suite'] == 'core':
+            report = bench_core(
+                sizes=[int(size) for size in options['sizes'].split(',') if size.strip()],
+                cvs=options['cvs'],
+                calls=options['calls'],
+                seed=options['seed'],
+                offset=offset,
+            )
+        elif options['suite'] == 'forms':
+            report = bench_forms(iterations=options['iterations'])
+        elif options['suite'] == 'pdf':
+            report = bench_pdf(renders=options['renders'], templates=options['template'])
+        elif options['suite'] == 'stream':
+            report = bench_stream(
+                users=options['users'],
+                latency=options['latency'],
+                token_interval=options['token_interval'],
+                offset=offset,
+            )
+        else:
+            report = bench_views(
+                users=options['users'],
+                concurrency=options['concurrency'],
+                latency=options['latency'],
+                offset=offset,
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for result in report['results']:
+            if report['suite'] == 'core':
+                scope = f" [{result['jobs']} jobs]" if 'jobs' in result else ''
+                scope += f" [{result['cache']} cache]" if 'cache' in result else ''
+                self.stdout.write(
+                    f"{result['benchmark']}{scope}: {result['calls_per_sec']} calls/s "
+                    f"({result['ms_per_call']} ms per call, peak {result['peak_kb']} KiB)"
+                )
+                continue
+            if report['suite'] == 'forms':
+                self.stdout.write(
+                    f"{result['forms']}: {result['iterations']} step forms in {result['seconds']}s "
+                    f"({result['us_per_form']} µs per form)"
+                )
+                continue
+            if report['suite'] == 'pdf':
+                self.stdout.write(
+                    f"{result['template']}: {result['pages']} pages in {result['seconds']}s "
+                    f"({result['pages_per_sec']} pages/s, {result['ms_per_cv']} ms per CV)"
+                )
+                continue
+            if report['suite'] == 'stream':
+                self.stdout.write(
+                    f"{result['mode']}: first byte p50 {result['first_byte']['p50_ms']} ms, "
+                    f"complete p50 {result['complete']['p50_ms']} ms"
+                )
+                continue
+            self.stdout.write(
+                f"{result['server']}: {result['users']} users, {result['requests']} requests in "
+                f"{result['seconds']}s ({result['requests_per_sec']} req/s, {result['cvs_per_sec']} CVs/s, "
+                f"{result['errors']} errors)"
+            )
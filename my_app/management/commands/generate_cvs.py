@@ -0,0 +1,52 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.batch import read_records, run_batch, writer_for
+from my_app.pdf_layouts import PDF_TEMPLATES
+
+
+class Command(BaseCommand):
+    help = "Generate CVs, PDFs and job recommendations for a file of candidate records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="CSV, JSON or JSONL file of CVForm records")
+        parser.add_argument(
+            '--output', required=True,
+            help="Output directory, or a path ending in .zip to write an archive",
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help="Records processed at the same time")
+        parser.add_argument('--top-k', type=int, default=10, help="Job recommendations per CV")
+        parser.add_argument(
+            '--template', choices=sorted(PDF_TEMPLATES),
+            help="PDF layout (default: the PDF_DEFAULT_TEMPLATE setting)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            records = read_records(options['input'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read {options['input']}: {e}")
+
+        output = options['output']
+        if not output.endswith('.zip') and os.path.isfile(output):
+            raise CommandError(f"{output} is a file; pass a directory or a .zip path.")
+
+        writer = writer_for(output)
+        try:
+            report = run_batch(
+                records, writer, concurrency=options['concurrency'], k=options['top_k'], template=options['template'],
+            )
+        finally:
+            writer.close()
+
+        for error in report['errors']:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error['errors'].items())
+            self.stderr.write(f"Record {error['index']} {error['status']}: {details}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['succeeded']}/{report['total']} CVs written to {output} "
+            f"({report['sources']['ai']} AI, {report['sources']['template']} template, "
+            f"{report['invalid']} invalid, {report['failed']} failed) in {report['seconds']}s, "
+            f"{report['cvs_per_sec']} CVs/s"
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.features import get_feature_store, refresh_feature_store
+from my_app.job_import import IMPORT_BATCH_SIZE, import_jobs, read_feed
+
+
+class Command(BaseCommand):
+    help = "Upsert a JSON Lines or CSV job feed into the jobs table by job id, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('feed', help="Job feed: .jsonl (one object per line) or .csv with a header row")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help="Jobs written per transaction")
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto',
+                            help="COPY through a staging table (PostgreSQL) or bulk_create upserts; "
+                                 "auto picks COPY when available")
+        parser.add_argument('--skip-features', action='store_true',
+                            help="Do not refresh the job feature store (JOB_FEATURE_STORE) afterwards")
+
+    def handle(self, *args, **options):
+        try:
+            stats = import_jobs(
+                read_feed(options['feed']),
+                batch_size=max(1, options['batch_size']),
+                method=options['method'],
+                source=options['feed'],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in stats['errors']:
+            self.stderr.write(f"Skipped {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rows']} jobs upserted in {stats['batches']} batches ({stats['method']}), "
+            f"{stats['skipped']} skipped"
+        ))
+
+        store = get_feature_store()
+        if store is not None and stats['rows'] and not options['skip_features']:
+            # Updated jobs keep their created_at, so only a full scan sees them
+            features = refresh_feature_store(store, full_scan=True)
+            self.stdout.write(
+                f"Feature store: {features['jobs']} jobs, {features['changed']} changed, "
+                f"{features['removed']} removed"
+            )
@@ -0,0 +1,107 @@
+import json
+import os
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.fakellm import FakeResponsesServer
+from my_app.loadtest import CommandServer, LoadError, LocalServer, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the full stepper flow, result page and PDF download over HTTP with many "
+        "concurrent users, the model replaced by a local fake Responses server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=50, help="Simulated users")
+        parser.add_argument('--concurrency', type=int, default=10, help="Users in flight at once")
+        parser.add_argument('--latency', type=float, default=0.5, help="Fake model latency in seconds")
+        parser.add_argument('--token-interval', type=float, default=0.02,
+                            help="Delay between streamed words of the fake model in seconds")
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Share of fake model requests answered with a 500 error")
+        parser.add_argument('--url', help="Base URL of a running server (default: serve this project in-process)")
+        parser.add_argument('--server',
+                            help="Command starting the server for --url, e.g. 'gunicorn cvgen.wsgi -w 4 "
+                                 "-b 127.0.0.1:8001'; run with the fake model and --set in its environment")
+        parser.add_argument('--fake-port', type=int, default=0,
+                            help="Port of the fake model server, for a server started separately")
+        parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                            help="Setting for the server under test, e.g. CV_GENERATION_MODE=stream (repeatable)")
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help="Seconds between generation status polls, as in the browser")
+        parser.add_argument('--timeout', type=float, default=120, help="Per-request timeout in seconds")
+        parser.add_argument('--json', action='store_true', help="Print the raw JSON report")
+        parser.add_argument('--output', help="Also write the JSON report to this file, to compare runs")
+
+    def handle(self, *args, **options):
+        # The server under test never talks to the real API, but the client still wants a key
+        os.environ.setdefault('OPENAI_API_KEY', 'loadtest')
+        try:
+            overrides = dict(item.split('=', 1) for item in options['set'])
+        except ValueError:
+            raise CommandError("--set takes NAME=VALUE")
+        if options['server'] and not options['url']:
+            raise CommandError("--server needs --url, the address the server listens on")
+        offset = int.from_bytes(os.urandom(3), 'little')
+
+        fake = FakeResponsesServer(
+            latency=options['latency'],
+            token_interval=options['token_interval'],
+            error_rate=options['error_rate'],
+            port=options['fake_port'],
+        )
+        with fake:
+            if options['server']:
+                env = {**overrides, 'OPENAI_BASE_URL': fake.base_url, 'OPENAI_API_KEY': 'loadtest'}
+                target = CommandServer(options['server'], options['url'], env)
+            elif options['url']:
+                if overrides:
+                    raise CommandError("--set only applies to servers started by this command")
+                self.stderr.write(f"Expecting the server at {options['url']} to use OPENAI_BASE_URL={fake.base_url}")
+                target = nullcontext(options['url'])
+            else:
+                target = LocalServer({**overrides, 'OPENAI_BASE_URL': fake.base_url})
+
+            try:
+                with target as base_url:
+                    report = run_load(
+                        base_url,
+                        sessions=options['sessions'],
+                        concurrency=options['concurrency'],
+                        offset=offset,
+                        poll_interval=options['poll_interval'],
+                        timeout=options['timeout'],
+                    )
+            except LoadError as e:
+                raise CommandError(str(e))
+        report['settings'] = overrides
+        report['llm'] = {
+            'latency': options['latency'],
+            'token_interval': options['token_interval'],
+            'error_rate': options['error_rate'],
+            'requests': fake.requests,
+            'failures': fake.failures,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{report['sessions']} sessions ({report['failed_sessions']} failed) in {report['seconds']}s: "
+            f"{report['sessions_per_sec']} sessions/s, {report['requests_per_sec']} req/s; "
+            f"model: {fake.requests} requests, {fake.failures} injected errors"
+        )
+        for name, endpoint in report['endpoints'].items():
+            self.stdout.write(
+                f"  {name}: {endpoint['requests']} requests, {endpoint['errors']} errors, "
+                f"{endpoint['requests_per_sec']} req/s, p50 {endpoint['p50_ms']} ms, "
+                f"p95 {endpoint['p95_ms']} ms, p99 {endpoint['p99_ms']} ms"
+            )
+        for error in report['errors']:
+            self.stdout.write(f"  error: {error}")
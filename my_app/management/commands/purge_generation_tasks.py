@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from my_app.tasks import purge_generation_tasks
+
+
+class Command(BaseCommand):
+    help = "Delete background generation tasks, and the CV data they hold, once they have ended"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.CV_GENERATION_TASK_RETENTION,
+            help="Seconds since the task finished or passed its deadline (default: CV_GENERATION_TASK_RETENTION)",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_generation_tasks(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} generation tasks deleted"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from my_app.features import get_feature_store, refresh_feature_store
+
+
+class Command(BaseCommand):
+    help = "Refresh the precomputed job feature store used for job matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full-scan', action='store_true',
+            help="Checksum every row to catch in-place edits and deletions",
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help="Discard the current store and encode every job again",
+        )
+
+    def handle(self, *args, **options):
+        store = get_feature_store()
+        if store is None:
+            raise CommandError("JOB_FEATURE_STORE is not configured.")
+
+        stats = refresh_feature_store(store, full_scan=options['full_scan'], rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['mode']}: {stats['jobs']} jobs stored, "
+            f"{stats['changed']} changed, {stats['removed']} removed"
+        ))
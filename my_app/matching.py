@@ -0,0 +1,894 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import threading
+from itertools import islice
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
+from django.db.models import Count, Func, Max, Q, TextField
+
+from .forms import CHOICES
+from .metrics import span
+from .models import JobImport, jobs
+
+
+logger = logging.getLogger(__name__)
+
+
+SKILL_WEIGHT = 0.40
+SOFT_SKILL_WEIGHT = 0.15
+EDUCATION_WEIGHT = 0.20
+EXPERIENCE_WEIGHT = 0.25
+
+# Columns the matcher needs from the jobs table, in JobCorpus.from_rows order
+JOB_MATCH_FIELDS = ('id', 'skills', 'soft_skills', 'education_required', 'experience_required')
+
+CORPUS_CHUNK_SIZE = 5000
+
+DEFAULT_TOP_K = 10
+
+
+def normalize_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v).lower().strip() for v in value if v]
+    if isinstance(value, str):
+        return [v.lower().strip() for v in value.split(",") if v.strip()]
+    return []
+
+
+def cv_tokens(values):
+    """normalize_list for CV skills: form labels are looked up in CHOICES instead of normalized again"""
+    if not isinstance(values, list):
+        return normalize_list(values)
+    return [CHOICES.token(value) for value in values if value]
+
+
+def calculate_similarity(cv, job):
+
+    cv_skills = cv_tokens(cv["skills"]["technical"])
+    job_skills = normalize_list(job.skills)
+
+    skill_score = (
+        len(set(cv_skills) & set(job_skills)) / len(set(cv_skills) | set(job_skills))
+        if (cv_skills or job_skills) else 0
+    )
+
+
+    cv_soft = cv_tokens(cv["skills"]["soft"])
+    job_soft = normalize_list(job.soft_skills)
+
+    soft_skill_score = (
+        len(set(cv_soft) & set(job_soft)) / len(set(cv_soft) | set(job_soft))
+        if (cv_soft or job_soft) else 0
+    )
+
+
+    edu = (cv["education"]["qualification"] or "").lower()
+    job_edu = (job.education_required or "").lower()
+
+    if job_edu and edu in job_edu:
+        education_score = 1
+    else:
+        education_score = 0
+
+
+    try:
+        cv_exp = int(cv["experience"]["years"])
+    except:
+        cv_exp = 0
+
+    job_exp = job.experience_required or 0
+
+    diff = abs(cv_exp - job_exp)
+    experience_score = max(0, 1 - (diff / max(job_exp, 1)))
+
+    # --- Weighted total ---
+    final_score = (
+        skill_score * SKILL_WEIGHT +
+        soft_skill_score * SOFT_SKILL_WEIGHT +
+        education_score * EDUCATION_WEIGHT +
+        experience_score * EXPERIENCE_WEIGHT
+    ) * 100
+
+    return round(final_score, 2)
+
+
+def _take_csr(ptr, token_ids, positions):
+    starts = ptr[positions]
+    lengths = ptr[positions + 1] - starts
+    new_ptr = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_ptr[1:])
+    offsets = np.repeat(starts - new_ptr[:-1], lengths)
+    return new_ptr, token_ids[np.arange(new_ptr[-1]) + offsets]
+
+
+def cv_experience_years(cv):
+    try:
+        return int(cv["experience"]["years"])
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+class JobCorpus:
+    """
+    Jobs encoded once into flat NumPy arrays so a CV can be scored against
+    every posting in a single batched pass.
+
+    Skill sets are stored CSR-style: the normalized token ids of job ``i`` are
+    ``skill_ids[skill_ptr[i]:skill_ptr[i + 1]]``.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.vocabulary = {}
+        self.education_values = []
+        self._education_codes = {}
+        self._choice_token_ids = None
+
+    ARRAY_FIELDS = (
+        'ids', 'experience', 'education_codes',
+        'skill_ptr', 'skill_ids', 'skill_count',
+        'soft_ptr', 'soft_ids', 'soft_count',
+    )
+
+    @classmethod
+    def from_rows(cls, rows, version=None):
+        """Build a corpus from (id, skills, soft_skills, education_required, experience_required) rows"""
+        corpus = cls(version=version)
+        corpus._encode_rows(rows)
+        return corpus
+
+    @classmethod
+    def from_arrays(cls, arrays, vocabulary, education_values, version=None):
+        """Rebuild a corpus from ``arrays()`` output, e.g. memory-mapped from disk"""
+        corpus = cls(version=version)
+        corpus.vocabulary = {token: token_id for token_id, token in enumerate(vocabulary)}
+        corpus.education_values = list(education_values)
+        corpus._education_codes = {value: code for code, value in enumerate(corpus.education_values)}
+        for name in cls.ARRAY_FIELDS:
+            setattr(corpus, name, arrays[name])
+        return corpus
+
+    def _encode_rows(self, rows):
+        ids, experience, education = [], [], []
+        skill_ptr, skill_ids, skill_count = [0], [], []
+        soft_ptr, soft_ids, soft_count = [0], [], []
+
+        for job_id, skills, soft_skills, education_required, experience_required in rows:
+            ids.append(job_id)
+            skill_count.append(self._encode_tokens(skills, skill_ids))
+            skill_ptr.append(len(skill_ids))
+            soft_count.append(self._encode_tokens(soft_skills, soft_ids))
+            soft_ptr.append(len(soft_ids))
+            education.append(self._education_code(education_required))
+            experience.append(experience_required or 0)
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.experience = np.array(experience, dtype=np.int64)
+        self.education_codes = np.array(education, dtype=np.int32)
+        self.skill_ptr = np.array(skill_ptr, dtype=np.int64)
+        self.skill_ids = np.array(skill_ids, dtype=np.int32)
+        self.skill_count = np.array(skill_count, dtype=np.int64)
+        self.soft_ptr = np.array(soft_ptr, dtype=np.int64)
+        self.soft_ids = np.array(soft_ids, dtype=np.int32)
+        self.soft_count = np.array(soft_count, dtype=np.int64)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+
+    def vocabulary_list(self):
+        """Tokens ordered by token id"""
+        return sorted(self.vocabulary, key=self.vocabulary.__getitem__)
+
+    def extended(self, rows, version=None):
+        """
+        New corpus with ``rows`` appended, kept sorted by job id. Existing
+        token ids and education codes are preserved.
+        """
+        added = JobCorpus(version=version)
+        added.vocabulary = dict(self.vocabulary)
+        added.education_values = list(self.education_values)
+        added._education_codes = dict(self._education_codes)
+        added._encode_rows(rows)
+
+        merged = JobCorpus.from_arrays({
+            'ids': np.concatenate([self.ids, added.ids]),
+            'experience': np.concatenate([self.experience, added.experience]),
+            'education_codes': np.concatenate([self.education_codes, added.education_codes]),
+            'skill_ptr': np.concatenate([self.skill_ptr, added.skill_ptr[1:] + self.skill_ptr[-1]]),
+            'skill_ids': np.concatenate([self.skill_ids, added.skill_ids]),
+            'skill_count': np.concatenate([self.skill_count, added.skill_count]),
+            'soft_ptr': np.concatenate([self.soft_ptr, added.soft_ptr[1:] + self.soft_ptr[-1]]),
+            'soft_ids': np.concatenate([self.soft_ids, added.soft_ids]),
+            'soft_count': np.concatenate([self.soft_count, added.soft_count]),
+        }, added.vocabulary_list(), added.education_values, version=version)
+        return merged.take(np.argsort(merged.ids, kind='stable'))
+
+    @classmethod
+    def from_jobs(cls, job_list, version=None):
+        return cls.from_rows(
+            ((job.id, job.skills, job.soft_skills, job.education_required, job.experience_required)
+             for job in job_list),
+            version=version,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, positions):
+        """Corpus restricted to ``positions``, sharing this corpus' vocabulary"""
+        positions = np.asarray(positions, dtype=np.int64)
+        subset = JobCorpus(version=self.version)
+        subset.vocabulary = self.vocabulary
+        subset.education_values = self.education_values
+        subset._education_codes = self._education_codes
+        subset._choice_token_ids = self._choice_token_ids
+        subset.ids = self.ids[positions]
+        subset.experience = self.experience[positions]
+        subset.education_codes = self.education_codes[positions]
+        subset.skill_ptr, subset.skill_ids = _take_csr(self.skill_ptr, self.skill_ids, positions)
+        subset.skill_count = self.skill_count[positions]
+        subset.soft_ptr, subset.soft_ids = _take_csr(self.soft_ptr, self.soft_ids, positions)
+        subset.soft_count = self.soft_count[positions]
+        return subset
+
+    def restrict_to(self, job_ids):
+        """Corpus holding only the jobs whose id is in the sorted array ``job_ids``"""
+        return self.take(np.flatnonzero(np.isin(self.ids, job_ids, assume_unique=True)))
+
+    def _encode_tokens(self, values, out):
+        tokens = set(normalize_list(values))
+        for token in tokens:
+            token_id = self.vocabulary.get(token)
+            if token_id is None:
+                token_id = self.vocabulary[token] = len(self.vocabulary)
+            out.append(token_id)
+        return len(tokens)
+
+    def _education_code(self, value):
+        value = (value or "").lower()
+        code = self._education_codes.get(value)
+        if code is None:
+            code = self._education_codes[value] = len(self.education_values)
+            self.education_values.append(value)
+        return code
+
+    def _skill_token_ids(self):
+        # Corpus token id of every CHOICES skill id, -1 where no job has it
+        if self._choice_token_ids is None:
+            self._choice_token_ids = np.array(
+                [self.vocabulary.get(token, -1) for token in CHOICES.skill_tokens], dtype=np.int64
+            )
+        return self._choice_token_ids
+
+    def _jaccard(self, ptr, token_ids, counts, cv_values):
+        if isinstance(cv_values, list):
+            known, other = CHOICES.skill_ids(cv_values)
+        else:
+            known, other = set(), set(normalize_list(cv_values))
+        mask = np.zeros(len(self.vocabulary) + 1, dtype=bool)
+        # Form skills arrive as integer ids; only free-text ones need the vocabulary
+        mask[self._skill_token_ids()[np.fromiter(known, dtype=np.int64, count=len(known))]] = True
+        mask[-1] = False
+        for token in other:
+            token_id = self.vocabulary.get(token)
+            if token_id is not None:
+                mask[token_id] = True
+
+        hits = np.zeros(len(token_ids) + 1, dtype=np.int64)
+        np.cumsum(mask[token_ids], out=hits[1:])
+        intersection = hits[ptr[1:]] - hits[ptr[:-1]]
+        union = counts + len(known) + len(other) - intersection
+
+        score = np.zeros(len(counts), dtype=np.float64)
+        np.divide(intersection, union, out=score, where=union > 0)
+        return score
+
+    def score(self, cv):
+        """Unrounded similarity of ``cv`` against every job, in corpus order"""
+        skill_score = self._jaccard(self.skill_ptr, self.skill_ids, self.skill_count, cv["skills"]["technical"])
+        soft_skill_score = self._jaccard(self.soft_ptr, self.soft_ids, self.soft_count, cv["skills"]["soft"])
+
+        edu = (cv["education"]["qualification"] or "").lower()
+        education_match = np.array(
+            [bool(value) and edu in value for value in self.education_values], dtype=bool
+        )
+        education_score = education_match[self.education_codes].astype(np.float64)
+
+        diff = np.abs(cv_experience_years(cv) - self.experience)
+        experience_score = np.maximum(0, 1 - diff / np.maximum(self.experience, 1))
+
+        return (
+            skill_score * SKILL_WEIGHT +
+            soft_skill_score * SOFT_SKILL_WEIGHT +
+            education_score * EDUCATION_WEIGHT +
+            experience_score * EXPERIENCE_WEIGHT
+        ) * 100
+
+    def rounded_scores(self, cv):
+        """Scores rounded exactly like ``calculate_similarity``"""
+        return [round(score, 2) for score in self.score(cv).tolist()]
+
+
+def _version_from_stats(stats, imported):
+    latest = stats['latest'].isoformat() if stats['latest'] else None
+    return (stats['count'], latest, imported['last'])
+
+
+def corpus_version():
+    """
+    Cheap fingerprint of the jobs table, used to invalidate derived data:
+    row count, newest created_at and the last import_jobs run, which may
+    have updated rows in place.
+    """
+    return _version_from_stats(
+        jobs.objects.aggregate(count=Count('id'), latest=Max('created_at')),
+        JobImport.objects.aggregate(last=Max('id')),
+    )
+
+
+async def acorpus_version():
+    return _version_from_stats(
+        await jobs.objects.aaggregate(count=Count('id'), latest=Max('created_at')),
+        await JobImport.objects.aaggregate(last=Max('id')),
+    )
+
+
+_corpus_lock = threading.Lock()
+_corpus = None
+
+
+def get_job_corpus(version=None):
+    """
+    Process-wide JobCorpus, re-encoded only when the jobs table changes.
+    When a job feature store is configured and populated, its precomputed
+    features are used instead and the jobs table is not read at all.
+    ``version`` is the corpus_version() the caller already has, if any.
+    """
+    from .features import get_feature_store
+
+    global _corpus
+    store = get_feature_store()
+    if store is not None:
+        corpus = store.load()
+        if corpus is not None:
+            return corpus
+
+    if version is None:
+        version = corpus_version()
+    with _corpus_lock:
+        if _corpus is None or _corpus.version != version:
+            rows = (
+                jobs.objects.order_by('id')
+                .values_list(*JOB_MATCH_FIELDS)
+                .iterator(chunk_size=CORPUS_CHUNK_SIZE)
+            )
+            _corpus = JobCorpus.from_rows(rows, version=version)
+        return _corpus
+
+
+def recommendation_order(corpus, cv_data):
+    """[(job_id, score)] for every job in ``corpus``, best first, with scores rounded for display"""
+    scores = corpus.rounded_scores(cv_data)
+    order = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+    return [(int(corpus.ids[position]), scores[position]) for position in order]
+
+
+def recommended_jobs(cv_data):
+    try:
+        ranked = recommendation_order(get_job_corpus(), cv_data)
+    except Exception:
+        logger.exception("Error in job similarity")
+        return []
+
+    job_map = jobs.objects.in_bulk()
+
+    recommendations = []
+    for job_id, score in ranked:
+        job = job_map.get(job_id)
+        if job is not None:
+            recommendations.append({"job": job, "score": score})
+    return recommendations
+
+
+class TopK:
+    """
+    Bounded min-heap keeping the ``k`` best (score, job id) pairs seen so far.
+
+    Ordering matches ``recommended_jobs``: rounded score descending, then job
+    id ascending, so results equal a full sort followed by ``[:k]``.
+    """
+
+    # Rounding to two decimals never moves a score by more than this
+    ROUNDING_SLACK = 0.01
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+
+    def push_scores(self, ids, raw_scores):
+        """Offer a batch of unrounded scores (NumPy arrays) for the same jobs"""
+        if self.k <= 0 or not len(ids):
+            return
+        if len(raw_scores) > self.k:
+            kth = np.partition(raw_scores, len(raw_scores) - self.k)[len(raw_scores) - self.k]
+            keep = np.flatnonzero(raw_scores >= kth - self.ROUNDING_SLACK)
+            ids, raw_scores = ids[keep], raw_scores[keep]
+
+        heap = self._heap
+        for job_id, score in zip(ids.tolist(), raw_scores.tolist()):
+            entry = (round(score, 2), -job_id)
+            if len(heap) < self.k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    def results(self):
+        """[(job_id, score)] best first"""
+        return [(-neg_id, score) for score, neg_id in sorted(self._heap, reverse=True)]
+
+
+def _iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class SkillIndex:
+    """
+    Inverted index from normalized skill token to job ids, built from
+    ``jobs.skills`` and ``jobs.soft_skills``.
+
+    Jobs outside every posting list for a CV score exactly their education
+    and experience part, so they only need scoring when that part alone can
+    reach the fallback threshold. ``refresh`` loads rows by ``created_at``
+    watermark and falls back to a full rebuild when the row count disagrees
+    (deletions or back-dated inserts) or after an import_jobs run; other
+    in-place edits that keep ``created_at`` are not picked up until the
+    next rebuild.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.version = None
+        self.watermark = None
+        self._tokens = {}
+        self._profiles = {}
+        self._arrays = None
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def add(self, job_id, skills, soft_skills, education_required, experience_required):
+        self.discard(job_id)
+        tokens = frozenset(normalize_list(skills)) | frozenset(normalize_list(soft_skills))
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(job_id)
+        self._tokens[job_id] = tokens
+        self._profiles[job_id] = ((education_required or "").lower(), experience_required or 0)
+        self._arrays = None
+
+    def discard(self, job_id):
+        for token in self._tokens.pop(job_id, ()):
+            posting = self.postings[token]
+            posting.discard(job_id)
+            if not posting:
+                del self.postings[token]
+        if self._profiles.pop(job_id, None) is not None:
+            self._arrays = None
+
+    def _load(self, queryset):
+        rows = (
+            queryset.order_by('created_at', 'id')
+            .values_list(*JOB_MATCH_FIELDS, 'created_at')
+            .iterator(chunk_size=CORPUS_CHUNK_SIZE)
+        )
+        for row in rows:
+            self.add(*row[:-1])
+            if row[-1] is not None and (self.watermark is None or row[-1] > self.watermark):
+                self.watermark = row[-1]
+
+    def refresh(self, version=None):
+        if version is None:
+            version = corpus_version()
+        if version == self.version:
+            return
+        if self.version is not None and version[2] != self.version[2]:
+            # An import may have updated rows below the watermark
+            self.__init__()
+        if self.watermark is None:
+            self._load(jobs.objects.all())
+        else:
+            self._load(jobs.objects.filter(created_at__gte=self.watermark))
+        if len(self) != version[0]:
+            self.__init__()
+            self._load(jobs.objects.all())
+        self.version = version
+
+    def _profile_arrays(self):
+        if self._arrays is None:
+            ids = np.fromiter(self._profiles, dtype=np.int64, count=len(self._profiles))
+            education_values = {}
+            codes = np.empty(len(ids), dtype=np.int32)
+            experience = np.empty(len(ids), dtype=np.int64)
+            for i, (education, years) in enumerate(self._profiles.values()):
+                codes[i] = education_values.setdefault(education, len(education_values))
+                experience[i] = years
+            self._arrays = (ids, list(education_values), codes, experience)
+        return self._arrays
+
+    def base_scores(self, cv):
+        """(job ids, score each job gets from education and experience alone)"""
+        ids, education_values, codes, experience = self._profile_arrays()
+        edu = (cv["education"]["qualification"] or "").lower()
+        education_match = np.array(
+            [bool(value) and edu in value for value in education_values], dtype=bool
+        )
+        education_score = education_match[codes].astype(np.float64)
+        diff = np.abs(cv_experience_years(cv) - experience)
+        experience_score = np.maximum(0, 1 - diff / np.maximum(experience, 1))
+        return ids, (education_score * EDUCATION_WEIGHT + experience_score * EXPERIENCE_WEIGHT) * 100
+
+    def candidates(self, cv, threshold):
+        """Sorted ids of jobs sharing a skill with ``cv`` or whose base score reaches ``threshold``"""
+        tokens = set(cv_tokens(cv["skills"]["technical"])) | set(cv_tokens(cv["skills"]["soft"]))
+        matched = set().union(*(self.postings.get(token, ()) for token in tokens))
+        ids, base = self.base_scores(cv)
+        return np.union1d(np.fromiter(matched, dtype=np.int64, count=len(matched)), ids[base >= threshold])
+
+
+_index_lock = threading.Lock()
+_skill_index = SkillIndex()
+
+
+def get_skill_index(version=None):
+    """Process-wide SkillIndex, brought up to date with the jobs table (at ``version``, if known)"""
+    with _index_lock:
+        _skill_index.refresh(version)
+        return _skill_index
+
+
+def pruning_is_exact(ranked, k, threshold):
+    """
+    Jobs left out by SkillIndex.candidates score below ``threshold``, so a
+    pruned ranking is final once its k-th score clears the threshold.
+    """
+    return len(ranked) == k and ranked[-1][1] > threshold + TopK.ROUNDING_SLACK
+
+
+class SkillTokens(Func):
+    """Normalized tokens of a skill array column in SQL, the expression the job_indexes GIN indexes cover"""
+    function = 'cvgen_skill_tokens'
+    output_field = ArrayField(TextField())
+
+
+def job_indexes_enabled():
+    """Pre-filtering in SQL needs the job_indexes migrations, which only apply to PostgreSQL"""
+    return settings.JOB_INDEXES and connection.vendor == 'postgresql'
+
+
+def experience_window(cv_data, threshold):
+    """
+    (low, high) years of experience outside which a job sharing no skill
+    with ``cv_data`` scores below ``threshold`` even with matching
+    education; None when every job can reach it, () when none can.
+    """
+    # Fraction of the experience weight such a job needs
+    needed = (threshold - EDUCATION_WEIGHT * 100) / (EXPERIENCE_WEIGHT * 100)
+    if needed <= 0:
+        return None
+    if needed > 1:
+        return ()
+    years = cv_experience_years(cv_data)
+    # 1 - |years - e| / max(e, 1) >= needed, solved for e
+    low = 0 if abs(years) <= 1 - needed else max(0, math.floor(years / (2 - needed)))
+    return low, max(low, math.ceil(years / needed))
+
+
+def prefilter_jobs(queryset, cv_data, threshold):
+    """
+    ``queryset`` narrowed, through the job_indexes indexes, to jobs that
+    can score ``threshold`` or more: those sharing a skill with the CV or
+    within its experience window. None when no job can be ruled out.
+    """
+    window = experience_window(cv_data, threshold)
+    if window is None:
+        return None
+    condition = Q(pk__in=[])
+    skills = sorted(set(cv_tokens(cv_data["skills"]["technical"])))
+    soft_skills = sorted(set(cv_tokens(cv_data["skills"]["soft"])))
+    if skills:
+        condition |= Q(skill_tokens__overlap=skills)
+    if soft_skills:
+        condition |= Q(soft_skill_tokens__overlap=soft_skills)
+    if window:
+        condition |= Q(experience_required__range=window)
+    return queryset.alias(
+        skill_tokens=SkillTokens('skills'), soft_skill_tokens=SkillTokens('soft_skills'),
+    ).filter(condition)
+
+
+def _rank_jobs(cv_data, k, location, job_type, chunk_size, candidates, prefilter=None, version=None):
+    selector = TopK(k)
+    if location is None and job_type is None:
+        corpus = get_job_corpus(version)
+        if prefilter is not None:
+            narrowed = prefilter(jobs.objects.all())
+            if narrowed is not None:
+                ids = narrowed.order_by('id').values_list('id', flat=True)
+                candidates = np.fromiter(ids, dtype=np.int64)
+        if candidates is not None:
+            corpus = corpus.restrict_to(candidates)
+        selector.push_scores(corpus.ids, corpus.score(cv_data))
+    else:
+        queryset = jobs.objects.all()
+        if location is not None:
+            queryset = queryset.filter(location__iexact=location)
+        if job_type is not None:
+            queryset = queryset.filter(job_type__iexact=job_type)
+        if prefilter is not None:
+            narrowed = prefilter(queryset)
+            if narrowed is not None:
+                queryset = narrowed
+        rows = queryset.order_by('id').values_list(*JOB_MATCH_FIELDS).iterator(chunk_size=chunk_size)
+        for chunk in _iter_chunks(rows, chunk_size):
+            corpus = JobCorpus.from_rows(chunk)
+            if candidates is not None:
+                corpus = corpus.restrict_to(candidates)
+            selector.push_scores(corpus.ids, corpus.score(cv_data))
+    return selector.results()
+
+
+_NORMALIZED_TOKENS_SQL = """
+    SELECT DISTINCT lower(btrim(value, E' \\t\\n\\r\\f\\v')) AS token
+    FROM unnest({column}) AS value
+    WHERE value IS NOT NULL AND value <> ''
+"""
+
+_DATABASE_SCORING_SQL = """
+    WITH scored AS (
+        SELECT j.id, (
+            CASE WHEN sk.total + %(skill_count)s - sk.hits > 0
+                 THEN sk.hits::float8 / (sk.total + %(skill_count)s - sk.hits) ELSE 0 END * %(skill_weight)s +
+            CASE WHEN so.total + %(soft_count)s - so.hits > 0
+                 THEN so.hits::float8 / (so.total + %(soft_count)s - so.hits) ELSE 0 END * %(soft_weight)s +
+            CASE WHEN coalesce(j.education_required, '') <> ''
+                      AND strpos(lower(j.education_required), %(education)s) > 0
+                 THEN 1.0::float8 ELSE 0.0::float8 END * %(education_weight)s +
+            greatest(0, 1 - abs(%(experience)s - coalesce(j.experience_required, 0))::float8
+                            / greatest(coalesce(j.experience_required, 0), 1)) * %(experience_weight)s
+        ) * 100 AS score
+        FROM {table} AS j
+        CROSS JOIN LATERAL (
+            SELECT count(*) AS total, count(*) FILTER (WHERE token = ANY(%(skills)s::text[])) AS hits
+            FROM ({skill_tokens}) AS t
+        ) AS sk
+        CROSS JOIN LATERAL (
+            SELECT count(*) AS total, count(*) FILTER (WHERE token = ANY(%(soft_skills)s::text[])) AS hits
+            FROM ({soft_tokens}) AS t
+        ) AS so
+        WHERE {where}
+    ),
+    cutoff AS (
+        SELECT score FROM scored ORDER BY score DESC LIMIT 1 OFFSET %(offset)s
+    )
+    SELECT id, score FROM scored
+    WHERE score >= coalesce((SELECT score FROM cutoff), '-Infinity'::float8) - %(slack)s
+    ORDER BY score DESC, id
+"""
+
+
+def database_scoring_enabled():
+    """DB-side scoring needs PostgreSQL; anything else uses the Python path"""
+    return settings.JOB_MATCH_BACKEND == 'database' and connection.vendor == 'postgresql'
+
+
+def _rank_jobs_in_database(cv_data, k, location=None, job_type=None):
+    """
+    Score every job inside PostgreSQL and return only the rows that can make
+    the top ``k``: everything within rounding distance of the k-th raw score.
+    Final ordering and rounding happen in TopK so results match the Python path.
+    """
+    if k <= 0:
+        return []
+    skills = sorted(set(cv_tokens(cv_data["skills"]["technical"])))
+    soft_skills = sorted(set(cv_tokens(cv_data["skills"]["soft"])))
+    params = {
+        'skills': skills,
+        'skill_count': len(skills),
+        'soft_skills': soft_skills,
+        'soft_count': len(soft_skills),
+        'education': (cv_data["education"]["qualification"] or "").lower(),
+        'experience': cv_experience_years(cv_data),
+        'skill_weight': SKILL_WEIGHT,
+        'soft_weight': SOFT_SKILL_WEIGHT,
+        'education_weight': EDUCATION_WEIGHT,
+        'experience_weight': EXPERIENCE_WEIGHT,
+        'offset': k - 1,
+        'slack': TopK.ROUNDING_SLACK,
+    }
+    where = ['TRUE']
+    if location is not None:
+        where.append('upper(j.location) = upper(%(location)s)')
+        params['location'] = location
+    if job_type is not None:
+        where.append('upper(j.job_type) = upper(%(job_type)s)')
+        params['job_type'] = job_type
+
+    sql = _DATABASE_SCORING_SQL.format(
+        table=connection.ops.quote_name(jobs._meta.db_table),
+        skill_tokens=_NORMALIZED_TOKENS_SQL.format(column='j.skills'),
+        soft_tokens=_NORMALIZED_TOKENS_SQL.format(column='j.soft_skills'),
+        where=' AND '.join(where),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    selector = TopK(k)
+    if rows:
+        ids, scores = zip(*rows)
+        selector.push_scores(np.array(ids, dtype=np.int64), np.array(scores, dtype=np.float64))
+    return selector.results()
+
+
+def rank_jobs(cv_data, k=DEFAULT_TOP_K, location=None, job_type=None, chunk_size=CORPUS_CHUNK_SIZE,
+              version=None):
+    """
+    [(job_id, score)] for the best ``k`` jobs, best first. ``version`` is
+    the corpus_version() already computed for this request; otherwise it
+    is computed here, once, for both the corpus and the SkillIndex.
+    """
+    with span('matching'):
+        if database_scoring_enabled():
+            return _rank_jobs_in_database(cv_data, k, location, job_type)
+
+        store_serves = _feature_store_generation() is not None
+        if version is None and not store_serves:
+            version = corpus_version()
+        candidates = prefilter = None
+        threshold = settings.JOB_MATCH_FALLBACK_THRESHOLD
+        if job_indexes_enabled():
+            prefilter = lambda queryset: prefilter_jobs(queryset, cv_data, threshold)
+        elif settings.JOB_MATCH_INDEX and not store_serves:
+            # The SkillIndex holds the whole jobs table; with a feature store
+            # the precomputed corpus is scored in full instead
+            candidates = get_skill_index(version).candidates(cv_data, threshold)
+        ranked = _rank_jobs(cv_data, k, location, job_type, chunk_size, candidates, prefilter, version)
+        if (candidates is not None or prefilter is not None) and not pruning_is_exact(ranked, k, threshold):
+            ranked = _rank_jobs(cv_data, k, location, job_type, chunk_size, None, version=version)
+        return ranked
+
+
+def cv_fingerprint(cv):
+    """Hash of the CV fields job matching depends on, so equivalent CVs share it"""
+    payload = {
+        'technical': sorted(set(cv_tokens(cv["skills"]["technical"]))),
+        'soft': sorted(set(cv_tokens(cv["skills"]["soft"]))),
+        'qualification': (cv["education"]["qualification"] or "").lower(),
+        'years': cv_experience_years(cv),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _feature_store_generation():
+    from .features import get_feature_store
+
+    store = get_feature_store()
+    return store.current() if store is not None else None
+
+
+def jobs_version():
+    """Version of whatever the matcher scores against: the feature store or the jobs table"""
+    generation = _feature_store_generation()
+    if generation is not None:
+        return ('features', generation)
+    return ('jobs',) + corpus_version()
+
+
+async def ajobs_version():
+    generation = _feature_store_generation()
+    if generation is not None:
+        return ('features', generation)
+    return ('jobs',) + await acorpus_version()
+
+
+def _table_version(version):
+    """The corpus_version() part of a jobs_version(), None for a feature store version"""
+    if version is None or version[0] != 'jobs':
+        return None
+    return version[1:]
+
+
+def _recommendation_cache():
+    alias = settings.RECOMMENDATION_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _recommendation_cache_key(cv_data, k, location, job_type, version):
+    parts = [cv_fingerprint(cv_data), k, location, job_type, version]
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'recommendations:{digest}'
+
+
+def top_k_jobs(cv_data, k=DEFAULT_TOP_K, location=None, job_type=None, chunk_size=CORPUS_CHUNK_SIZE):
+    """
+    Best ``k`` jobs for a CV as [{"job": ..., "score": ...}], without sorting
+    or materializing the whole table.
+
+    Unfiltered requests score the cached corpus; filtered ones stream the
+    matching rows from the database chunk by chunk, so memory stays O(k).
+    With ``JOB_MATCH_INDEX`` on and no feature store, only SkillIndex
+    candidates are scored and the full pass runs only when the pruned
+    ranking cannot be proven exact.
+    With ``JOB_MATCH_BACKEND = 'database'`` on PostgreSQL the scoring runs
+    in SQL and only the top rows come back.
+
+    Rankings are cached under RECOMMENDATION_CACHE_ALIAS, keyed by the CV
+    fingerprint and the current jobs version, so any change to the jobs
+    table (or a feature store refresh) invalidates them.
+    """
+    try:
+        cache = _recommendation_cache()
+        ranked = version = None
+        if cache is not None:
+            version = jobs_version()
+            key = _recommendation_cache_key(cv_data, k, location, job_type, version)
+            ranked = cache.get(key)
+        if ranked is None:
+            ranked = rank_jobs(cv_data, k, location, job_type, chunk_size, _table_version(version))
+            if cache is not None:
+                cache.set(key, ranked, settings.RECOMMENDATION_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception("Error in job similarity")
+        return []
+
+    job_map = jobs.objects.in_bulk([job_id for job_id, _ in ranked])
+    return [
+        {"job": job_map[job_id], "score": score}
+        for job_id, score in ranked
+        if job_id in job_map
+    ]
+
+
+async def atop_k_jobs(cv_data, k=DEFAULT_TOP_K, location=None, job_type=None, chunk_size=CORPUS_CHUNK_SIZE):
+    """
+    Async counterpart of top_k_jobs for ASGI views. Cache and job lookups
+    use the async ORM and cache APIs; ranking itself (NumPy scoring plus
+    corpus/index refreshes) only runs on a cache miss, via sync_to_async.
+    """
+    try:
+        cache = _recommendation_cache()
+        ranked = version = None
+        if cache is not None:
+            version = await ajobs_version()
+            key = _recommendation_cache_key(cv_data, k, location, job_type, version)
+            ranked = await cache.aget(key)
+        if ranked is None:
+            ranked = await sync_to_async(rank_jobs)(
+                cv_data, k, location, job_type, chunk_size, _table_version(version),
+            )
+            if cache is not None:
+                await cache.aset(key, ranked, settings.RECOMMENDATION_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception("Error in job similarity")
+        return []
+
+    job_map = await jobs.objects.ain_bulk([job_id for job_id, _ in ranked])
+    return [
+        {"job": job_map[job_id], "score": score}
+        for job_id, score in ranked
+        if job_id in job_map
+    ]
@@ -0,0 +1,305 @@
+import contextvars
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+# Upper bounds of the latency buckets, in seconds, and of the per-request query count buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Whether spans in this request are recorded; None outside requests, where each span samples itself
+_sampled = contextvars.ContextVar('cvgen_metrics_sampled', default=None)
+# [query count, query seconds] of a sampled request
+_queries = contextvars.ContextVar('cvgen_metrics_queries', default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count, as in a Prometheus histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile; None when empty or beyond the last bucket"""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def cumulative(self):
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class MetricsRegistry:
+    """
+    Process-wide histograms keyed by metric name and label values, plus
+    gauge callbacks read when the metrics are exported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._gauges = {}
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def gauge(self, name, read):
+        """Export ``read()`` (a number, or a dict of numbers) as gauge ``name``"""
+        self._gauges[name] = read
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def _read_gauges(self):
+        values = {}
+        for name, read in self._gauges.items():
+            try:
+                value = read()
+            except Exception as e:
+                print(f"Metrics gauge {name} failed:", e)
+                continue
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, (int, float)) and not isinstance(item, bool):
+                        values[f"{name}_{key}"] = item
+            else:
+                values[name] = value
+        return values
+
+    def snapshot(self):
+        """JSON-serializable view: histograms with approximate p50/p95/p99, and gauges"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            histograms = {}
+            for (name, labels), histogram in items:
+                histograms.setdefault(name, []).append({
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                    'p99': histogram.quantile(0.99),
+                })
+        return {'histograms': histograms, 'gauges': self._read_gauges()}
+
+    def prometheus(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines, typed = [], set()
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (name, labels), histogram in items:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                bounds = [repr(float(bound)) for bound in histogram.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+metrics = MetricsRegistry()
+
+
+def sample():
+    return settings.METRICS_ENABLED and random.random() < settings.METRICS_SAMPLE_RATE
+
+
+@contextmanager
+def span(name):
+    """
+    Time the block as ``cvgen_span_duration_seconds{span=name}``. Only
+    sampled requests record spans (METRICS_SAMPLE_RATE); outside a request
+    each span is sampled on its own.
+    """
+    sampled = _sampled.get()
+    if sampled is None:
+        sampled = sample()
+    if not sampled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe('cvgen_span_duration_seconds', time.perf_counter() - started, span=name)
+
+
+def count_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding each query of a sampled request to its totals"""
+    totals = _queries.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver: wrap every new database connection with count_queries"""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def start_request():
+    """Decide whether this request is sampled; returns the context tokens for finish_request"""
+    sampled = sample()
+    return _sampled.set(sampled), _queries.set([0, 0.0] if sampled else None)
+
+
+def finish_request(tokens, view, method, status, seconds):
+    sampled_token, queries_token = tokens
+    totals = _queries.get()
+    _queries.reset(queries_token)
+    _sampled.reset(sampled_token)
+    metrics.observe('cvgen_request_duration_seconds', seconds, view=view, method=method, status=status)
+    if totals is not None:
+        metrics.observe('cvgen_request_queries', totals[0], buckets=QUERY_COUNT_BUCKETS, view=view)
+        metrics.observe('cvgen_request_query_seconds', totals[1], view=view)
+
+
+class MetricsMiddleware:
+    """
+    Times every request as cvgen_request_duration_seconds{view,method,status}
+    and, for sampled requests, counts their database queries. Put it first
+    in MIDDLEWARE so the time spent in the other middleware is included.
+    Streaming responses are timed until their headers are ready.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        started, tokens = time.perf_counter(), start_request()
+        response = self.get_response(request)
+        self._finish(request, response, tokens, started)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        started, tokens = time.perf_counter(), start_request()
+        response = await self.get_response(request)
+        self._finish(request, response, tokens, started)
+        return response
+
+    def _finish(self, request, response, tokens, started):
+        match = request.resolver_match
+        finish_request(
+            tokens,
+            view=match.view_name if match is not None else 'unmatched',
+            method=request.method,
+            status=f"{response.status_code // 100}xx",
+            seconds=time.perf_counter() - started,
+        )
+
+
+class _TimedSessionStore:
+    """Times load and save of the SessionStore it is mixed into as session.load / session.save spans"""
+
+    _timing = False
+
+    @contextmanager
+    def _span(self, name):
+        # Engines whose aload/save go through load/create are timed once
+        if self._timing:
+            yield
+            return
+        self._timing = True
+        try:
+            with span(name):
+                yield
+        finally:
+            self._timing = False
+
+    def load(self):
+        with self._span('session.load'):
+            return super().load()
+
+    async def aload(self):
+        with self._span('session.load'):
+            return await super().aload()
+
+    def save(self, must_create=False):
+        with self._span('session.save'):
+            return super().save(must_create)
+
+    async def asave(self, must_create=False):
+        with self._span('session.save'):
+            return await super().asave(must_create)
+
+
+_timed_stores = {}
+
+
+def timed_session_store(store):
+    """Subclass of SessionStore class ``store`` recording session.load and session.save spans"""
+    timed = _timed_stores.get(store)
+    if timed is None:
+        timed = _timed_stores[store] = type(store.__name__, (_TimedSessionStore, store), {})
+    return timed
+
+
+class MetricsSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware whose sessions, of whichever SESSION_ENGINE, record load and save spans"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.SessionStore = timed_session_store(self.SessionStore)
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:15
+
+import django.contrib.postgres.fields
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='jobs',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=150)),
+                ('company', models.CharField(max_length=150)),
+                ('location', models.CharField(max_length=100)),
+                ('experience_required', models.IntegerField()),
+                ('job_type', models.CharField(max_length=50)),
+                ('skills', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('soft_skills', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('education_required', models.CharField(blank=True, max_length=150, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'jobs',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='GenerationTask',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('cv_data', models.JSONField()),
+                ('regenerate', models.BooleanField(default=False)),
+                ('template_fallback', models.BooleanField(default=True)),
+                ('result', models.TextField(blank=True, null=True)),
+                ('source', models.CharField(blank=True, max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('deadline', models.DateTimeField()),
+            ],
+        ),
+    ]
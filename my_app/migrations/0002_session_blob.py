@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('expire_date', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
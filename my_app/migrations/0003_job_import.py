@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:57
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('my_app', '0002_session_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
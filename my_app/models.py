@@ -1,4 +1,7 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 
 class jobs(models.Model):
@@ -29,3 +32,73 @@ class jobs(models.Model):
 
     def __str__(self):
         return f"{self.title} - {self.company}"
+
+
+class GenerationTask(models.Model):
+    """Background CV generation, polled by the browser until it finishes"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+
+    cv_data = models.JSONField()
+    regenerate = models.BooleanField(default=False)
+    template_fallback = models.BooleanField(default=True)
+
+    result = models.TextField(null=True, blank=True)
+    source = models.CharField(max_length=10, blank=True)
+    error = models.TextField(blank=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    deadline = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class SessionBlob(models.Model):
+    """Large session value stored once by content hash (see my_app.sessions)"""
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    content = models.TextField()
+    # The latest expiry of the sessions referencing it
+    expire_date = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.digest
+
+
+class JobImport(models.Model):
+    """
+    One ``manage.py import_jobs`` run. The latest id is part of the jobs
+    corpus version, since an import can change rows in place.
+    """
+
+    source = models.CharField(max_length=255, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(auto_now_add=True)
+    rows = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.source or 'import'} ({self.rows} rows)"
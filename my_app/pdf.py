@@ -0,0 +1,237 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import span
+from .pdf_layouts import PDF_TEMPLATES
+
+
+# Bump whenever the rendered output changes so cached PDFs are not reused
+PDF_LAYOUT_VERSION = 1
+
+
+def pdf_template_name(name=None):
+    """``name``, or PDF_DEFAULT_TEMPLATE when empty; KeyError unless it is in PDF_TEMPLATES"""
+    name = name or settings.PDF_DEFAULT_TEMPLATE
+    if name not in PDF_TEMPLATES:
+        raise KeyError(name)
+    return name
+
+
+def render_cv_pdf(cv_content, template=None):
+    """Render CV text to PDF bytes with one of the PDF_TEMPLATES"""
+    return PDF_TEMPLATES[pdf_template_name(template)].render(cv_content)
+
+
+class RenderUnavailable(Exception):
+    """The process renderer is saturated or did not finish in time"""
+
+
+def _warm_worker():
+    # Importing this module compiled the templates; also load ReportLab's lazy imports
+    for name in PDF_TEMPLATES:
+        render_cv_pdf("Warm Up\n\nSummary\nwarm up", name)
+
+
+def _ping():
+    return True
+
+
+def _render_in_worker(cv_content, template):
+    return render_cv_pdf(cv_content, template)
+
+
+class ProcessRenderer:
+    """
+    Renders PDFs in a warm pool of worker processes, so long layouts do not
+    hold the GIL of the web workers.
+
+    At most ``max_queue`` renders are queued or running; callers that find
+    the queue full wait up to ``queue_wait`` seconds and then get
+    RenderUnavailable, as do renders taking longer than ``timeout``.
+    """
+
+    def __init__(self, processes, max_queue, queue_wait, timeout):
+        self.processes = processes
+        self.queue_wait = queue_wait
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_queue)
+        # Spawned, not forked: the web process is multi-threaded
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_worker,
+        )
+
+    def warm(self):
+        """Start every worker process now instead of on the first render"""
+        for future in [self._executor.submit(_ping) for _ in range(self.processes)]:
+            future.result()
+
+    def render(self, cv_content, template=None, block=False):
+        """PDF bytes for ``cv_content``; ``block`` waits for a queue slot as long as needed"""
+        template = pdf_template_name(template)
+        if not self._slots.acquire(timeout=None if block else self.queue_wait):
+            raise RenderUnavailable("PDF render queue is full")
+        try:
+            future = self._executor.submit(_render_in_worker, cv_content, template)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot stays taken until the worker is really done, even after a timeout
+        future.add_done_callback(lambda done: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise RenderUnavailable(f"PDF render took longer than {self.timeout}s")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_renderer_lock = threading.Lock()
+_renderer = None
+
+
+def get_renderer():
+    """The ProcessRenderer when PDF_RENDER_BACKEND is 'process', else None"""
+    global _renderer
+    if settings.PDF_RENDER_BACKEND != 'process':
+        return None
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ProcessRenderer(
+                processes=settings.PDF_RENDER_PROCESSES,
+                max_queue=settings.PDF_RENDER_MAX_QUEUE,
+                queue_wait=settings.PDF_RENDER_QUEUE_WAIT,
+                timeout=settings.PDF_RENDER_TIMEOUT,
+            )
+            _renderer.warm()
+        return _renderer
+
+
+def render_pdf(cv_content, template=None, block=False):
+    """
+    Render with the configured PDF_RENDER_BACKEND: in this thread
+    ('inline') or in the worker process pool ('process'). May raise
+    RenderUnavailable with the process backend; batch jobs pass
+    ``block=True`` to wait for queue space instead.
+    """
+    renderer = get_renderer()
+    with span('pdf'):
+        if renderer is None:
+            return render_cv_pdf(cv_content, template)
+        return renderer.render(cv_content, template, block=block)
+
+
+def cv_pdf_key(cv_content, template=None):
+    """Content hash identifying the PDF of ``cv_content`` in ``template``; also used as its ETag"""
+    template = pdf_template_name(template)
+    return hashlib.sha256(f"{PDF_LAYOUT_VERSION}\0{template}\0{cv_content}".encode()).hexdigest()
+
+
+def _pdf_cache():
+    alias = settings.PDF_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def _cache_key(cv_content, template):
+    return f"cvpdf:{cv_pdf_key(cv_content, template)}"
+
+
+def _store(cache, key, pdf):
+    # Entry count (MAX_ENTRIES), lifetime and per-PDF size bound the cache
+    if len(pdf) <= settings.PDF_CACHE_MAX_BYTES:
+        cache.set(key, pdf, settings.PDF_CACHE_TIMEOUT)
+
+
+_executor_lock = threading.Lock()
+_executor = None
+_pending = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PDF_PRERENDER_WORKERS,
+                thread_name_prefix='cvgen-pdf',
+            )
+        return _executor
+
+
+def _render_into_cache(cv_content, template, key):
+    pdf = render_pdf(cv_content, template)
+    _store(_pdf_cache(), key, pdf)
+    return pdf
+
+
+def _forget(key, future):
+    with _executor_lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def prerender_cv_pdf(cv_content, template=None):
+    """
+    Queue rendering of ``cv_content`` into the PDF cache so the download is
+    ready when the user asks for it; ``template`` defaults to
+    PDF_DEFAULT_TEMPLATE, the one the download button asks for. Best
+    effort: nothing is queued when
+    PDF_PRERENDER is off, the PDF is already cached, or PDF_PRERENDER_MAX_PENDING
+    renders are waiting. Returns the pending future, if any.
+    """
+    cache = _pdf_cache()
+    if cache is None or not settings.PDF_PRERENDER or not cv_content:
+        return None
+    template = pdf_template_name(template)
+    key = _cache_key(cv_content, template)
+    if cache.has_key(key):
+        return None
+
+    executor = _get_executor()
+    with _executor_lock:
+        future = _pending.get(key)
+        queued = future is None and len(_pending) < settings.PDF_PRERENDER_MAX_PENDING
+        if queued:
+            future = _pending[key] = executor.submit(_render_into_cache, cv_content, template, key)
+    if queued:
+        # Outside the lock: the callback runs right here if the render already finished
+        future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def get_cv_pdf(cv_content, template=None):
+    """
+    PDF bytes for ``cv_content`` in ``template`` (PDF_DEFAULT_TEMPLATE when
+    None), rendered once and then served from the
+    PDF_CACHE_ALIAS cache (memory or, with FileBasedCache, disk). A render
+    queued by prerender_cv_pdf is awaited for up to PDF_PRERENDER_WAIT
+    seconds before rendering here instead. Raises RenderUnavailable when
+    the process renderer is saturated.
+    """
+    cache = _pdf_cache()
+    template = pdf_template_name(template)
+    key = _cache_key(cv_content, template)
+    pdf = cache.get(key) if cache is not None else None
+
+    if pdf is None:
+        with _executor_lock:
+            future = _pending.get(key)
+        if future is not None:
+            try:
+                pdf = future.result(timeout=settings.PDF_PRERENDER_WAIT)
+            except Exception as e:
+                print("PDF pre-render not usable:", repr(e))
+
+    if pdf is None:
+        pdf = render_pdf(cv_content, template)
+        if cache is not None:
+            _store(cache, key, pdf)
+    return pdf
@@ -0,0 +1,298 @@
+import io
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+from reportlab.pdfgen import canvas
+
+
+FONT_NAME = "Helvetica"
+FONT_SIZE = 10
+MARGIN = 50
+LINE_HEIGHT = 12
+MAX_LINE_WIDTH = letter[0] - 2 * MARGIN
+
+
+@lru_cache(maxsize=65536)
+def text_width(text):
+    """Width of ``text`` in the classic CV font; memoized since the font never changes"""
+    return stringWidth(text, FONT_NAME, FONT_SIZE)
+
+
+@lru_cache(maxsize=65536)
+def string_width(text, font_name, font_size):
+    return stringWidth(text, font_name, font_size)
+
+
+def wrap_line(line, max_width=MAX_LINE_WIDTH, measure=text_width):
+    """Split ``line`` exactly like reportlab's simpleSplit, measuring each word once"""
+    space = measure(' ')
+    wrapped, words, width = [], [], -space
+    for word in line.split():
+        word_width = measure(word)
+        if width + space + word_width <= max_width or not words:
+            words.append(word)
+            width += space + word_width
+        else:
+            wrapped.append(' '.join(words))
+            words, width = [word], word_width
+    if words:
+        wrapped.append(' '.join(words))
+    return wrapped
+
+
+def layout_lines(cv_content, max_width=MAX_LINE_WIDTH):
+    """The lines drawn for ``cv_content``: short lines as they are, long ones wrapped"""
+    lines = []
+    for line in cv_content.split('\n'):
+        if text_width(line) > max_width:
+            lines.extend(wrap_line(line, max_width))
+        else:
+            lines.append(line)
+    return lines
+
+
+# Underlines such as '───────' that the template CV puts below its headings
+RULE_LINE = re.compile(r'^[─━═=_~*-]+$')
+MINOR_WORDS = {'and', 'of', 'the', 'for', 'in', 'on', '&'}
+
+CVDocument = namedtuple('CVDocument', 'title header sections')
+CVSection = namedtuple('CVSection', 'heading lines')
+
+
+def is_section_heading(line):
+    """A short Title Case or upper case line without sentence or field punctuation"""
+    words = line.split()
+    return (
+        0 < len(words) <= 5 and len(line) <= 40
+        and ':' not in line and line[-1] not in '.,;!?'
+        and any(c.isalpha() for c in line)
+        and all(word[0].isupper() or not word[0].isalpha() or word in MINOR_WORDS for word in words)
+    )
+
+
+def parse_cv_sections(cv_content):
+    """
+    Split CV text into the structure the generation prompt asks for: the
+    name on the first line, contact lines, then sections introduced by a
+    Title Case heading on its own line after a blank line. Indentation and
+    rule lines are dropped; blank lines inside a section are kept as ''.
+    """
+    title, header, sections = '', [], []
+    lines = header
+    after_blank = True
+    for line in cv_content.splitlines():
+        line = line.strip()
+        if not line:
+            after_blank = True
+            continue
+        if RULE_LINE.match(line):
+            continue
+        if not title:
+            title = line
+        elif after_blank and is_section_heading(line):
+            sections.append(CVSection(line, []))
+            lines = sections[-1].lines
+        else:
+            if after_blank and lines:
+                lines.append('')
+            lines.append(line)
+        after_blank = False
+    return CVDocument(title, header, sections)
+
+
+class TextStyle:
+    """Font, size, spacing and colour of one kind of line"""
+
+    def __init__(self, font_name, font_size, leading, color=None, space_before=0,
+                 uppercase=False, align='left', rule=0):
+        # Loads the font metrics now, and fails at import for unknown fonts
+        getFont(font_name)
+        self.font_name = font_name
+        self.font_size = font_size
+        self.leading = leading
+        self.color = color
+        self.space_before = space_before
+        self.uppercase = uppercase
+        self.align = align
+        # Thickness of a line drawn under the text, 0 for none
+        self.rule = rule
+
+    def width(self, text):
+        return string_width(text, self.font_name, self.font_size)
+
+    def wrap(self, text, max_width):
+        if self.width(text) <= max_width:
+            return [text]
+        return wrap_line(text, max_width, self.width)
+
+
+class _Flow:
+    """Cursor placing lines down the columns of successive pages"""
+
+    def __init__(self, template):
+        self.template = template
+        self.pages = [[]]
+        self.column = 0
+        self.top = self.y = template.top
+
+    def x(self, spanning):
+        return self.template.margin if spanning else self.template.column_x[self.column]
+
+    def next_column(self):
+        if self.column + 1 < self.template.columns:
+            self.column += 1
+        else:
+            self.pages.append([])
+            self.column = 0
+            self.top = self.template.top
+        self.y = self.top
+
+    def line(self, style, text, spanning=False, keep=0):
+        """Place one line; ``keep`` is the height that must fit below it on the same column"""
+        y = self.y if self.y == self.top else self.y - style.space_before
+        if y - keep < self.template.bottom and self.y != self.top:
+            self.next_column()
+            y = self.y
+        width = self.template.full_width if spanning else self.template.column_width
+        x = self.x(spanning)
+        if style.uppercase:
+            text = text.upper()
+        if style.align == 'center':
+            x += (width - style.width(text)) / 2
+        self.pages[-1].append(('text', style, x, y, text))
+        if style.rule:
+            self.pages[-1].append(('rule', style, self.x(spanning), y - style.font_size * 0.35, width))
+        self.y = y - style.leading
+
+    def gap(self, height):
+        if self.y != self.top:
+            self.y -= height
+
+
+class PDFTemplate:
+    """
+    A compiled CV layout: page geometry, columns and the styles of the
+    title, contact lines, section headings and body text, all worked out
+    once when the template is defined.
+
+    Structured templates lay out the sections found by parse_cv_sections,
+    with the title and contact lines across the full width of the first
+    page and the sections flowing down ``columns`` columns. Unstructured
+    ones draw the CV text line by line in the body style.
+    """
+
+    def __init__(self, name, label, body, title=None, contact=None, heading=None,
+                 margin=MARGIN, columns=1, gutter=18, pagesize=letter, structured=True):
+        self.name = name
+        self.label = label
+        self.body = body
+        self.title = title or body
+        self.contact = contact or body
+        self.heading = heading or body
+        self.margin = margin
+        self.columns = columns
+        self.pagesize = pagesize
+        self.structured = structured
+
+        page_width, page_height = pagesize
+        self.top = page_height - margin
+        self.bottom = margin
+        self.full_width = page_width - 2 * margin
+        self.column_width = (self.full_width - gutter * (columns - 1)) / columns
+        self.column_x = [margin + column * (self.column_width + gutter) for column in range(columns)]
+
+    def layout(self, cv_content):
+        """Pages of ('text', style, x, y, text) and ('rule', style, x, y, width) drawing operations"""
+        flow = _Flow(self)
+        if not self.structured:
+            for line in cv_content.split('\n'):
+                for part in self.body.wrap(line, self.column_width):
+                    flow.line(self.body, part)
+            return flow.pages
+
+        document = parse_cv_sections(cv_content)
+        for line in self.title.wrap(document.title, self.full_width):
+            flow.line(self.title, line, spanning=True)
+        for line in document.header:
+            if not line:
+                flow.gap(self.contact.leading / 2)
+                continue
+            for part in self.contact.wrap(line, self.full_width):
+                flow.line(self.contact, part, spanning=True)
+        if document.title:
+            flow.y = flow.top = flow.y - self.heading.space_before
+
+        for section in document.sections:
+            # Never leave a heading alone at the bottom of a column
+            flow.line(self.heading, section.heading, keep=self.heading.leading + self.body.leading)
+            for line in section.lines:
+                if not line:
+                    flow.gap(self.body.leading / 2)
+                    continue
+                for part in self.body.wrap(line, self.column_width):
+                    flow.line(self.body, part)
+        return flow.pages
+
+    def draw(self, pages):
+        """PDF bytes for pages from layout"""
+        buffer = io.BytesIO()
+        p = canvas.Canvas(buffer, pagesize=self.pagesize)
+        for page in pages:
+            font = color = None
+            for kind, style, x, y, value in page:
+                if style.color != color:
+                    color = style.color
+                    # An uncolored style after a colored one goes back to the default, black
+                    p.setFillColorRGB(*(color or BLACK))
+                    p.setStrokeColorRGB(*(color or BLACK))
+                if kind == 'rule':
+                    p.setLineWidth(style.rule)
+                    p.line(x, y, x + value, y)
+                    continue
+                if (style.font_name, style.font_size) != font:
+                    font = (style.font_name, style.font_size)
+                    p.setFont(*font)
+                p.drawString(x, y, value)
+            p.showPage()
+        p.save()
+        return buffer.getvalue()
+
+    def render(self, cv_content):
+        return self.draw(self.layout(cv_content))
+
+
+ACCENT = (0.12, 0.31, 0.56)
+MUTED = (0.35, 0.35, 0.35)
+BLACK = (0, 0, 0)
+
+PDF_TEMPLATES = {template.name: template for template in (
+    # The original layout: every line as written, Helvetica 10 on letter paper
+    PDFTemplate(
+        'classic', "Classic", structured=False,
+        body=TextStyle(FONT_NAME, FONT_SIZE, LINE_HEIGHT),
+    ),
+    PDFTemplate(
+        'modern', "Modern", margin=54,
+        title=TextStyle('Helvetica-Bold', 22, 28, color=ACCENT),
+        contact=TextStyle('Helvetica', 9.5, 13, color=MUTED),
+        heading=TextStyle('Helvetica-Bold', 11, 18, color=ACCENT, space_before=12, uppercase=True, rule=0.75),
+        body=TextStyle('Helvetica', 10, 13.5, color=BLACK),
+    ),
+    PDFTemplate(
+        'serif', "Serif", margin=60, pagesize=A4,
+        title=TextStyle('Times-Bold', 22, 28, align='center'),
+        contact=TextStyle('Times-Italic', 10.5, 14, align='center'),
+        heading=TextStyle('Times-Bold', 12.5, 19, space_before=10, rule=0.5),
+        body=TextStyle('Times-Roman', 11, 14),
+    ),
+    PDFTemplate(
+        'compact', "Compact (two columns)", margin=36, columns=2, gutter=20,
+        title=TextStyle('Helvetica-Bold', 16, 20),
+        contact=TextStyle('Helvetica', 8.5, 11, color=MUTED),
+        heading=TextStyle('Helvetica-Bold', 9, 14, color=ACCENT, space_before=8, uppercase=True, rule=0.5),
+        body=TextStyle('Helvetica', 8.5, 10.5, color=BLACK),
+    ),
+)}
@@ -0,0 +1,233 @@
+import atexit
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.base import CreateError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import metrics
+from .models import SessionBlob
+
+
+KEY_PREFIX = 'cvgen.sessions:'
+BLOB_PREFIX = 'cvgen.sessionblob:'
+BLOB_REF = '__blob__'
+
+
+class SessionWriter:
+    """
+    Database side of SessionStore. Saved sessions and new blobs wait here
+    and are written in bulk, one row per session however many times it was
+    saved, SESSION_WRITE_BEHIND seconds later on a background thread; with
+    0 they are written before save() returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._blobs = {}
+        self._touched = {}
+        self._thread = None
+        self.flushes = 0
+        self.coalesced = 0
+
+    def schedule(self, session, blobs=(), touched=()):
+        """Queue the Session row, new SessionBlob rows, and digests of older blobs it still references"""
+        with self._lock:
+            if session.session_key in self._sessions:
+                self.coalesced += 1
+            self._sessions[session.session_key] = session
+            for blob in blobs:
+                self._blobs[blob.digest] = blob
+            for digest in touched:
+                self._touched[digest] = max(self._touched.get(digest, session.expire_date), session.expire_date)
+            if settings.SESSION_WRITE_BEHIND > 0 and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cvgen-sessions', daemon=True)
+                self._thread.start()
+        if settings.SESSION_WRITE_BEHIND <= 0:
+            self.flush()
+
+    def pending(self, session_key):
+        """The unwritten Session row for ``session_key``, if any"""
+        with self._lock:
+            return self._sessions.get(session_key)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._sessions.pop(session_key, None)
+
+    def flush(self):
+        """Write everything waiting; returns the number of session rows written"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            blobs, self._blobs = self._blobs, {}
+            touched, self._touched = self._touched, {}
+        if not sessions and not blobs:
+            return 0
+        try:
+            # Blobs first: a session row must never point at a missing blob
+            SessionBlob.objects.bulk_create(
+                blobs.values(), update_conflicts=True, unique_fields=['digest'], update_fields=['expire_date'],
+            )
+            # Referenced blobs live as long as the sessions using them
+            for expire_date in set(touched.values()):
+                digests = [digest for digest, expiry in touched.items() if expiry == expire_date]
+                SessionBlob.objects.filter(digest__in=digests, expire_date__lt=expire_date).update(
+                    expire_date=expire_date,
+                )
+            cached_db.SessionStore.get_model_class().objects.bulk_create(
+                sessions.values(), update_conflicts=True, unique_fields=['session_key'],
+                update_fields=['session_data', 'expire_date'],
+            )
+        except Exception as e:
+            print("Session write-behind failed:", e)
+            # Retry on the next flush unless a newer save replaced them
+            with self._lock:
+                for key, session in sessions.items():
+                    self._sessions.setdefault(key, session)
+                for digest, blob in blobs.items():
+                    self._blobs.setdefault(digest, blob)
+                for digest, expire_date in touched.items():
+                    self._touched.setdefault(digest, expire_date)
+            return 0
+        with self._lock:
+            self.flushes += 1
+        return len(sessions)
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._sessions), 'flushes': self.flushes, 'coalesced': self.coalesced}
+
+    def _run(self):
+        while True:
+            time.sleep(max(settings.SESSION_WRITE_BEHIND, 0.1))
+            self.flush()
+            close_old_connections()
+
+
+session_writer = SessionWriter()
+atexit.register(session_writer.flush)
+metrics.gauge('cvgen_session_writer', session_writer.stats)
+
+
+def blob_digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    Session engine for the stepper flow (SESSION_ENGINE = 'my_app.sessions').
+
+    Sessions are read from and saved to SESSION_CACHE_ALIAS; the database
+    copy, only read on a cache miss, is written by session_writer. Strings
+    of SESSION_BLOB_MIN_BYTES or more, such as the generated CV, are stored
+    once by content hash in the cache and the SessionBlob table, and the
+    session keeps only the hash.
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Blobs this session already references, so saving again skips them
+        self._blob_digests = set()
+
+    def _blob_cache_key(self, digest):
+        return BLOB_PREFIX + digest
+
+    def _pack(self, data):
+        """``data`` with large strings replaced by blob references, the new blobs and the reused digests"""
+        packed, blobs, touched = {}, [], []
+        age = self.get_expiry_age()
+        for key, value in data.items():
+            if isinstance(value, str) and len(value) >= settings.SESSION_BLOB_MIN_BYTES:
+                digest = blob_digest(value)
+                if digest in self._blob_digests:
+                    self._cache.touch(self._blob_cache_key(digest), age)
+                    touched.append(digest)
+                else:
+                    self._cache.set(self._blob_cache_key(digest), value, age)
+                    blobs.append(SessionBlob(digest=digest, content=value, expire_date=self.get_expiry_date()))
+                    self._blob_digests.add(digest)
+                value = {BLOB_REF: digest}
+            packed[key] = value
+        return packed, blobs, touched
+
+    def _unpack(self, packed):
+        digests = {
+            key: value[BLOB_REF] for key, value in packed.items()
+            if isinstance(value, dict) and list(value) == [BLOB_REF]
+        }
+        if not digests:
+            return packed
+        found = self._cache.get_many([self._blob_cache_key(digest) for digest in digests.values()])
+        missing = {digest for digest in digests.values() if self._blob_cache_key(digest) not in found}
+        if missing:
+            # Not self.get_expiry_age(): the session is still loading
+            age = self.get_expiry_age(expiry=packed.get('_session_expiry'))
+            for blob in SessionBlob.objects.filter(digest__in=missing, expire_date__gt=timezone.now()):
+                found[self._blob_cache_key(blob.digest)] = blob.content
+                self._cache.set(self._blob_cache_key(blob.digest), blob.content, age)
+
+        data = dict(packed)
+        for key, digest in digests.items():
+            value = found.get(self._blob_cache_key(digest))
+            if value is None:
+                # Lost blob: drop the key, as if it had never been set
+                print("Session blob missing:", digest)
+                del data[key]
+            else:
+                data[key] = value
+                self._blob_digests.add(digest)
+        return data
+
+    def load(self):
+        try:
+            packed = self._cache.get(self.cache_key)
+        except Exception:
+            packed = None
+
+        if packed is None:
+            row = session_writer.pending(self.session_key) or self._get_session_from_db()
+            if row is None or row.expire_date <= timezone.now():
+                self._session_key = None
+                return {}
+            packed = self.decode(row.session_data)
+            self._cache.set(self.cache_key, packed, self.get_expiry_age(expiry=row.expire_date))
+        return self._unpack(packed)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        packed, blobs, touched = self._pack(self._get_session(no_load=must_create))
+        age = self.get_expiry_age()
+        if must_create:
+            # The cache arbitrates new keys, before the database row exists
+            if not self._cache.add(self.cache_key, packed, age):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, packed, age)
+        session_writer.schedule(self.create_model_instance(packed), blobs, touched)
+
+    def delete(self, session_key=None):
+        session_writer.discard(session_key or self.session_key)
+        super().delete(session_key)
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        super().clear_expired()
+        SessionBlob.objects.filter(expire_date__lt=timezone.now()).delete()
@@ -0,0 +1,320 @@
+import asyncio
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+
+
+LOCK_POLL_INTERVAL = 0.1
+
+
+def cache_is_shared(alias):
+    """Whether cache ``alias`` can be seen by other processes (not per-process memory or a no-op)"""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    Within a process, callers arriving while a call for their key is in
+    flight wait for it and share its result or exception. When the cache
+    alias named by the ``lock_alias_setting`` setting is shared between
+    processes (Redis, database or file cache), the leader also holds a lock
+    there and other processes wait for it to publish a result that their
+    ``lookup`` can find, instead of calling ``fn`` themselves.
+
+    That only pays off when ``lookup`` reads a cache other processes see
+    too: the alias named by ``results_alias_setting``, when given, must be
+    shared as well, or locking stays within the process.
+    """
+
+    def __init__(self, lock_alias_setting, lock_timeout_setting, results_alias_setting=None):
+        self.lock_alias_setting = lock_alias_setting
+        self.lock_timeout_setting = lock_timeout_setting
+        self.results_alias_setting = results_alias_setting
+        self._warned = False
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self.executed = 0
+        self.deduplicated = 0
+        self.remote_deduplicated = 0
+
+    def _lock_backend(self):
+        alias = getattr(settings, self.lock_alias_setting)
+        if not alias:
+            return None
+        if self.results_alias_setting is not None:
+            results_alias = getattr(settings, self.results_alias_setting)
+            if not results_alias or not cache_is_shared(results_alias):
+                # Followers elsewhere would find no result and call fn one after another
+                if not self._warned:
+                    self._warned = True
+                    print(f"{self.lock_alias_setting} ignored: {self.results_alias_setting} "
+                          f"must name a cache shared between processes")
+                return None
+        return caches[alias]
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'deduplicated': self.deduplicated,
+                'remote_deduplicated': self.remote_deduplicated,
+                'in_flight': len(self._calls) + len(self._async_calls),
+            }
+
+    def do(self, key, fn, lookup=None):
+        """Return ``fn()``, or the result of an identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_exclusive(key, fn, lookup)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_exclusive(self, key, fn, lookup):
+        backend = self._lock_backend()
+        if backend is None or lookup is None:
+            self._count('executed')
+            return fn()
+
+        lock_key, token = f"{key}:lock", uuid.uuid4().hex
+        timeout = getattr(settings, self.lock_timeout_setting)
+        deadline = time.monotonic() + timeout
+        while True:
+            if backend.add(lock_key, token, timeout) or time.monotonic() >= deadline:
+                try:
+                    self._count('executed')
+                    return fn()
+                finally:
+                    if backend.get(lock_key) == token:
+                        backend.delete(lock_key)
+
+            # Another process is on it; its result is published before the lock goes
+            while backend.get(lock_key) is not None and time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+            result = lookup()
+            if result is not None:
+                self._count('remote_deduplicated')
+                return result
+
+    async def ado(self, key, fn, lookup=None):
+        """Async counterpart of do; ``fn`` and ``lookup`` return awaitables"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_calls.get(key)
+            leader = entry is None or entry[0] is not loop
+            if leader:
+                future = loop.create_future()
+                self._async_calls[key] = (loop, future)
+            else:
+                future = entry[1]
+                self.deduplicated += 1
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await self._arun_exclusive(key, fn, lookup)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved; there may be no follower to do so
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._async_calls.get(key, (None, None))[1] is future:
+                    del self._async_calls[key]
+
+    async def _arun_exclusive(self, key, fn, lookup):
+        backend = self._lock_backend()
+        if backend is None or lookup is None:
+            self._count('executed')
+            return await fn()
+
+        lock_key, token = f"{key}:lock", uuid.uuid4().hex
+        timeout = getattr(settings, self.lock_timeout_setting)
+        deadline = time.monotonic() + timeout
+        while True:
+            if await backend.aadd(lock_key, token, timeout) or time.monotonic() >= deadline:
+                try:
+                    self._count('executed')
+                    return await fn()
+                finally:
+                    if await backend.aget(lock_key) == token:
+                        await backend.adelete(lock_key)
+
+            while await backend.aget(lock_key) is not None and time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+            result = await lookup()
+            if result is not None:
+                self._count('remote_deduplicated')
+                return result
+
+
+class _Stream:
+    def __init__(self, changed):
+        self.changed = changed
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.task = None
+
+
+class StreamFlight:
+    """
+    Shares one streaming call between every reader of the same key.
+
+    The first reader starts ``start()`` in the background (a thread, or a
+    task on the event loop for ``astream``) and the pieces it produces are
+    kept until it ends. Every reader, including one that joins part-way
+    through such as a reconnecting EventSource, first gets everything
+    written so far as a single piece and then each new piece as it comes.
+    The call carries on when a reader goes away, so a reconnect never pays
+    for a second generation. Coalescing is within the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self._async_streams = {}
+        self.executed = 0
+        self.joined = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'joined': self.joined,
+                'in_flight': len(self._streams) + len(self._async_streams),
+            }
+
+    def stream(self, key, start):
+        """Yield the pieces of ``start()``, or of an identical stream already in flight"""
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = _Stream(threading.Condition())
+                self.executed += 1
+                threading.Thread(
+                    target=self._produce, args=(key, stream, start), name='cvgen-stream', daemon=True,
+                ).start()
+            else:
+                self.joined += 1
+
+        sent = 0
+        while True:
+            with stream.changed:
+                stream.changed.wait_for(lambda: stream.done or len(stream.parts) > sent)
+                pending, done = stream.parts[sent:], stream.done
+            if pending:
+                yield from (pending if sent else ["".join(pending)])
+                sent += len(pending)
+            if done:
+                break
+        if stream.error is not None:
+            raise stream.error
+
+    def _produce(self, key, stream, start):
+        close_old_connections()
+        try:
+            for part in start():
+                with stream.changed:
+                    stream.parts.append(part)
+                    stream.changed.notify_all()
+        except Exception as e:
+            stream.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with stream.changed:
+                stream.done = True
+                stream.changed.notify_all()
+            close_old_connections()
+
+    async def astream(self, key, start):
+        """Async counterpart of stream; ``start()`` returns an async iterator"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            stream = self._async_streams.get((loop, key))
+            if stream is None:
+                stream = self._async_streams[loop, key] = _Stream(asyncio.Condition())
+                self.executed += 1
+                # Held on the stream so the task is not garbage collected mid-call
+                stream.task = loop.create_task(self._aproduce(loop, key, stream, start))
+            else:
+                self.joined += 1
+
+        sent = 0
+        while True:
+            async with stream.changed:
+                await stream.changed.wait_for(lambda: stream.done or len(stream.parts) > sent)
+                pending, done = stream.parts[sent:], stream.done
+            if pending:
+                for part in (pending if sent else ["".join(pending)]):
+                    yield part
+                sent += len(pending)
+            if done:
+                break
+        if stream.error is not None:
+            raise stream.error
+
+    async def _aproduce(self, loop, key, stream, start):
+        try:
+            async for part in start():
+                async with stream.changed:
+                    stream.parts.append(part)
+                    stream.changed.notify_all()
+        except Exception as e:
+            stream.error = e
+        except BaseException:
+            stream.error = RuntimeError("Streaming generation was cancelled")
+            raise
+        finally:
+            with self._lock:
+                del self._async_streams[loop, key]
+            async with stream.changed:
+                stream.done = True
+                stream.changed.notify_all()
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .ai import generate_cv_with_ai, generate_template_cv
+from .llm import openai_clients
+from .models import GenerationTask
+from .pdf import prerender_cv_pdf
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    """Process-wide worker pool; generation needs no external broker"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CV_GENERATION_WORKERS,
+                thread_name_prefix='cvgen-task',
+            )
+        return _executor
+
+
+def submit_generation(cv_data, regenerate=False, template_fallback=True):
+    """Record a generation task and queue it on the worker pool"""
+    task = GenerationTask.objects.create(
+        cv_data=cv_data,
+        regenerate=regenerate,
+        template_fallback=template_fallback,
+        max_attempts=settings.CV_GENERATION_MAX_ATTEMPTS,
+        deadline=timezone.now() + timedelta(seconds=settings.CV_GENERATION_TASK_TIMEOUT),
+    )
+    get_executor().submit(_run_in_worker, task.id)
+    return task
+
+
+def _update(task, **fields):
+    for name, value in fields.items():
+        setattr(task, name, value)
+    task.save(update_fields=list(fields))
+
+
+def _finish(task, content=None, source='', error=''):
+    """
+    Settle a running task. Only the first of the worker and
+    expire_if_overdue wins; returns False, with ``task`` reloaded, when the
+    task was already settled.
+    """
+    if content is None and task.template_fallback:
+        content, source = generate_template_cv(task.cv_data)['content'], 'template'
+    fields = {
+        'status': GenerationTask.DONE if content is not None else GenerationTask.FAILED,
+        'progress': 100,
+        'result': content,
+        'source': source,
+        'error': error,
+        'finished_at': timezone.now(),
+    }
+    if not GenerationTask.objects.filter(pk=task.pk, status=GenerationTask.RUNNING).update(**fields):
+        task.refresh_from_db()
+        return False
+    for name, value in fields.items():
+        setattr(task, name, value)
+    if content is not None:
+        prerender_cv_pdf(content)
+    return True
+
+
+def _remaining(task):
+    return (task.deadline - timezone.now()).total_seconds()
+
+
+def run_generation_task(task_id):
+    """
+    Worker body: call the model until it answers, attempts run out or the
+    deadline passes. Each attempt only gets the time left before the
+    deadline. The client already retries transient errors, so the task
+    only tries again once an open circuit breaker lets calls through.
+    """
+    try:
+        started = GenerationTask.objects.filter(pk=task_id, status=GenerationTask.PENDING).update(
+            status=GenerationTask.RUNNING, progress=10, started_at=timezone.now(),
+        )
+        if not started:
+            # Already settled, e.g. expired while queued
+            return
+        task = GenerationTask.objects.get(pk=task_id)
+
+        while task.attempts < task.max_attempts and _remaining(task) > 0:
+            _update(task, attempts=task.attempts + 1)
+            response = generate_cv_with_ai(task.cv_data, regenerate=task.regenerate, timeout=_remaining(task))
+            if response and response.get("content"):
+                _finish(task, response["content"], source='ai')
+                return
+
+            retry_after = openai_clients.breaker.retry_after()
+            if retry_after is None:
+                # Closed breaker: the failure was retried already or will not change
+                break
+            delay = max(settings.CV_GENERATION_RETRY_DELAY, retry_after)
+            if task.attempts >= task.max_attempts or timezone.now() + timedelta(seconds=delay) >= task.deadline:
+                break
+            _update(task, progress=10 + 80 * task.attempts // task.max_attempts)
+            time.sleep(delay)
+
+        _finish(task, error=f"Generation failed after {task.attempts} attempt(s).")
+    except Exception as e:
+        print("Generation task error:", e)
+        GenerationTask.objects.filter(
+            pk=task_id, status__in=[GenerationTask.PENDING, GenerationTask.RUNNING],
+        ).update(
+            status=GenerationTask.FAILED, error=str(e), finished_at=timezone.now(),
+        )
+
+
+def _run_in_worker(task_id):
+    close_old_connections()
+    try:
+        run_generation_task(task_id)
+    finally:
+        close_old_connections()
+
+
+def expire_if_overdue(task):
+    """
+    Settle a task whose worker missed the deadline (stalled upstream or a
+    restarted process) so pollers are not left waiting forever.
+    """
+    if task.finished or timezone.now() < task.deadline:
+        return task
+    updated = GenerationTask.objects.filter(
+        pk=task.pk, status__in=[GenerationTask.PENDING, GenerationTask.RUNNING],
+    ).update(status=GenerationTask.RUNNING)
+    task.refresh_from_db()
+    if updated:
+        _finish(task, error="Generation timed out.")
+    return task
+
+
+def purge_generation_tasks(older_than):
+    """
+    Delete tasks, and the CV data they hold, that finished or passed their
+    deadline more than ``older_than`` seconds ago. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    deleted, _ = GenerationTask.objects.filter(
+        Q(finished_at__lt=cutoff) | Q(deadline__lt=cutoff)
+    ).delete()
+    return deleted
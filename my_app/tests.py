@@ -1,3 +1,1423 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import csv
+import io
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import numpy as np
+import openai
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from reportlab.lib.utils import simpleSplit
+
+from .matching import (
+    JobCorpus, corpus_version, SkillIndex, TopK, calculate_similarity, database_scoring_enabled, normalize_list, pruning_is_exact,
+    _rank_jobs_in_database, cv_fingerprint, experience_window, prefilter_jobs, rank_jobs, recommendation_order, top_k_jobs,
+)
+from .job_indexes.indexes import create_job_indexes
+from .ai import generate_cv_with_ai, generation_cache, generation_flight
+from .batch import ArchiveWriter, run_batch
+from .cache_backends import BoundedLocMemCache
+from .benchmarks import bench_core, sample_cv_text, stepper_posts, synthetic_form_data, synthetic_job_rows
+from .forms import CHOICES, STEP_FORMS, CVForm
+from .fakellm import FAKE_CV_TEXT, FakeResponsesServer
+from .job_import import import_jobs, normalize_skills, read_feed, skill_spellings
+from .features import JobFeatureStore, refresh_feature_store
+from .llm import CircuitBreaker, OpenAIClientManager, openai_clients
+from .loadtest import percentile, run_load
+from .metrics import Histogram, MetricsRegistry, metrics, span
+from .pdf import ProcessRenderer, RenderUnavailable, cv_pdf_key, get_cv_pdf, prerender_cv_pdf, render_cv_pdf
+from .pdf_layouts import (
+    MAX_LINE_WIDTH, PDF_TEMPLATES, PDFTemplate, TextStyle, layout_lines, parse_cv_sections, text_width, wrap_line,
+)
+from .sessions import SessionStore, session_writer
+from .singleflight import SingleFlight, StreamFlight
+from .models import GenerationTask, SessionBlob, jobs
+from .tasks import expire_if_overdue, run_generation_task
+from .views import format_cv_data, get_form_for_step
+
+
+SKILL_POOL = ['Python', 'django', ' SQL ', 'AWS', 'Docker', 'git', 'React', 'Node.js', 'HTML/CSS', 'Kotlin', '']
+SOFT_POOL = ['Communication', 'leadership', 'Teamwork ', 'Problem Solving', 'Creativity', 'Negotiation']
+EDUCATION_POOL = [None, '', "Bachelor's Degree", "Master's Degree in CS", 'PhD', 'High School or Diploma']
+
+
+def make_cv(technical=(), soft=(), qualification="Bachelor's Degree", years=2):
+    return {
+        'basic_info': {'name': 'Test', 'email': 't@example.com', 'phone': '1', 'address': 'x'},
+        'education': {'qualification': qualification, 'field': 'Computer Science',
+                      'institution': 'Uni', 'year': 2020, 'grade': 'A'},
+        'skills': {'technical': list(technical), 'soft': list(soft)},
+        'projects': {'selected': [], 'custom': []},
+        'experience': {'years': years, 'work_type': 'Full-time', 'role': 'Dev', 'organization': 'Org'},
+    }
+
+
+class JobsTableMixin:
+    """Creates the unmanaged ``jobs`` table for the duration of a test class"""
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(jobs)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(jobs)
+
+
+def make_jobs(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        jobs(
+            id=i + 1,
+            title=f'Job {i}',
+            company='Acme',
+            location=rng.choice(['Remote', 'Pune', 'Berlin']),
+            experience_required=rng.choice([None, 0, 1, 2, 3, 5, 10]),
+            job_type=rng.choice(['Full-time', 'Contract']),
+            skills=rng.sample(SKILL_POOL, rng.randint(0, 5)),
+            soft_skills=rng.sample(SOFT_POOL, rng.randint(0, 3)),
+            education_required=rng.choice(EDUCATION_POOL),
+            created_at=datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+class JobCorpusParityTests(SimpleTestCase):
+
+    def test_scores_match_calculate_similarity(self):
+        job_list = make_jobs(500)
+        corpus = JobCorpus.from_jobs(job_list)
+        cvs = [
+            make_cv(['Python', 'Django', 'SQL'], ['Communication', 'Teamwork'], "Bachelor's Degree", 2),
+            make_cv([], [], None, 0),
+            make_cv(['Go'], ['Leadership'], 'PhD', '7'),
+            make_cv(['AWS', None, 'docker '], [], "Master's Degree", 'n/a'),
+            make_cv(['Python'], ['Communication'], '', 40),
+        ]
+        for cv in cvs:
+            expected = [calculate_similarity(cv, job) for job in job_list]
+            self.assertEqual(corpus.rounded_scores(cv), expected)
+
+    def test_empty_corpus(self):
+        corpus = JobCorpus.from_jobs([])
+        self.assertEqual(corpus.rounded_scores(make_cv(['Python'])), [])
+
+
+class TopKTests(SimpleTestCase):
+
+    def full_sort(self, corpus, cv, k):
+        scores = corpus.rounded_scores(cv)
+        ranked = sorted(zip(corpus.ids.tolist(), scores), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def test_matches_sort_then_slice(self):
+        # Few distinct skill sets, so many scores tie
+        corpus = JobCorpus.from_jobs(make_jobs(2000, seed=3))
+        cv = make_cv(['Python', 'SQL'], ['Teamwork'], "Bachelor's Degree", 3)
+        for k in (1, 10, 50, 5000):
+            selector = TopK(k)
+            selector.push_scores(corpus.ids, corpus.score(cv))
+            self.assertEqual(selector.results(), self.full_sort(corpus, cv, k))
+
+    def test_chunked_pushes_match_single_pass(self):
+        job_list = make_jobs(1500, seed=4)
+        cv = make_cv(['Docker', 'git'], ['Creativity'], 'PhD', 5)
+        chunked = TopK(10)
+        for start in range(0, len(job_list), 128):
+            chunk = JobCorpus.from_jobs(job_list[start:start + 128])
+            chunked.push_scores(chunk.ids, chunk.score(cv))
+        self.assertEqual(chunked.results(), self.full_sort(JobCorpus.from_jobs(job_list), cv, 10))
+
+
+class SkillIndexTests(SimpleTestCase):
+
+    def build_index(self, job_list):
+        index = SkillIndex()
+        for job in job_list:
+            index.add(job.id, job.skills, job.soft_skills, job.education_required, job.experience_required)
+        return index
+
+    def test_pruned_jobs_score_below_threshold(self):
+        job_list = make_jobs(800, seed=5)
+        index = self.build_index(job_list)
+        cv = make_cv(['Kotlin'], ['Negotiation'], 'PhD', 3)
+        candidates = set(index.candidates(cv, 25.0).tolist())
+        for job in job_list:
+            if job.id not in candidates:
+                self.assertLess(calculate_similarity(cv, job), 25.0)
+
+    def test_pruned_ranking_matches_full_ranking(self):
+        job_list = make_jobs(1200, seed=6)
+        corpus = JobCorpus.from_jobs(job_list)
+        index = self.build_index(job_list)
+        cv = make_cv(['Python', 'Docker'], ['Communication'], "Bachelor's Degree", 2)
+
+        full = TopK(10)
+        full.push_scores(corpus.ids, corpus.score(cv))
+        pruned_corpus = corpus.restrict_to(index.candidates(cv, 25.0))
+        pruned = TopK(10)
+        pruned.push_scores(pruned_corpus.ids, pruned_corpus.score(cv))
+
+        self.assertLess(len(pruned_corpus), len(corpus))
+        self.assertTrue(pruning_is_exact(pruned.results(), 10, 25.0))
+        self.assertEqual(pruned.results(), full.results())
+
+    def test_add_replaces_previous_postings(self):
+        index = SkillIndex()
+        index.add(1, ['Python'], [], None, 0)
+        index.add(1, ['Go'], [], None, 0)
+        self.assertNotIn('python', index.postings)
+        self.assertEqual(index.postings['go'], {1})
+        index.discard(1)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.postings, {})
+
+
+@override_settings(JOB_MATCH_BACKEND='database')
+class DatabaseScoringFallbackTests(SimpleTestCase):
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'fallback only applies to other databases')
+    def test_non_postgres_uses_python_path(self):
+        self.assertFalse(database_scoring_enabled())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'DB-side scoring needs PostgreSQL')
+@override_settings(JOB_MATCH_BACKEND='database', RECOMMENDATION_CACHE_ALIAS='')
+class DatabaseScoringParityTests(JobsTableMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.job_list = make_jobs(600, seed=7)
+        for job in cls.job_list:
+            job.experience_required = job.experience_required or 0
+        jobs.objects.bulk_create(cls.job_list)
+
+    def test_matches_python_ranking(self):
+        corpus = JobCorpus.from_jobs(self.job_list)
+        cvs = [
+            make_cv(['Python', 'Django', 'SQL'], ['Communication', 'Teamwork'], "Bachelor's Degree", 2),
+            make_cv([], [], None, 0),
+            make_cv(['AWS', 'docker '], ['Creativity'], 'PhD', 12),
+        ]
+        for cv in cvs:
+            expected = TopK(10)
+            expected.push_scores(corpus.ids, corpus.score(cv))
+            self.assertEqual(_rank_jobs_in_database(cv, 10), expected.results())
+
+    def test_filters(self):
+        cv = make_cv(['Python'], ['Leadership'], "Master's Degree", 3)
+        ranked = _rank_jobs_in_database(cv, 5, location='remote', job_type='CONTRACT')
+        subset = [job for job in self.job_list if job.location == 'Remote' and job.job_type == 'Contract']
+        corpus = JobCorpus.from_jobs(subset)
+        expected = TopK(5)
+        expected.push_scores(corpus.ids, corpus.score(cv))
+        self.assertEqual(ranked, expected.results())
+
+    def test_top_k_jobs_backends_agree(self):
+        cv = make_cv(['Python', 'Docker'], ['Teamwork'], "Bachelor's Degree", 1)
+        database = [(item['job'].id, item['score']) for item in top_k_jobs(cv)]
+        with self.settings(JOB_MATCH_BACKEND='python'):
+            python = [(item['job'].id, item['score']) for item in top_k_jobs(cv)]
+        self.assertEqual(len(database), 10)
+        self.assertEqual(database, python)
+
+
+class JobFeatureStoreTests(SimpleTestCase):
+
+    def test_round_trip_and_extend(self):
+        job_list = make_jobs(300, seed=8)
+        cv = make_cv(['Python', 'React'], ['Creativity'], 'PhD', 4)
+        base = JobCorpus.from_jobs(job_list[:200])
+        # Re-deliver an existing id with new skills alongside new jobs
+        job_list[10].skills = ['Kotlin']
+        extended = base.take(np.flatnonzero(base.ids != job_list[10].id)).extended(
+            (job.id, job.skills, job.soft_skills, job.education_required, job.experience_required)
+            for job in [job_list[10]] + job_list[200:]
+        )
+
+        with tempfile.TemporaryDirectory() as path:
+            store = JobFeatureStore(path)
+            self.assertIsNone(store.load())
+            store.save(extended, np.zeros(len(extended), dtype=np.int64), None)
+            loaded = store.load()
+
+        self.assertEqual(loaded.ids.tolist(), sorted(job.id for job in job_list))
+        self.assertEqual(loaded.rounded_scores(cv), [calculate_similarity(cv, job) for job in job_list])
+
+    def test_ranking_from_store_does_not_read_jobs_table(self):
+        corpus = JobCorpus.from_jobs(make_jobs(100, seed=3))
+        cv = make_cv(['Python'], ['Teamwork'], "Bachelor's Degree", 2)
+        expected = TopK(5)
+        expected.push_scores(corpus.ids, corpus.score(cv))
+        with tempfile.TemporaryDirectory() as path:
+            JobFeatureStore(path).save(corpus, np.zeros(len(corpus), dtype=np.int64), None)
+            # SimpleTestCase fails any database query
+            with self.settings(JOB_FEATURE_STORE=path, JOB_MATCH_INDEX=True, JOB_INDEXES=False), \
+                    mock.patch('my_app.matching.get_skill_index') as skill_index:
+                self.assertEqual(rank_jobs(cv, 5), expected.results())
+        skill_index.assert_not_called()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'the jobs table needs PostgreSQL arrays')
+class RefreshFeatureStoreTests(JobsTableMixin, TestCase):
+
+    def test_detects_inserts_updates_and_deletes(self):
+        job_list = make_jobs(50, seed=9)
+        for job in job_list:
+            job.experience_required = job.experience_required or 0
+        jobs.objects.bulk_create(job_list[:40])
+
+        with tempfile.TemporaryDirectory() as path:
+            store = JobFeatureStore(path)
+            self.assertEqual(refresh_feature_store(store)['mode'], 'rebuild')
+
+            jobs.objects.bulk_create(job_list[40:])
+            stats = refresh_feature_store(store)
+            self.assertEqual((stats['mode'], stats['changed']), ('incremental', 10))
+
+            jobs.objects.filter(id=1).update(skills=['Python', 'Go'])
+            jobs.objects.filter(id=2).delete()
+            stats = refresh_feature_store(store, full_scan=True)
+            self.assertEqual((stats['changed'], stats['removed']), (1, 1))
+
+            expected = JobCorpus.from_jobs(jobs.objects.order_by('id'))
+            loaded = store.load()
+            cv = make_cv(['Go', 'SQL'], ['Teamwork'], "Master's Degree", 5)
+            self.assertEqual(loaded.ids.tolist(), expected.ids.tolist())
+            self.assertEqual(loaded.rounded_scores(cv), expected.rounded_scores(cv))
+
+
+class RecommendationCacheTests(SimpleTestCase):
+
+    @override_settings(RECOMMENDATION_CACHE_ALIAS='', DEBUG=True)
+    def test_failures_are_logged(self):
+        cv = make_cv(['Python'], ['Teamwork'])
+        with mock.patch('my_app.matching.rank_jobs', side_effect=RuntimeError('boom')), \
+                self.assertLogs('my_app.matching', 'ERROR') as logs:
+            self.assertEqual(top_k_jobs(cv), [])
+        self.assertIn('boom', logs.output[0])
+
+    def test_fingerprint_ignores_order_case_and_unrelated_fields(self):
+        first = make_cv(['Python', 'SQL'], ['Teamwork'], "Bachelor's Degree", 2)
+        second = make_cv(['sql ', 'python', 'Python'], ['TEAMWORK'], "BACHELOR'S DEGREE", '2')
+        second['basic_info']['name'] = 'Someone Else'
+        self.assertEqual(cv_fingerprint(first), cv_fingerprint(second))
+        self.assertNotEqual(cv_fingerprint(first), cv_fingerprint(make_cv(['Python'], ['Teamwork'])))
+
+
+class ResultPageTests(TestCase):
+
+    @override_settings(RECOMMENDATION_CACHE_ALIAS='', DEBUG=True)
+    def test_renders_without_recommendations_when_matching_fails(self):
+        session = self.client.session
+        session['generated_cv'] = 'Finished CV'
+        session['cv_data'] = make_cv(['Python'], ['Teamwork'])
+        session.save()
+        with mock.patch('my_app.matching.rank_jobs', side_effect=ValueError('bad corpus')), \
+                self.assertLogs('my_app.matching', 'ERROR'):
+            response = self.client.get(reverse('cv_result'))
+        self.assertContains(response, 'Finished CV')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'the jobs table needs PostgreSQL arrays')
+class RecommendationCacheDatabaseTests(JobsTableMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        job_list = make_jobs(100, seed=10)
+        for job in job_list:
+            job.experience_required = job.experience_required or 0
+        jobs.objects.bulk_create(job_list)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_jobs_version_is_computed_once_per_request(self):
+        cv = make_cv(['Python'], ['Teamwork'], "Bachelor's Degree", 2)
+        with mock.patch('my_app.matching.corpus_version', wraps=corpus_version) as version:
+            top_k_jobs(cv)
+            self.assertEqual(version.call_count, 1)
+            with self.settings(RECOMMENDATION_CACHE_ALIAS=''):
+                top_k_jobs(cv)
+            self.assertEqual(version.call_count, 2)
+
+    def test_hit_then_invalidated_by_new_job(self):
+        cv = make_cv(['Python'], ['Teamwork'], "Bachelor's Degree", 2)
+        with mock.patch('my_app.matching.rank_jobs', wraps=rank_jobs) as ranker:
+            first = top_k_jobs(cv)
+            self.assertEqual(top_k_jobs(cv), first)
+            self.assertEqual(ranker.call_count, 1)
+
+            jobs.objects.create(
+                id=1000, title='New', company='Acme', location='Pune', experience_required=2,
+                job_type='Full-time', skills=['Python'], soft_skills=['Teamwork'],
+                education_required="Bachelor's Degree", created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            )
+            refreshed = top_k_jobs(cv)
+            self.assertEqual(ranker.call_count, 2)
+            self.assertEqual(refreshed[0]['job'].id, 1000)
+
+
+class ExperienceWindowTests(SimpleTestCase):
+
+    def test_window_keeps_every_job_that_can_reach_the_threshold(self):
+        job_list = make_jobs(40)
+        for experience, job in enumerate(job_list):
+            job.experience_required = experience
+            job.education_required = "Bachelor's Degree"
+        corpus = JobCorpus.from_jobs(job_list)
+        for threshold in (21, 25, 35, 44):
+            for years in range(16):
+                cv = make_cv([], [], "Bachelor's Degree", years)
+                low, high = experience_window(cv, threshold)
+                reachable = corpus.experience[corpus.score(cv) >= threshold]
+                self.assertTrue(all(low <= experience <= high for experience in reachable), (threshold, years))
+
+    def test_no_window_when_nothing_or_everything_is_ruled_out(self):
+        cv = make_cv([], [], None, 3)
+        self.assertIsNone(experience_window(cv, 20))
+        self.assertEqual(experience_window(cv, 46), ())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'the job indexes need PostgreSQL')
+@override_settings(JOB_INDEXES=True, JOB_MATCH_BACKEND='python', RECOMMENDATION_CACHE_ALIAS='')
+class JobIndexesTests(JobsTableMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        job_list = make_jobs(400, seed=12)
+        for job in job_list:
+            job.experience_required = job.experience_required or 0
+        jobs.objects.bulk_create(job_list)
+        create_job_indexes(connection, concurrently=False)
+
+    def test_prefiltered_ranking_matches_full_ranking(self):
+        cvs = [
+            make_cv(['Python', 'Django'], ['Teamwork'], "Bachelor's Degree", 2),
+            make_cv([], [], None, 0),
+            make_cv(['AWS', 'docker '], ['Creativity'], 'PhD', 12),
+        ]
+        for cv in cvs:
+            for threshold in (25.0, 40.0):
+                with self.settings(JOB_MATCH_FALLBACK_THRESHOLD=threshold):
+                    with self.settings(JOB_INDEXES=False, JOB_MATCH_INDEX=False):
+                        expected = rank_jobs(cv, 10), rank_jobs(cv, 5, location='remote', job_type='CONTRACT')
+                    self.assertEqual((rank_jobs(cv, 10), rank_jobs(cv, 5, location='remote', job_type='CONTRACT')),
+                                     expected)
+
+    def test_empty_prefilter_recommends_nothing(self):
+        # No skills and an experience far from every job: no job can reach the threshold
+        cv = make_cv([], [], "Bachelor's Degree", 40)
+        with self.settings(JOB_MATCH_FALLBACK_THRESHOLD=44.0):
+            self.assertFalse(prefilter_jobs(jobs.objects.all(), cv, 44.0).exists())
+            with mock.patch('my_app.matching.pruning_is_exact', return_value=True):
+                self.assertEqual(rank_jobs(cv, 10), [])
+                self.assertEqual(rank_jobs(cv, 10, location='remote'), [])
+
+    def test_query_plan_uses_the_indexes(self):
+        cv = make_cv(['Python', 'SQL'], ['Teamwork'], "Bachelor's Degree", 3)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = prefilter_jobs(jobs.objects.all(), cv, 25.0).explain()
+        self.assertIn('jobs_skill_tokens_gin', plan)
+        self.assertIn('jobs_soft_skill_tokens_gin', plan)
+        self.assertIn('jobs_experience_required_idx', plan)
+        self.assertIn('jobs_upper_location_idx', jobs.objects.filter(location__iexact='remote').explain())
+
+
+@mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+class GenerationCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['generations'].clear()
+
+    def fake_client(self, text='Generated CV'):
+        client = mock.Mock()
+        client.responses.create.return_value = mock.Mock(output_text=text)
+        return client
+
+    def test_identical_prompt_served_from_cache(self):
+        client = self.fake_client()
+        cv = make_cv(['Python'], ['Teamwork'])
+        before = generation_cache.stats()
+        with mock.patch.object(openai_clients, 'client', return_value=client):
+            self.assertEqual(generate_cv_with_ai(cv), {'content': 'Generated CV'})
+            self.assertEqual(generate_cv_with_ai(cv), {'content': 'Generated CV'})
+        self.assertEqual(client.responses.create.call_count, 1)
+        after = generation_cache.stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_regenerate_bypasses_and_replaces_entry(self):
+        cv = make_cv(['SQL'], ['Leadership'])
+        with mock.patch.object(openai_clients, 'client', return_value=self.fake_client('first')):
+            generate_cv_with_ai(cv)
+        with mock.patch.object(openai_clients, 'client', return_value=self.fake_client('second')):
+            self.assertEqual(generate_cv_with_ai(cv, regenerate=True), {'content': 'second'})
+        with mock.patch.object(openai_clients, 'client') as client_method:
+            self.assertEqual(generate_cv_with_ai(cv), {'content': 'second'})
+            client_method.assert_not_called()
+
+
+@override_settings(CV_GENERATION_RETRY_DELAY=0)
+class GenerationTaskTests(TestCase):
+
+    def make_task(self, **kwargs):
+        kwargs.setdefault('deadline', django_timezone.now() + timedelta(minutes=1))
+        return GenerationTask.objects.create(cv_data=make_cv(['Python'], ['Teamwork']), **kwargs)
+
+    def test_retries_once_breaker_lets_calls_through(self):
+        task = self.make_task(max_attempts=3)
+        responses = [None, None, {'content': 'AI CV'}]
+        with mock.patch('my_app.tasks.generate_cv_with_ai', side_effect=responses), \
+                mock.patch.object(openai_clients.breaker, 'retry_after', return_value=0):
+            run_generation_task(task.id)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.source, task.attempts, task.result), ('done', 'ai', 3, 'AI CV'))
+
+    def test_client_retries_are_not_repeated(self):
+        # With the breaker closed the client has already retried transient errors
+        task = self.make_task(max_attempts=3, template_fallback=False)
+        with mock.patch('my_app.tasks.generate_cv_with_ai', return_value=None) as generate:
+            run_generation_task(task.id)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, generate.call_count), ('failed', 1, 1))
+
+    def test_finished_task_queues_pdf(self):
+        task = self.make_task(max_attempts=1)
+        with mock.patch('my_app.tasks.generate_cv_with_ai', return_value={'content': 'AI CV'}), \
+                mock.patch('my_app.tasks.prerender_cv_pdf') as prerender:
+            run_generation_task(task.id)
+        prerender.assert_called_once_with('AI CV')
+
+    def test_falls_back_to_template_or_fails(self):
+        with_fallback = self.make_task(max_attempts=2)
+        without_fallback = self.make_task(max_attempts=2, template_fallback=False)
+        with mock.patch('my_app.tasks.generate_cv_with_ai', return_value=None):
+            run_generation_task(with_fallback.id)
+            run_generation_task(without_fallback.id)
+        with_fallback.refresh_from_db()
+        without_fallback.refresh_from_db()
+        self.assertEqual((with_fallback.status, with_fallback.source), ('done', 'template'))
+        self.assertIn('PROFESSIONAL CURRICULUM VITAE', with_fallback.result)
+        self.assertEqual((without_fallback.status, without_fallback.attempts), ('failed', 1))
+
+    def test_overdue_task_is_settled(self):
+        task = self.make_task(deadline=django_timezone.now() - timedelta(seconds=1))
+        task = expire_if_overdue(task)
+        self.assertEqual((task.status, task.source), ('done', 'template'))
+
+    def test_attempts_get_the_time_left_before_the_deadline(self):
+        task = self.make_task(max_attempts=3, deadline=django_timezone.now() + timedelta(seconds=30))
+        with mock.patch('my_app.tasks.generate_cv_with_ai', return_value={'content': 'AI CV'}) as generate:
+            run_generation_task(task.id)
+        self.assertLessEqual(generate.call_args.kwargs['timeout'], 30)
+
+    def test_worker_does_not_overwrite_expired_task(self):
+        task = self.make_task()
+
+        def generate(cv_data, regenerate=False, timeout=None):
+            GenerationTask.objects.filter(pk=task.pk).update(deadline=django_timezone.now())
+            expire_if_overdue(GenerationTask.objects.get(pk=task.pk))
+            return {'content': 'Late AI CV'}
+
+        with mock.patch('my_app.tasks.generate_cv_with_ai', side_effect=generate):
+            run_generation_task(task.id)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.source), ('done', 'template'))
+
+    def test_purge_deletes_ended_tasks(self):
+        old = django_timezone.now() - timedelta(days=2)
+        self.make_task(status='done', finished_at=old)
+        self.make_task(deadline=old)
+        current = self.make_task()
+        call_command('purge_generation_tasks', older_than=3600, stdout=io.StringIO())
+        self.assertEqual(list(GenerationTask.objects.values_list('pk', flat=True)), [current.pk])
+
+    def test_status_endpoint_moves_result_into_session(self):
+        task = self.make_task(status='done', progress=100, result='Finished CV', source='ai')
+        session = self.client.session
+        session['generation_task'] = str(task.id)
+        session['cv_data'] = task.cv_data
+        session.save()
+
+        response = self.client.get(reverse('generation_status', args=[task.id]))
+        self.assertEqual(response.json()['result_url'], reverse('cv_result'))
+        self.assertEqual(self.client.session['generated_cv'], 'Finished CV')
+        self.assertNotIn('generation_task', self.client.session)
+        self.assertFalse(GenerationTask.objects.filter(pk=task.pk).exists())
+
+    def test_status_endpoint_rejects_other_sessions_tasks(self):
+        task = self.make_task()
+        response = self.client.get(reverse('generation_status', args=[task.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+@mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+@override_settings(ROOT_URLCONF='my_app.urls_async', RECOMMENDATION_CACHE_ALIAS='')
+class AsyncViewsTests(JobsTableMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeResponsesServer().start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def setUp(self):
+        caches['generations'].clear()
+
+    async def test_stepper_generates_with_async_client(self):
+        with self.settings(OPENAI_BASE_URL=self.server.base_url):
+            for step, data in enumerate(stepper_posts(0), start=1):
+                response = await self.async_client.post(reverse('cv_stepper', kwargs={'step': step}), data)
+            self.assertRedirects(response, reverse('cv_result'), fetch_redirect_response=False)
+
+            response = await self.async_client.get(reverse('cv_result'))
+            self.assertContains(response, 'Generated by the fake Responses server.')
+
+            response = await self.async_client.get(reverse('download_pdf'))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.getvalue().startswith(b'%PDF'))
+        self.assertEqual(self.server.requests, 1)
+
+    async def test_stream_endpoint_saves_finished_text(self):
+        with self.settings(OPENAI_BASE_URL=self.server.base_url, CV_GENERATION_MODE='stream'):
+            for step, data in enumerate(stepper_posts(1), start=1):
+                await self.async_client.post(reverse('cv_stepper', kwargs={'step': step}), data)
+            response = await self.async_client.get(reverse('stream_cv'))
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: delta', body)
+        self.assertTrue(body.endswith('\n\n') and 'event: done' in body)
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget('generated_cv'), FAKE_CV_TEXT)
+
+
+@mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+@override_settings(CV_GENERATION_MODE='stream', RECOMMENDATION_CACHE_ALIAS='')
+class StreamingGenerationTests(JobsTableMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeResponsesServer().start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def setUp(self):
+        caches['generations'].clear()
+
+    def walk_stepper(self):
+        for step, data in enumerate(stepper_posts(0), start=1):
+            response = self.client.post(reverse('cv_stepper', kwargs={'step': step}), data)
+        return response
+
+    def read_stream(self):
+        response = self.client.get(reverse('stream_cv'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    def test_result_page_streams_and_session_keeps_text(self):
+        with self.settings(OPENAI_BASE_URL=self.server.base_url):
+            self.assertRedirects(self.walk_stepper(), reverse('cv_result'), fetch_redirect_response=False)
+            self.assertContains(self.client.get(reverse('cv_result')), reverse('stream_cv'))
+            body = self.read_stream()
+
+        deltas = [json.loads(line[len('data: '):])['text'] for line in body.splitlines()
+                  if line.startswith('data: ') and '"text"' in line]
+        self.assertEqual(''.join(deltas), FAKE_CV_TEXT)
+        self.assertGreater(len(deltas), 1)
+        self.assertEqual(self.client.session['generated_cv'], FAKE_CV_TEXT)
+        self.assertEqual(self.client.get(reverse('download_pdf'))['Content-Type'], 'application/pdf')
+
+    def test_reconnect_joins_generation_in_flight(self):
+        self.walk_stepper()
+        requests = self.server.requests
+        self.server.token_interval = 0.05
+        self.addCleanup(setattr, self.server, 'token_interval', 0.0)
+        with self.settings(OPENAI_BASE_URL=self.server.base_url):
+            # The page drops the connection after the first words
+            first = self.client.get(reverse('stream_cv')).streaming_content
+            self.assertIn(b'event: replace', next(first))
+            del first
+            body = self.read_stream()
+
+        # What the page shows after applying the events, as cv_result.html does
+        text = ''
+        for message in body.split('\n\n')[:-1]:
+            event, data = (line.split(': ', 1)[1] for line in message.splitlines())
+            if event in ('replace', 'delta'):
+                text = json.loads(data)['text'] if event == 'replace' else text + json.loads(data)['text']
+        self.assertEqual(text, FAKE_CV_TEXT)
+        self.assertIn('event: delta', body)
+        self.assertEqual(self.server.requests - requests, 1)
+        self.assertEqual(self.client.session['generated_cv'], FAKE_CV_TEXT)
+
+    def test_failed_stream_falls_back_to_template(self):
+        self.walk_stepper()
+        with mock.patch('my_app.views.stream_cv_with_ai', side_effect=RuntimeError('boom')):
+            body = self.read_stream()
+        self.assertIn('event: replace', body)
+        self.assertIn('PROFESSIONAL CURRICULUM VITAE', self.client.session['generated_cv'])
+
+
+@mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+@override_settings(OPENAI_RETRY_BACKOFF=0, OPENAI_MAX_RETRIES=2, OPENAI_BREAKER_THRESHOLD=2)
+class OpenAIClientManagerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeResponsesServer().start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(openai_clients.reset)
+        self.enterContext(self.settings(OPENAI_BASE_URL=self.server.base_url))
+        caches['generations'].clear()
+        self.manager = OpenAIClientManager()
+
+    def create(self, client):
+        return client.responses.create(model='test', input='hello')
+
+    def test_calls_share_one_keep_alive_connection(self):
+        self.assertIs(self.manager.client(), self.manager.client())
+        self.manager.call(self.create)
+        self.manager.call(self.create)
+        self.assertEqual((self.server.requests, self.server.connections), (2, 1))
+
+    def test_retries_transient_errors(self):
+        self.server.fail_requests = 2
+        self.assertEqual(self.manager.call(self.create).output_text, FAKE_CV_TEXT)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.manager.breaker.state(), CircuitBreaker.CLOSED)
+
+    @override_settings(OPENAI_TIMEOUT=0.2, OPENAI_MAX_RETRIES=0)
+    def test_stalled_upstream_times_out(self):
+        self.server.latency = 2
+        with self.assertRaises(openai.APITimeoutError):
+            self.manager.call(self.create)
+
+    @override_settings(OPENAI_TIMEOUT=60, OPENAI_MAX_RETRIES=2)
+    def test_timeout_bounds_the_whole_call(self):
+        self.server.latency = 2
+        started = time.monotonic()
+        with self.assertRaises(openai.APITimeoutError):
+            self.manager.call(self.create, timeout=0.3)
+        self.assertLess(time.monotonic() - started, 1.5)
+
+    def test_open_breaker_skips_api_until_probe_succeeds(self):
+        self.server.fail_requests = 6
+        cv = make_cv(['Python'], ['Teamwork'])
+        self.assertIsNone(generate_cv_with_ai(cv))
+        self.assertIsNone(generate_cv_with_ai(cv))
+        self.assertEqual(self.server.requests, 6)
+        self.assertTrue(openai_clients.breaker.is_open())
+
+        self.assertIsNone(generate_cv_with_ai(cv))
+        self.assertEqual(self.server.requests, 6)
+
+        with self.settings(OPENAI_BREAKER_RESET=0):
+            self.assertEqual(generate_cv_with_ai(cv), {'content': FAKE_CV_TEXT})
+        self.assertEqual(openai_clients.breaker.stats(), {'state': 'closed', 'failures': 0, 'rejected': 1})
+
+    @override_settings(OPENAI_BREAKER_THRESHOLD=1)
+    def test_rejected_requests_do_not_open_breaker(self):
+        response = httpx.Response(400, request=httpx.Request('POST', self.server.base_url))
+
+        def bad_request(client):
+            raise openai.BadRequestError('bad prompt', response=response, body=None)
+
+        for _ in range(3):
+            with self.assertRaises(openai.BadRequestError):
+                self.manager.call(bad_request)
+        self.assertEqual(self.manager.breaker.state(), CircuitBreaker.CLOSED)
+
+    def test_setting_change_closes_shared_clients(self):
+        client = openai_clients.client()
+        with mock.patch.object(client, 'close', wraps=client.close) as close:
+            with self.settings(OPENAI_TIMEOUT=5):
+                self.assertIsNot(openai_clients.client(), client)
+        close.assert_called_once_with()
+
+    @override_settings(OPENAI_BREAKER_THRESHOLD=1, OPENAI_BREAKER_RESET=0)
+    def test_cancelled_probe_does_not_leave_breaker_open(self):
+        self.manager.breaker.record_failure()
+
+        async def probe():
+            task = asyncio.ensure_future(self.manager.acall(lambda client: asyncio.sleep(10)))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(probe())
+        self.assertEqual(self.manager.breaker.state(), CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.manager.call(self.create).output_text, FAKE_CV_TEXT)
+        self.assertEqual(self.manager.breaker.state(), CircuitBreaker.CLOSED)
+
+
+@override_settings(CV_GENERATION_LOCK_ALIAS='', CV_GENERATION_LOCK_TIMEOUT=5)
+class SingleFlightTests(SimpleTestCase):
+
+    def run_concurrently(self, count, call):
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            futures = [pool.submit(call) for _ in range(count)]
+            return [future.exception() or future.result() for future in futures]
+
+    def wait_for_followers(self, flight, count):
+        while flight.stats()['deduplicated'] < count:
+            threading.Event().wait(0.01)
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight('CV_GENERATION_LOCK_ALIAS', 'CV_GENERATION_LOCK_TIMEOUT')
+        calls = []
+
+        def work():
+            calls.append(1)
+            self.wait_for_followers(flight, 4)
+            return 'result'
+
+        self.assertEqual(self.run_concurrently(5, lambda: flight.do('key', work)), ['result'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {'executed': 1, 'deduplicated': 4, 'remote_deduplicated': 0, 'in_flight': 0})
+
+    def test_followers_receive_leader_exception(self):
+        flight = SingleFlight('CV_GENERATION_LOCK_ALIAS', 'CV_GENERATION_LOCK_TIMEOUT')
+
+        def work():
+            self.wait_for_followers(flight, 2)
+            raise RuntimeError('upstream down')
+
+        results = self.run_concurrently(3, lambda: flight.do('key', work))
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    @override_settings(CV_GENERATION_LOCK_ALIAS='default')
+    def test_other_process_waits_for_published_result(self):
+        # Two instances stand in for two processes sharing the lock cache
+        leader, follower = (SingleFlight('CV_GENERATION_LOCK_ALIAS', 'CV_GENERATION_LOCK_TIMEOUT') for _ in range(2))
+        published, release = {}, threading.Event()
+
+        def lead():
+            release.wait(5)
+            published['key'] = 'shared'
+            return 'shared'
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(leader.do, 'key', lead, lookup=lambda: published.get('key'))
+            while cache.get('key:lock') is None:
+                threading.Event().wait(0.01)
+            threading.Timer(0.2, release.set).start()
+            result = follower.do('key', lambda: self.fail('should not run'), lookup=lambda: published.get('key'))
+        self.assertEqual((first.result(), result), ('shared', 'shared'))
+        self.assertEqual(follower.stats()['remote_deduplicated'], 1)
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_cross_process_lock_needs_shared_results(self):
+        flight = SingleFlight('CV_GENERATION_LOCK_ALIAS', 'CV_GENERATION_LOCK_TIMEOUT', 'CV_GENERATION_CACHE_ALIAS')
+        with tempfile.TemporaryDirectory() as path, self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': path},
+        }, CV_GENERATION_LOCK_ALIAS='shared'):
+            with self.settings(CV_GENERATION_CACHE_ALIAS='default'), mock.patch('builtins.print'):
+                self.assertIsNone(flight._lock_backend())
+            with self.settings(CV_GENERATION_CACHE_ALIAS='shared'):
+                self.assertIs(flight._lock_backend(), caches['shared'])
+
+    async def test_stream_readers_join_the_call_in_flight(self):
+        flight = StreamFlight()
+        release = asyncio.Event()
+
+        async def start():
+            yield 'one'
+            yield ' two'
+            await release.wait()
+            yield ' three'
+
+        first = flight.astream('key', start)
+        self.assertEqual(await anext(first), 'one two')
+        second = flight.astream('key', lambda: self.fail('should not run'))
+        self.assertEqual(await anext(second), 'one two')
+        release.set()
+        self.assertEqual([part async for part in second], [' three'])
+        self.assertEqual([part async for part in first], [' three'])
+        self.assertEqual(flight.stats(), {'executed': 1, 'joined': 1, 'in_flight': 0})
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_identical_generations_hit_the_api_once(self):
+        caches['generations'].clear()
+        self.addCleanup(openai_clients.reset)
+        cv = make_cv(['Python'], ['Teamwork'])
+        before = generation_flight.stats()['deduplicated']
+        with FakeResponsesServer(latency=0.5) as server, self.settings(OPENAI_BASE_URL=server.base_url):
+            results = self.run_concurrently(4, lambda: generate_cv_with_ai(cv))
+        self.assertEqual(results, [{'content': FAKE_CV_TEXT}] * 4)
+        self.assertEqual(server.requests, 1)
+        self.assertEqual(generation_flight.stats()['deduplicated'] - before, 3)
+
+
+def batch_record(name, **overrides):
+    record = {
+        'name': name, 'email': f'{name.lower()}@example.com', 'phone': '9876543210', 'address': 'Pune',
+        'highest_qualification': "Bachelor's Degree", 'field_of_study': 'cs', 'institution': 'Pune University',
+        'passing_year': '2022', 'grade': 'A', 'technical_skills': 'Python; django', 'soft_skills': 'Teamwork',
+        'selected_projects': '', 'projects': '', 'years_experience': '1', 'work_type': 'Full-time',
+        'role': '', 'organization': '',
+    }
+    record.update(overrides)
+    return record
+
+
+def fake_generation(cv_data, regenerate=False, timeout=None):
+    # "Bob" stands in for a record whose API call fails
+    if cv_data['basic_info']['name'] == 'Bob':
+        return None
+    return {'content': f"CV of {cv_data['basic_info']['name']}"}
+
+
+@mock.patch('my_app.batch.top_k_jobs', return_value=[])
+@mock.patch('my_app.batch.generate_cv_with_ai', side_effect=fake_generation)
+class BatchGenerationTests(SimpleTestCase):
+
+    def test_partial_failures_do_not_abort_the_batch(self, generate, top_k):
+        records = [batch_record('Ann'), batch_record('Eve', email='not-an-email'), batch_record('Bob')]
+        buffer = io.BytesIO()
+        writer = ArchiveWriter(buffer)
+        report = run_batch(records, writer, concurrency=3)
+        writer.close()
+
+        self.assertEqual((report['total'], report['succeeded'], report['invalid']), (3, 2, 1))
+        self.assertEqual(report['sources'], {'ai': 1, 'template': 1})
+        self.assertEqual(list(report['errors'][0]['errors']), ['email'])
+        names = zipfile.ZipFile(buffer).namelist()
+        for name in ('cvs/0001-ann.pdf', 'cvs/0003-bob.pdf', 'cvs/0001-ann.txt', 'recommendations.json', 'report.json'):
+            self.assertIn(name, names)
+        self.assertNotIn('cvs/0002-eve.pdf', names)
+
+    def test_timeout_falls_back_to_template(self, generate, top_k):
+        report = run_batch([batch_record('Ann'), batch_record('Eve')], timeout=0)
+        self.assertEqual(report['sources'], {'ai': 0, 'template': 2})
+        generate.assert_not_called()
+
+    def test_command_reads_csv_into_directory(self, generate, top_k):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'cohort.csv')
+            with open(source, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(batch_record('Ann')))
+                writer.writeheader()
+                writer.writerows([batch_record('Ann'), batch_record('Bob')])
+
+            output, stdout = os.path.join(directory, 'out'), io.StringIO()
+            call_command('generate_cvs', source, output=output, stdout=stdout)
+            self.assertIn('2/2 CVs written', stdout.getvalue())
+            self.assertEqual(sorted(os.listdir(os.path.join(output, 'cvs'))),
+                             ['0001-ann.pdf', '0001-ann.txt', '0002-bob.pdf', '0002-bob.txt'])
+            with open(os.path.join(output, 'report.json')) as f:
+                self.assertEqual(json.load(f)['succeeded'], 2)
+
+    @override_settings(BATCH_API_TOKEN='secret', BATCH_MAX_RECORDS=2)
+    def test_endpoint(self, generate, top_k):
+        url = reverse('batch_generate')
+        body = json.dumps({'records': [batch_record('Ann'), batch_record('Eve', email='')]})
+        post = lambda body, token='secret': self.client.post(
+            url, body, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(post(body, token='wrong').status_code, 401)
+        self.assertEqual(post(json.dumps({'records': [{}] * 3})).status_code, 413)
+        report = post(body).json()
+        self.assertEqual((report['succeeded'], report['invalid']), (1, 1))
+        self.assertEqual(report['results'][0]['content'], 'CV of Ann')
+
+        response = post(json.dumps({'records': [batch_record('Ann')], 'archive': True}))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('cvs/0001-ann.pdf', zipfile.ZipFile(io.BytesIO(response.content)).namelist())
+        with self.settings(BATCH_API_TOKEN=''):
+            self.assertEqual(post(body).status_code, 404)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'the jobs table needs PostgreSQL arrays')
+class JobImportTests(JobsTableMixin, TestCase):
+
+    def feed(self, path, lines):
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(line) + '\n' for line in lines)
+
+    def test_normalize_skills(self):
+        spellings = skill_spellings()
+        self.assertEqual(
+            normalize_skills(' python ;Machine   Learning, PYTHON,,Rust ', spellings),
+            ['Python', 'Machine Learning', 'Rust'],
+        )
+        self.assertEqual(normalize_skills(['sql', '  ', 'SQL'], spellings), ['SQL'])
+
+    def test_upsert_in_batches(self):
+        records = [
+            {'id': n, 'title': f'Job {n}', 'company': 'Acme', 'location': 'Pune', 'job_type': 'Full-time',
+             'experience_required': n % 4, 'skills': 'python; docker', 'soft_skills': ['teamwork'],
+             'created_at': '2025-01-01T00:00:00Z'}
+            for n in range(1, 8)
+        ]
+        for method in ('copy', 'bulk'):
+            with self.subTest(method=method):
+                version = corpus_version()
+                stats = import_jobs(iter(records + [{'id': 'x'}, {'id': 9}]), batch_size=3, method=method)
+                self.assertEqual((stats['rows'], stats['skipped'], stats['batches']), (7, 2, 3))
+                self.assertEqual(stats['errors'], ['record 8: id must be an integer', 'record 9: title is required'])
+                # Same rows, same count and created_at: only the import id moves the version
+                self.assertNotEqual(corpus_version(), version)
+
+        records[0]['title'], records[0]['skills'] = 'Renamed', ['AWS']
+        import_jobs([records[0], {**records[0], 'title': 'Last wins'}], method='copy')
+        job = jobs.objects.get(pk=1)
+        self.assertEqual((job.title, job.skills, job.soft_skills), ('Last wins', ['AWS'], ['Teamwork']))
+        self.assertEqual(jobs.objects.count(), 7)
+        self.assertEqual(jobs.objects.get(pk=2).skills, ['Python', 'Docker'])
+
+    def test_bad_dates_and_json_lines_are_skipped(self):
+        record = {'id': 1, 'title': 'Job', 'company': 'Acme', 'location': 'Pune', 'job_type': 'Full-time'}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'feed.jsonl')
+            with open(path, 'w') as f:
+                f.write(json.dumps({**record, 'created_at': '2024-02-30'}) + '\n')
+                f.write('{"id": 2, "title": \n')
+                f.write(json.dumps({**record, 'id': 3, 'created_at': '2024-13-01T00:00:00'}) + '\n')
+                f.write(json.dumps({**record, 'id': 4}) + '\n')
+            stats = import_jobs(read_feed(path), method='bulk')
+        self.assertEqual((stats['rows'], stats['skipped']), (1, 3))
+        self.assertIn("record 1: created_at '2024-02-30' is not a date", stats['errors'])
+        self.assertTrue(stats['errors'][1].startswith('record 2: not valid JSON'))
+        self.assertEqual(list(jobs.objects.values_list('id', flat=True)), [4])
+
+    def test_reimport_keeps_created_at(self):
+        posted = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        record = {'id': 1, 'title': 'Job', 'company': 'Acme', 'location': 'Pune', 'job_type': 'Full-time',
+                  'created_at': posted.isoformat()}
+        import_jobs([record], method='bulk')
+        undated = {**record, 'created_at': None}
+        for method in ('copy', 'bulk'):
+            with self.subTest(method=method):
+                import_jobs([{**undated, 'title': method}, {**undated, 'id': 2}], method=method)
+                job = jobs.objects.get(pk=1)
+                self.assertEqual((job.title, job.created_at), (method, posted))
+
+
+class CoreBenchmarkTests(TestCase):
+
+    def test_synthetic_data_matches_reference(self):
+        form_data = synthetic_form_data(0, random.Random(3))
+        self.assertTrue(CVForm(form_data).is_valid())
+        cv = format_cv_data(form_data)
+        rows = synthetic_job_rows(200, seed=3)
+        reference = [
+            calculate_similarity(cv, jobs(id=row[0], skills=row[1], soft_skills=row[2],
+                                          education_required=row[3], experience_required=row[4]))
+            for row in rows
+        ]
+        ranked = recommendation_order(JobCorpus.from_rows(rows), cv)
+        self.assertEqual([score for _, score in ranked], sorted(reference, reverse=True))
+
+    def test_report_is_json(self):
+        report = bench_core(sizes=(50,), cvs=2, calls=3)
+        benchmarks = [result['benchmark'] for result in report['results']]
+        self.assertEqual(benchmarks[:3], ['encode_corpus', 'recommended_jobs', 'top_k_jobs'])
+        self.assertEqual(benchmarks.count('download_pdf'), 2)
+        json.dumps(report)
+
+
+class LoadTestTests(LiveServerTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'}))
+        cls.server = FakeResponsesServer(token_interval=0.001).start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual((percentile(samples, 50), percentile(samples, 99)), (50, 99))
+        self.assertEqual(percentile([3.0], 95), 3.0)
+
+    def test_full_flow_in_each_mode(self):
+        for mode in ('sync', 'stream'):
+            with self.subTest(mode=mode), override_settings(
+                OPENAI_BASE_URL=self.server.base_url, CV_GENERATION_MODE=mode, PDF_PRERENDER=False,
+            ):
+                # One at a time: the live server shares the in-memory SQLite connection between threads
+                report = run_load(self.live_server_url, sessions=2, concurrency=1, offset=random.randrange(10**6))
+                self.assertEqual(report['failed_sessions'], 0, report['errors'])
+                endpoints = report['endpoints']
+                # One GET of step 1, then each of the five POSTs and the GETs of steps 2-5
+                self.assertEqual(endpoints['cv_stepper']['requests'], 2 * 10)
+                self.assertEqual(endpoints['download_pdf']['requests'], 2)
+                self.assertEqual('stream_cv' in endpoints, mode == 'stream')
+                self.assertLessEqual(endpoints['cv_result']['p50_ms'], endpoints['cv_result']['p99_ms'])
+
+
+class ChoiceRegistryTests(SimpleTestCase):
+
+    def test_lookups(self):
+        self.assertEqual(CHOICES.labels('technical_skills', ['nodejs', 'html', 'nope']), ['Node.js', 'HTML/CSS', None])
+        self.assertEqual(CHOICES.code('technical_skills', 'html/css'), 'html')
+        self.assertEqual(CHOICES.code('soft_skills', 'Critical Thinking'), 'critical_thinking')
+        self.assertEqual(CHOICES.code('work_type', 'Gig'), 'Gig')
+        self.assertEqual(CHOICES.token('Node.js'), 'node.js')
+        with self.assertRaises(TypeError):
+            CHOICES._labels['work_type']['gig'] = 'Gig'
+
+    def test_skill_ids_count_distinct_tokens(self):
+        labels = ['Python', ' python ', 'Teamwork', 'Rust', 'rust ', '']
+        known, other = CHOICES.skill_ids(labels)
+        self.assertEqual({CHOICES.skill_tokens[skill_id] for skill_id in known} | other, set(normalize_list(labels)))
+        self.assertEqual(other, {'rust'})
+
+    def test_format_cv_data_uses_labels(self):
+        form = CVForm({key: value for step in stepper_posts(1) for key, value in step.items()})
+        self.assertTrue(form.is_valid(), form.errors)
+        cv_data = format_cv_data(form.cleaned_data)
+        self.assertEqual(cv_data['skills']['technical'], ['Python', 'Django', 'SQL'])
+        self.assertEqual(cv_data['education']['qualification'], "Bachelor's Degree")
+        self.assertEqual(cv_data['projects']['selected'], ['Web Development'])
+        self.assertEqual(cv_data['experience']['work_type'], 'Full-time')
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_histogram_export(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [1, 3, 4])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertIsNone(histogram.quantile(0.99))
+
+        registry = MetricsRegistry()
+        registry.observe('latency', 0.5, buckets=(0.1, 1.0), view='a"b')
+        registry.gauge('cache', lambda: {'hits': 3, 'state': 'closed'})
+        text = registry.prometheus()
+        self.assertIn('latency_bucket{view="a\\"b",le="1.0"} 1', text)
+        self.assertIn('latency_bucket{view="a\\"b",le="+Inf"} 1', text)
+        self.assertIn('cache_hits 3', text)
+        self.assertNotIn('state', text)
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0, SESSION_ENGINE='my_app.sessions')
+    def test_middleware_records_requests(self):
+        self.client.get(reverse('cv_stepper', kwargs={'step': 1}))
+        with span('outside'):
+            pass
+        histograms = metrics.snapshot()['histograms']
+        request, = histograms['cvgen_request_duration_seconds']
+        self.assertEqual(request['labels'], {'view': 'cv_stepper', 'method': 'GET', 'status': '2xx'})
+        self.assertEqual(request['count'], 1)
+        self.assertEqual(histograms['cvgen_request_queries'][0]['labels'], {'view': 'cv_stepper'})
+        spans = {item['labels']['span'] for item in histograms['cvgen_span_duration_seconds']}
+        self.assertIn('outside', spans)
+        self.assertIn('session.save', spans)
+
+    def span_counts(self):
+        return {item['labels']['span']: item['count']
+                for item in metrics.snapshot()['histograms']['cvgen_span_duration_seconds']}
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0)
+    def test_session_spans_with_default_engine(self):
+        # The first visit saves a new session, the second loads it
+        for _ in range(2):
+            self.client.get(reverse('cv_stepper', kwargs={'step': 1}))
+        counts = self.span_counts()
+        self.assertEqual((counts['session.load'], counts['session.save']), (1, 1))
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0, ROOT_URLCONF='my_app.urls_async')
+    async def test_session_spans_in_async_views(self):
+        for _ in range(2):
+            await self.async_client.get(reverse('cv_stepper', kwargs={'step': 1}))
+        counts = self.span_counts()
+        self.assertEqual((counts['session.load'], counts['session.save']), (1, 1))
+
+    def test_endpoint_requires_token(self):
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertIn('# TYPE cvgen_request_duration_seconds histogram', response.content.decode())
+            response = self.client.get(reverse('metrics') + '?format=json', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertIn('cvgen_generation_cache_hits', response.json()['gauges'])
+
+
+class StepFormTests(SimpleTestCase):
+
+    def test_steps_cover_cv_form(self):
+        fields = [field for form_class in STEP_FORMS.values() for field in form_class.base_fields]
+        self.assertEqual(sorted(fields), sorted(CVForm.base_fields))
+        self.assertEqual(list(get_form_for_step(3).fields), ['technical_skills', 'soft_skills'])
+        self.assertEqual(list(get_form_for_step(99).fields), [])
+
+    def test_forms_do_not_share_state(self):
+        first = get_form_for_step(1, initial_data={'name': 'Jane'})
+        first.fields['name'].initial = 'changed'
+        second = get_form_for_step(1, {'name': 'Bo', 'email': 'bad', 'phone': '1', 'address': 'x'})
+        self.assertIsNone(second.fields['name'].initial)
+        self.assertEqual(first['name'].value(), 'Jane')
+        self.assertEqual(list(second.errors), ['email'])
+
+
+class PDFLayoutTests(SimpleTestCase):
+
+    def test_wrapping_matches_simple_split(self):
+        rng = random.Random(3)
+        words = ['a', 'CV', 'Python,', 'experience', 'Supercalifragilisticexpialidocious' * 3, '', 'x' * 40]
+        for _ in range(200):
+            line = '  '.join(rng.choice(words) for _ in range(rng.randint(0, 60)))
+            self.assertEqual(wrap_line(line), simpleSplit(line, 'Helvetica', 10, MAX_LINE_WIDTH))
+
+    def test_layout_keeps_short_lines_verbatim(self):
+        text = 'Name\n\n   indented  spaces   \n' + 'word ' * 100
+        lines = layout_lines(text)
+        self.assertEqual(lines[:3], ['Name', '', '   indented  spaces   '])
+        self.assertTrue(all(text_width(line) <= MAX_LINE_WIDTH for line in lines[3:]))
+        self.assertEqual(' '.join(lines[3:]), ' '.join(['word'] * 100))
+
+    def test_sections_follow_prompt_format(self):
+        document = parse_cv_sections(
+            "  Jane Doe\n  Pune, Maharashtra\n\n  Email: jane@example.com\n\n  WORK EXPERIENCE\n  ───────\n"
+            "  Developer at Acme\n\n  Shipped the billing service.\n\nSkills\nTechnical Skills: Python\n"
+        )
+        self.assertEqual(document.title, 'Jane Doe')
+        self.assertEqual(document.header, ['Pune, Maharashtra', '', 'Email: jane@example.com'])
+        self.assertEqual([(section.heading, section.lines) for section in document.sections], [
+            ('WORK EXPERIENCE', ['Developer at Acme', '', 'Shipped the billing service.']),
+            ('Skills', ['Technical Skills: Python']),
+        ])
+
+    def test_classic_template_draws_lines_verbatim(self):
+        text = sample_cv_text(1, projects=80)
+        pages = PDF_TEMPLATES['classic'].layout(text)
+        self.assertEqual([op[4] for page in pages for op in page], layout_lines(text))
+        self.assertEqual({page[0][3] for page in pages}, {PDF_TEMPLATES['classic'].top})
+
+    def test_templates_keep_text_inside_their_columns(self):
+        text = sample_cv_text(2, projects=80)
+        for template in PDF_TEMPLATES.values():
+            pages = template.layout(text)
+            self.assertGreater(len(pages), 1, template.name)
+            for page in pages:
+                for kind, style, x, y, value in page:
+                    self.assertGreaterEqual(y, template.bottom - 5, template.name)
+                    if style is template.body:
+                        self.assertTrue(any(
+                            left - 0.01 <= x and x + style.width(value) <= left + template.column_width + 0.01
+                            for left in template.column_x
+                        ), template.name)
+            self.assertTrue(render_cv_pdf(text, template.name).startswith(b'%PDF'))
+
+    def test_uncolored_style_after_colored_one(self):
+        template = PDFTemplate(
+            'custom', "Custom", body=TextStyle('Helvetica', 10, 13),
+            heading=TextStyle('Helvetica-Bold', 11, 18, color=(0.2, 0.4, 0.6), rule=0.5),
+        )
+        self.assertTrue(template.render(sample_cv_text(3)).startswith(b'%PDF'))
+
+
+class SessionStoreTests(TestCase):
+
+    def setUp(self):
+        caches['sessions'].clear()
+        session_writer.flush()
+
+    def test_large_values_are_stored_once_by_hash(self):
+        cv = sample_cv_text(1)
+        session = SessionStore()
+        session['cv_data'] = {'name': 'Jane'}
+        session['generated_cv'] = cv
+        session.save()
+        session['form_data'] = {'step': 2}
+        session.save()
+
+        self.assertEqual(SessionBlob.objects.get().content, cv)
+        row = Session.objects.get(session_key=session.session_key)
+        self.assertNotIn(cv, json.dumps(row.get_decoded()))
+
+        caches['sessions'].clear()
+        loaded = SessionStore(session.session_key)
+        self.assertEqual(
+            (loaded['generated_cv'], loaded['cv_data'], loaded['form_data']), (cv, {'name': 'Jane'}, {'step': 2}),
+        )
+
+    @override_settings(SESSION_WRITE_BEHIND=60)
+    def test_writes_are_deferred_and_coalesced(self):
+        session = SessionStore()
+        for step in range(1, 6):
+            session['form_data'] = {'step': step}
+            session.save()
+        self.assertFalse(Session.objects.filter(session_key=session.session_key).exists())
+        self.assertEqual(SessionStore(session.session_key)['form_data'], {'step': 5})
+
+        # Evicted from the cache before the flush: the pending row answers
+        caches['sessions'].clear()
+        self.assertEqual(SessionStore(session.session_key)['form_data'], {'step': 5})
+        self.assertEqual(session_writer.flush(), 1)
+        self.assertEqual(Session.objects.get(session_key=session.session_key).get_decoded(), {'form_data': {'step': 5}})
+
+
+class PDFDownloadTests(TestCase):
+
+    def setUp(self):
+        caches['pdfs'].clear()
+
+    def set_cv(self, content):
+        session = self.client.session
+        session['generated_cv'] = content
+        session.save()
+
+    def test_cached_render_etag_and_304(self):
+        self.set_cv('Jane Doe\nSummary')
+        with mock.patch('my_app.pdf.render_cv_pdf', wraps=render_cv_pdf) as render:
+            first = self.client.get(reverse('download_pdf'))
+            second = self.client.get(reverse('download_pdf'))
+        self.assertEqual(render.call_count, 1)
+
+        body = first.getvalue()
+        self.assertTrue(body.startswith(b'%PDF'))
+        self.assertEqual(int(first['Content-Length']), len(body))
+        self.assertEqual(second.getvalue(), body)
+        self.assertIn('attachment; filename="AI_Generated_CV.pdf"', first['Content-Disposition'])
+
+        not_modified = self.client.get(reverse('download_pdf'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+    def test_template_choice(self):
+        self.set_cv('Jane Doe\n\nSummary\nPython developer.')
+        classic = self.client.get(reverse('download_pdf'))
+        modern = self.client.get(reverse('download_pdf'), {'template': 'modern'})
+        self.assertEqual(modern.status_code, 200)
+        self.assertNotEqual(modern['ETag'], classic['ETag'])
+        self.assertNotEqual(modern.getvalue(), classic.getvalue())
+        self.assertEqual(self.client.get(reverse('download_pdf'), {'template': 'nope'}).status_code, 404)
+
+    def test_busy_renderer_answers_503(self):
+        self.set_cv('Busy CV')
+        with mock.patch('my_app.views.get_cv_pdf', side_effect=RenderUnavailable('queue full')):
+            response = self.client.get(reverse('download_pdf'))
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '2'))
+
+    def test_etag_changes_with_content(self):
+        self.set_cv('First CV')
+        etag = self.client.get(reverse('download_pdf'))['ETag']
+        self.set_cv('Second CV')
+        response = self.client.get(reverse('download_pdf'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BoundedLocMemCacheTests(SimpleTestCase):
+
+    def test_evicts_least_recently_used_beyond_byte_budget(self):
+        backend = BoundedLocMemCache('test-bounded', {'OPTIONS': {'MAX_ENTRIES': 100, 'MAX_BYTES': 2500}})
+        self.addCleanup(backend.clear)
+        for key in 'abc':
+            backend.set(key, b'x' * 1000)
+        self.assertEqual([key for key in 'abc' if backend.has_key(key)], ['b', 'c'])
+        backend.get('b')
+        backend.set('d', b'x' * 1000)
+        self.assertEqual([key for key in 'abcd' if backend.has_key(key)], ['b', 'd'])
+
+    def test_pdf_cache_uses_it(self):
+        self.assertIsInstance(caches['pdfs'], BoundedLocMemCache)
+
+
+class PDFPrerenderTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['pdfs'].clear()
+
+    def test_prerendered_pdf_is_served_without_rendering(self):
+        prerender_cv_pdf('Prerendered CV').result(timeout=5)
+        self.assertIsNone(prerender_cv_pdf('Prerendered CV'))
+        with mock.patch('my_app.pdf.render_cv_pdf') as render:
+            self.assertTrue(get_cv_pdf('Prerendered CV').startswith(b'%PDF'))
+        render.assert_not_called()
+
+    def test_download_waits_for_queued_render_or_renders_itself(self):
+        release = threading.Event()
+
+        def render(cv_content, template=None):
+            # Background renders hang until released; the request thread renders at once
+            if threading.current_thread().name.startswith('cvgen-pdf'):
+                release.wait(5)
+                return b'%PDF queued'
+            return b'%PDF sync'
+
+        with mock.patch('my_app.pdf.render_cv_pdf', side_effect=render):
+            prerender_cv_pdf('Slow CV')
+            threading.Timer(0.05, release.set).start()
+            self.assertEqual(get_cv_pdf('Slow CV'), b'%PDF queued')
+
+            release.clear()
+            prerender_cv_pdf('Stuck CV')
+            with self.settings(PDF_PRERENDER_WAIT=0.01):
+                self.assertEqual(get_cv_pdf('Stuck CV'), b'%PDF sync')
+            release.set()
+
+    @override_settings(PDF_CACHE_MAX_BYTES=10)
+    def test_oversized_pdfs_are_not_kept(self):
+        get_cv_pdf('Large CV')
+        self.assertFalse(caches['pdfs'].has_key(f"cvpdf:{cv_pdf_key('Large CV')}"))
+
+    @override_settings(PDF_PRERENDER=False)
+    def test_disabled(self):
+        self.assertIsNone(prerender_cv_pdf('Any CV'))
+
+
+class ProcessRendererTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.renderer = ProcessRenderer(processes=1, max_queue=1, queue_wait=0.01, timeout=10)
+        cls.renderer.warm()
+        cls.addClassCleanup(cls.renderer.shutdown)
+
+    def test_renders_in_worker_process(self):
+        caches['pdfs'].clear()
+        with self.settings(PDF_RENDER_BACKEND='process'), mock.patch('my_app.pdf._renderer', self.renderer), \
+                mock.patch('my_app.pdf.render_cv_pdf', side_effect=AssertionError('rendered in the web process')):
+            pdf = get_cv_pdf('Jane Doe\n' + 'Python developer ' * 50)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_full_queue_is_rejected(self):
+        self.renderer._slots.acquire()
+        try:
+            with self.assertRaises(RenderUnavailable):
+                self.renderer.render('Queued CV')
+        finally:
+            self.renderer._slots.release()
+
+    def test_slow_render_times_out(self):
+        with mock.patch.object(self.renderer, 'timeout', 0.001):
+            with self.assertRaises(RenderUnavailable):
+                self.renderer.render('word ' * 100000)
+        # Backpressure holds until the worker has really finished
+        self.assertTrue(self.renderer.render('After timeout', block=True).startswith(b'%PDF'))
@@ -6,8 +6,14 @@ urlpatterns = [
     # path('', views.cv_form, name='cv_form'),
     path('step/<int:step>/', views.cv_stepper, name='cv_stepper'),
     path('result/', views.cv_result, name='cv_result'),
+    path('result/stream/', views.stream_cv, name='stream_cv'),
+    path('regenerate/', views.regenerate_cv, name='regenerate_cv'),
+    path('generating/<uuid:task_id>/', views.cv_generating, name='cv_generating'),
+    path('generating/<uuid:task_id>/status/', views.generation_status, name='generation_status'),
     path('download_pdf/', views.download_pdf, name='download_pdf'),
     path('legacy/', views.cv_form, name='cv_form_legacy'),
+    path('api/batch/', views.batch_generate, name='batch_generate'),
+    path('metrics/', views.export_metrics, name='metrics'),
 
 ]
 
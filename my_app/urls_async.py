@@ -0,0 +1,17 @@
+from django.urls import path
+from . import async_views, views
+
+# Same routes as my_app.urls with the stepper flow served by async views
+urlpatterns = [
+    path('', async_views.cv_stepper, {'step': 1}, name='cv_stepper'),
+    path('step/<int:step>/', async_views.cv_stepper, name='cv_stepper'),
+    path('result/', async_views.cv_result, name='cv_result'),
+    path('result/stream/', async_views.stream_cv, name='stream_cv'),
+    path('regenerate/', views.regenerate_cv, name='regenerate_cv'),
+    path('generating/<uuid:task_id>/', views.cv_generating, name='cv_generating'),
+    path('generating/<uuid:task_id>/status/', views.generation_status, name='generation_status'),
+    path('download_pdf/', async_views.download_pdf, name='download_pdf'),
+    path('legacy/', views.cv_form, name='cv_form_legacy'),
+    path('api/batch/', views.batch_generate, name='batch_generate'),
+    path('metrics/', views.export_metrics, name='metrics'),
+]
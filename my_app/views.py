@@ -1,21 +1,25 @@
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.contrib import messages
-import os, re
-from .models import jobs
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import simpleSplit
-import io
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+import io, json, os, re
+from .models import jobs, GenerationTask
+from .matching import normalize_list, calculate_similarity, recommended_jobs, top_k_jobs
 from django.conf import settings
-from .forms import CVForm, QUALIFICATION_CHOICES, FIELD_CHOICES, TECH_SKILLS, SOFT_SKILLS, WORK_TYPE_CHOICES, PROJECT_CHOICES
-from decouple import config
-from openai import OpenAI
+from .forms import CHOICES, CVForm, CVStepForm, STEP_FORMS, STEP_TITLES, TOTAL_STEPS
+from .ai import build_cv_prompt, generate_cv_with_ai, generate_template_cv, stream_cv_with_ai
+from .tasks import submit_generation, expire_if_overdue
+from .pdf import RenderUnavailable, cv_pdf_key, get_cv_pdf, pdf_template_name, prerender_cv_pdf
+from .metrics import metrics
+from .pdf_layouts import PDF_TEMPLATES
 
 
 def cv_stepper(request, step=1):
 
-    total_steps = 5
+    total_steps = TOTAL_STEPS
     
     if 'form_data' not in request.session:
         request.session['form_data'] = {}
@@ -46,33 +50,14 @@ def cv_stepper(request, step=1):
         'current_step': step,
         'total_steps': total_steps,
         'progress': progress,
-        'step_titles': {
-            1: "Personal Info",
-            2: "Education",
-            3: "Skills",
-            4: "Projects",
-            5: "Experience"
-        }
+        'step_key': form.step_key,
+        'step_titles': STEP_TITLES
     })
 
 def get_form_for_step(step, data=None, initial_data=None):
     """Get appropriate form for each step"""
-    from .forms import CVStepForm
-    
-    if step == 1:
-        fields = ['name', 'email', 'phone', 'address']
-    elif step == 2:
-        fields = ['highest_qualification', 'field_of_study', 'institution', 'passing_year', 'grade']
-    elif step == 3:
-        fields = ['technical_skills', 'soft_skills']
-    elif step == 4:
-        fields = ['selected_projects', 'projects']
-    elif step == 5:
-        fields = ['years_experience', 'work_type', 'role', 'organization']
-    else:
-        fields = []
-    
-    return CVStepForm(data, initial=initial_data, fields=fields)
+    form_class = STEP_FORMS.get(step, CVStepForm)
+    return form_class(data, initial=initial_data)
 
 def generate_final_cv(request):
     """Generate CV after all steps are completed"""
@@ -87,11 +72,17 @@ def generate_final_cv(request):
     if final_form.is_valid():
         cv_data = format_cv_data(final_form.cleaned_data)
         request.session['cv_data'] = cv_data
+
+        if settings.CV_GENERATION_MODE == 'task':
+            return start_generation(request, cv_data)
+        if settings.CV_GENERATION_MODE == 'stream':
+            return start_streaming(request)
         
         ai_response = generate_cv_with_ai(cv_data)
         
         if ai_response and ai_response.get("content"):
             request.session['generated_cv'] = ai_response['content']
+            prerender_cv_pdf(ai_response['content'])
 
             if 'form_data' in request.session:
                 del request.session['form_data']
@@ -100,6 +91,7 @@ def generate_final_cv(request):
 
             template_response = generate_template_cv(cv_data)
             request.session['generated_cv'] = template_response['content']
+            prerender_cv_pdf(template_response['content'])
             if 'form_data' in request.session:
                 del request.session['form_data']
             return redirect('cv_result')
@@ -115,10 +107,15 @@ def cv_form(request):
         if form.is_valid():
             cv_data = format_cv_data(form.cleaned_data)
             request.session['cv_data'] = cv_data   
+            if settings.CV_GENERATION_MODE == 'task':
+                return start_generation(request, cv_data, template_fallback=False)
+            if settings.CV_GENERATION_MODE == 'stream':
+                return start_streaming(request)
             ai_response = generate_cv_with_ai(cv_data)
             
             if ai_response and ai_response.get("content"):
                 request.session['generated_cv'] = ai_response['content']
+                prerender_cv_pdf(ai_response['content'])
                 return redirect('cv_result')
             else:
                 return render(request, 'cv_form.html', {
@@ -162,10 +159,7 @@ def cv_form(request):
    
 def format_cv_data(form_data):
 
-    selected_project_names = [
-        dict(PROJECT_CHOICES).get(code)
-        for code in form_data['selected_projects']
-    ]
+    selected_project_names = CHOICES.labels('selected_projects', form_data['selected_projects'])
     typed_projects = form_data['projects'].split('\n') if form_data['projects'] else []
 
     return{
@@ -176,15 +170,15 @@ def format_cv_data(form_data):
             'address': form_data['address']
         },
         'education': {
-            'qualification': dict(QUALIFICATION_CHOICES).get(form_data['highest_qualification']),
-            'field': dict(FIELD_CHOICES).get(form_data['field_of_study']),
+            'qualification': CHOICES.label('highest_qualification', form_data['highest_qualification']),
+            'field': CHOICES.label('field_of_study', form_data['field_of_study']),
             'institution': form_data['institution'],
             'year': form_data['passing_year'],
             'grade': form_data['grade']
         },
         'skills': {
-            'technical': [dict(TECH_SKILLS).get(skill) for skill in form_data['technical_skills']],
-            'soft': [dict(SOFT_SKILLS).get(skill) for skill in form_data['soft_skills']]
+            'technical': CHOICES.labels('technical_skills', form_data['technical_skills']),
+            'soft': CHOICES.labels('soft_skills', form_data['soft_skills'])
         },
         'projects': {
             'selected': selected_project_names,
@@ -194,290 +188,268 @@ def format_cv_data(form_data):
         # 'projects': form_data['projects'].split('\n') if form_data['projects'] else [],
         'experience': {
             'years': form_data['years_experience'],
-            'work_type': dict(WORK_TYPE_CHOICES).get(form_data['work_type']),
+            'work_type': CHOICES.label('work_type', form_data['work_type']),
             'role': form_data['role'],
             'organization': form_data['organization']
         }
         
     }
 
-def generate_cv_with_ai(cv_data):
-    """Generate CV content using OpenAI API with advanced prompt"""
-    try:
-        # client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        client = OpenAI(api_key=config("OPENAI_API_KEY"))
-
-        prompt = f"""
-        Create a professional, well-formatted CV/resume using the following information:
-
-                
-        [FULL NAME]
-        [City, State]
-
-        Email: [email]
-        Phone: [phone]
-
-        Summary
-        [3-4 line professional summary focusing on key skills and career objectives. Use complete sentences.]
-
-        Education
-        [Degree Name]
-        [University Name]
-        Passing Year: [year]
-        Grade: [grade]
-
-        Skills
-        Technical Skills: [comma-separated list of technical skills]
-        Soft Skills: [comma-separated list of soft skills]
-
-        Projects
-        [Project 1 description in 1-2 sentences]
-        [Project 2 description in 1-2 sentences]
-
-        Work Experience
-        [If experience < 1 year: "No professional work experience. Seeking entry-level opportunities to apply academic knowledge and technical skills."]
-
-        IMPORTANT FORMATTING RULES:
-        - NO markdown symbols (#, *, **, -)
-        - NO bullet points
-        - NO section headers with symbols
-        - Use plain text only
-        - Leave one blank line between sections
-        - Section names should be on their own line in Title Case
-        - Contact info should be simple and clean
-
-        Now create the CV for this data:
-        Name: {cv_data['basic_info']['name']}
-        Email: {cv_data['basic_info']['email']}
-        Phone: {cv_data['basic_info']['phone']}
-        Address: {cv_data['basic_info']['address']}
-        Education: {cv_data['education']['qualification']} in {cv_data['education']['field']} from {cv_data['education']['institution']}, Year: {cv_data['education']['year']}, Grade: {cv_data['education']['grade']}
-        Technical Skills: {', '.join(cv_data['skills']['technical'])}
-        Soft Skills: {', '.join(cv_data['skills']['soft'])}
-        Projects: {', '.join(cv_data['projects']['selected'] + cv_data['projects']['custom'])}
-        Experience: {cv_data['experience']['years']} years
-
-        Make sure the output follows the exact format above with NO markdown.
-        """
-
-
-        response = client.responses.create(
-            model="gpt-4o-mini",
-            input=prompt
-
-        )
-
-        cv_text = response.output_text
+def start_generation(request, cv_data, regenerate=False, template_fallback=True):
+    """Queue generation in the background and send the browser to the waiting page"""
+    task = submit_generation(cv_data, regenerate=regenerate, template_fallback=template_fallback)
+    request.session['generation_task'] = str(task.id)
+    request.session.pop('generated_cv', None)
+    return redirect('cv_generating', task_id=task.id)
+
+def collect_generation(request):
+    """Move a finished background result into the session; returns the task, if any"""
+    task_id = request.session.get('generation_task')
+    if not task_id:
+        return None
 
-        if not cv_text:
-            return None
+    task = GenerationTask.objects.filter(pk=task_id).first()
+    if task is None:
+        del request.session['generation_task']
+        return None
 
-        return {"content": cv_text}
+    task = expire_if_overdue(task)
+    if task.status == GenerationTask.DONE:
+        request.session['generated_cv'] = task.result
+        request.session.pop('form_data', None)
+        del request.session['generation_task']
+        # The result now lives in the session; do not keep the CV data around
+        GenerationTask.objects.filter(pk=task.pk).delete()
+    return task
+
+def start_streaming(request, regenerate=False):
+    """Send the browser to the result page, which streams the CV from stream_cv"""
+    request.session.pop('generated_cv', None)
+    request.session.pop('form_data', None)
+    request.session['stream_regenerate'] = regenerate
+    return redirect('cv_result')
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_cv(request):
+    """Server-Sent Events feed of the CV text as the model writes it"""
+    cv_data = request.session.get('cv_data', None)
+    if cv_data is None:
+        # 204 tells EventSource to stop reconnecting
+        return HttpResponse(status=204)
 
-    
-    except Exception as e:
-        import traceback
-        print("OpenAI API Error:", e)
-        traceback.print_exc()
-        return None
+    cv_content = request.session.get('generated_cv', None)
+    # Kept until the text is saved so a reconnect skips the stale cached CV
+    # too, and joins the regeneration still in flight
+    regenerate = request.session.get('stream_regenerate', False)
+
+    def events():
+        if cv_content is not None:
+            # EventSource reconnected after the CV was already finished
+            content = cv_content
+            yield sse_event('replace', {'text': content})
+        else:
+            parts = []
+            try:
+                for delta in stream_cv_with_ai(cv_data, regenerate=regenerate):
+                    # The first piece is all the text so far, which a
+                    # reconnecting page must not append to what it already shows
+                    yield sse_event('delta' if parts else 'replace', {'text': delta})
+                    parts.append(delta)
+            except Exception as e:
+                print("OpenAI streaming error:", e)
+                parts = []
+            content = "".join(parts)
+            if not content:
+                content = generate_template_cv(cv_data)['content']
+                yield sse_event('replace', {'text': content})
+
+        # SessionMiddleware saved the session before the body started
+        # streaming, so the finished text is saved here
+        request.session['generated_cv'] = content
+        request.session.pop('stream_regenerate', None)
+        request.session.save()
+        prerender_cv_pdf(content)
+        yield sse_event('done', {'pdf_url': reverse('download_pdf')})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-def generate_template_cv(cv_data):
-    """Fallback template-based CV generation"""
-    experience_years = cv_data['experience']['years']
-    is_fresher = experience_years < 1
-    if is_fresher:
-        experience_section = "EXPERIENCE\n───────────\n• Fresher - Seeking entry-level opportunities to apply academic knowledge and technical skills"
-    else:
-        experience_section = f"EXPERIENCE\n───────────\n• {cv_data['experience']['role']}\n  {cv_data['experience']['organization']} | {cv_data['experience']['years']} years | {cv_data['experience']['work_type']}"
-    if is_fresher:
-        summary = f"""
-        SUMMARY
-        ───────
-        Recent {cv_data['education']['field']} graduate with strong academic background ({cv_data['education']['grade']}) from {cv_data['education']['institution']}. 
-        Proficient in {', '.join(cv_data['skills']['technical'][:3])} with hands-on experience through academic projects. 
-        Demonstrated {', '.join(cv_data['skills']['soft'][:3])} skills with a passion for learning and contributing to innovative projects. 
-        Seeking to leverage technical expertise and problem-solving abilities in an entry-level position.
-        """
-    else:
-        summary = f"""
-        SUMMARY
-        ───────
-        Experienced {cv_data['experience']['role']} with {cv_data['experience']['years']} years in the field. 
-        Strong educational background in {cv_data['education']['field']} from {cv_data['education']['institution']}. 
-        Expertise in {', '.join(cv_data['skills']['technical'][:4])} with proven track record in {cv_data['experience']['work_type'].lower()} environments. 
-        Excellent {', '.join(cv_data['skills']['soft'][:3])} skills with ability to deliver results in challenging environments.
-        """
-    
-    content = f"""
-    PROFESSIONAL CURRICULUM VITAE
-    
-    PERSONAL INFORMATION
-    ───────────────────
-    Name: {cv_data['basic_info']['name']}
-    Email: {cv_data['basic_info']['email']}
-    Phone: {cv_data['basic_info']['phone']}
-    Address: {cv_data['basic_info']['address']}
-    
-    EDUCATION
-    ─────────
-    • {cv_data['education']['qualification']} in {cv_data['education']['field']}
-      {cv_data['education']['institution']} | {cv_data['education']['year']} | Grade: {cv_data['education']['grade']}
-    
-    TECHNICAL SKILLS
-    ────────────────
-    {chr(10).join(['• ' + skill for skill in cv_data['skills']['technical']])}
-    
-    SOFT SKILLS
-    ───────────
-    {chr(10).join(['• ' + skill for skill in cv_data['skills']['soft']])}
-    
-    WORK EXPERIENCE
-    ───────────────
-    • {cv_data['experience']['role']}
-      {cv_data['experience']['organization']} | {cv_data['experience']['years']} years | {cv_data['experience']['work_type']}
-    
-    PROJECTS
-    ────────
-    {chr(10).join(['• ' + project for project in cv_data['projects']]) if cv_data['projects'] else '• No projects specified'}
-    
-    SUMMARY
-    ───────
-    Professional with {cv_data['experience']['years']} years of experience in {cv_data['experience']['role']}. 
-    Strong background in {cv_data['education']['field']} with expertise in {', '.join(cv_data['skills']['technical'][:3])}.
-    """
-    
-    return {'content': content}
+def cv_generating(request, task_id):
+    if request.session.get('generation_task') != str(task_id):
+        return redirect('cv_result')
+    return render(request, 'cv_generating.html', {'task_id': task_id})
+
+def generation_status(request, task_id):
+    """Polled by cv_generating.html until the background task finishes"""
+    if request.session.get('generation_task') != str(task_id):
+        return JsonResponse({'error': 'Unknown generation task.'}, status=404)
+
+    task = collect_generation(request)
+    if task is None:
+        return JsonResponse({'error': 'Unknown generation task.'}, status=404)
+
+    return JsonResponse({
+        'status': task.status,
+        'progress': task.progress,
+        'attempts': task.attempts,
+        'max_attempts': task.max_attempts,
+        'error': task.error,
+        'result_url': reverse('cv_result') if task.status == GenerationTask.DONE else None,
+    })
 
 def cv_result(request):
+    task = collect_generation(request)
+    if task is not None and not task.finished:
+        return redirect('cv_generating', task_id=task.id)
+
     cv_content = request.session.get('generated_cv', None)
     cv_data = request.session.get('cv_data', None)
 
+    stream_url = None
+    if cv_content is None and settings.CV_GENERATION_MODE == 'stream':
+        cv_content, stream_url = '', reverse('stream_cv')
+
     if cv_content is None or cv_data is None:
         return redirect('cv_form')
-    recommended = recommended_jobs(cv_data)[:10]
+    recommended = top_k_jobs(cv_data, k=10)
     return render(request, 'cv_result.html', {
         'cv_content': cv_content,
-        'recommended_jobs': recommended
+        'stream_url': stream_url,
+        'recommended_jobs': recommended,
+        'pdf_templates': pdf_template_choices(),
     })
 
+def pdf_template_choices():
+    """(name, label) of every PDF template, the default first"""
+    default = pdf_template_name()
+    return sorted(((template.name, template.label) for template in PDF_TEMPLATES.values()),
+                  key=lambda choice: choice[0] != default)
+
+def regenerate_cv(request):
+    """Generate the CV again from the stored data, bypassing the generation cache"""
+    cv_data = request.session.get('cv_data', None)
+    if request.method != 'POST' or cv_data is None:
+        return redirect('cv_result')
+
+    if settings.CV_GENERATION_MODE == 'task':
+        return start_generation(request, cv_data, regenerate=True)
+    if settings.CV_GENERATION_MODE == 'stream':
+        return start_streaming(request, regenerate=True)
+
+    ai_response = generate_cv_with_ai(cv_data, regenerate=True)
+    if ai_response and ai_response.get("content"):
+        request.session['generated_cv'] = ai_response['content']
+        prerender_cv_pdf(ai_response['content'])
+    else:
+        messages.error(request, "Failed to regenerate CV. Please try again.")
+    return redirect('cv_result')
+
 def download_pdf(request):
     cv_content = request.session.get('generated_cv', None)
     if not cv_content:
         return redirect('cv_form')
 
-    buffer = io.BytesIO()
-
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    p.setFont("Helvetica", 10)
-
-    lines = cv_content.split('\n')
-
-    # Starting position
-    y = height - 50
-    line_height = 12
-
-    for line in lines:
-        # If the line is too long, split it
-        if p.stringWidth(line) > width - 100:
-            # Split the line into multiple lines
-            wrapped_lines = simpleSplit(line, "Helvetica", 10, width - 100)
-            for wrapped_line in wrapped_lines:
-                if y < 50:  
-                    p.showPage()
-                    p.setFont("Helvetica", 10)
-                    y = height - 50
-                p.drawString(50, y, wrapped_line)
-                y -= line_height
-        else:
-            if y < 50:
-                p.showPage()
-                p.setFont("Helvetica", 10)
-                y = height - 50
-            p.drawString(50, y, line)
-            y -= line_height
-
-    p.showPage()
-    p.save()
+    template = requested_pdf_template(request)
+    etag = f'"{cv_pdf_key(cv_content, template)}"'
+    not_modified = pdf_not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
 
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="AI_Generated_CV.pdf"'
+    try:
+        pdf = get_cv_pdf(cv_content, template)
+    except RenderUnavailable as e:
+        return pdf_unavailable(e)
+    return pdf_response(pdf, etag)
 
+def requested_pdf_template(request):
+    """The PDF template named by ?template=, PDF_DEFAULT_TEMPLATE without one"""
+    try:
+        return pdf_template_name(request.GET.get('template'))
+    except KeyError:
+        raise Http404("Unknown PDF template")
+
+def pdf_unavailable(error):
+    print("PDF render unavailable:", error)
+    response = HttpResponse("The PDF renderer is busy. Please try again in a moment.", status=503)
+    response['Retry-After'] = '2'
     return response
 
-def normalize_list(value):
-    if value is None:
-        return []
-    if isinstance(value, list):
-        return [str(v).lower().strip() for v in value if v]
-    if isinstance(value, str):
-        return [v.lower().strip() for v in value.split(",") if v.strip()]
-    return []
-
-def calculate_similarity(cv, job):
-
-    cv_skills = normalize_list(cv["skills"]["technical"])
-    job_skills = normalize_list(job.skills)
-
-    skill_score = (
-        len(set(cv_skills) & set(job_skills)) / len(set(cv_skills) | set(job_skills))
-        if (cv_skills or job_skills) else 0
-    )
-
-
-    cv_soft = normalize_list(cv["skills"]["soft"])
-    job_soft = normalize_list(job.soft_skills)
+def pdf_not_modified(request, etag):
+    """304 response when the browser's If-None-Match already names this PDF"""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+    return response
 
-    soft_skill_score = (
-        len(set(cv_soft) & set(job_soft)) / len(set(cv_soft) | set(job_soft))
-        if (cv_soft or job_soft) else 0
+def pdf_response(pdf, etag):
+    response = FileResponse(
+        io.BytesIO(pdf), as_attachment=True, filename='AI_Generated_CV.pdf', content_type='application/pdf',
     )
+    response['ETag'] = etag
+    # Browsers keep the file but revalidate, getting a 304 while the CV is unchanged
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
+@csrf_exempt
+def batch_generate(request):
+    """
+    Bulk JSON entry point: POST {"records": [...], "archive": false} with
+    ``Authorization: Bearer <BATCH_API_TOKEN>``. Returns the batch report,
+    or a zip of PDFs, recommendations and the report when archive is set.
+    Runs within the request, so it takes at most BATCH_MAX_RECORDS records
+    and stops calling the model after BATCH_TIMEOUT seconds; larger batches
+    go through ``manage.py generate_cvs``.
+    """
+    from .batch import run_batch, run_batch_to_archive
 
-    edu = (cv["education"]["qualification"] or "").lower()
-    job_edu = (job.education_required or "").lower()
-
-    if job_edu and edu in job_edu:
-        education_score = 1
-    else:
-        education_score = 0
-
+    token = settings.BATCH_API_TOKEN
+    if not token:
+        return JsonResponse({'error': 'Batch API is disabled.'}, status=404)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Use POST.'}, status=405)
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Invalid token.'}, status=401)
 
     try:
-        cv_exp = int(cv["experience"]["years"])
-    except:
-        cv_exp = 0
-
-    job_exp = job.experience_required or 0
-
-    diff = abs(cv_exp - job_exp)
-    experience_score = max(0, 1 - (diff / max(job_exp, 1)))
-
-    # --- Weighted total ---
-    final_score = (
-        skill_score * 0.40 +
-        soft_skill_score * 0.15 +
-        education_score * 0.20 +
-        experience_score * 0.25
-    ) * 100
-
-    return round(final_score, 2)
-
+        payload = json.loads(request.body)
+        records = payload['records']
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"records": [{...}, ...]}.'}, status=400)
+    if len(records) > settings.BATCH_MAX_RECORDS:
+        return JsonResponse({
+            'error': f'At most {settings.BATCH_MAX_RECORDS} records per request; '
+                     f'use manage.py generate_cvs for larger batches.',
+        }, status=413)
+
+    if payload.get('archive'):
+        report, archive = run_batch_to_archive(
+            records, concurrency=settings.BATCH_CONCURRENCY, timeout=settings.BATCH_TIMEOUT,
+        )
+        response = HttpResponse(archive, content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="cv_batch.zip"'
+        response['X-Batch-Succeeded'] = report['succeeded']
+        response['X-Batch-Total'] = report['total']
+        return response
 
-def recommended_jobs(cv_data):
-    all_jobs = jobs.objects.all()
-    recommendations = []
+    return JsonResponse(run_batch(records, concurrency=settings.BATCH_CONCURRENCY, timeout=settings.BATCH_TIMEOUT))
 
-    for job in all_jobs:
-        try:
-            score = calculate_similarity(cv_data, job)
-            recommendations.append({"job": job, "score": score})
-        except Exception as e:
-            print("Error in job similarity:", e)
-            continue
-    
-    recommendations.sort(key=lambda x: x["score"], reverse=True)
-    return recommendations
 
+def export_metrics(request):
+    """
+    Request metrics for scraping, with ``Authorization: Bearer <METRICS_TOKEN>``:
+    Prometheus text format, or JSON with approximate percentiles for ?format=json.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404("Metrics are disabled.")
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Invalid token.'}, status=401)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(metrics.snapshot())
+    return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')